@@ -1,6 +1,9 @@
 import pyodbc
 import pandas as pd
 
+# Shared fetch helpers live at the repo root; run from there as: python -m Discount_Analysis.connection2
+from ars_fetch import read_frame
+
 def fetch_sales_data():
     try:
         # Define the connection string
@@ -17,8 +20,8 @@ def fetch_sales_data():
         # Define the query
         query = "SELECT TOP 100* FROM [base] WHERE [PLATFORM] = 'Amazon';"
 
-        # Use Pandas to execute the query and fetch data
-        df = pd.read_sql_query(query, connection)
+        # Fetch in batches straight into typed columns
+        df = read_frame(connection, query)
 
         # Print a preview of the DataFrame
         print(df)
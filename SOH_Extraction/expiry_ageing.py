@@ -2,6 +2,9 @@ import pandas as pd
 from datetime import datetime
 import pyodbc
 
+# Shared fetch helpers live at the repo root; run from there as: python -m SOH_Extraction.expiry_ageing
+from ars_fetch import read_frame
+
 
 DB_CONFIG = {
     'driver': 'ODBC Driver 17 for SQL Server',
@@ -36,7 +39,7 @@ try:
                 [L3 Category] AS Hirearchy
             FROM [SKU Master]
         """
-        sku_df = pd.read_sql(query, connection)
+        sku_df = read_frame(connection, query)
         print(sku_df)
         connection.close()
 
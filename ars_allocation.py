@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from ars_rules import ARS_RULES
+
+# Vinculum stock export merged by vinculum_inventory_fetch_multiappend.py,
+# the same file expiry_ageing.py reports on
+WAREHOUSE_STOCK_PATH = 'D:/merged_reports.csv'
+# Marketplace and office locations excluded as in expiry_ageing.py
+EXCLUDED_SITES = 'Amazon|Myntra|Flipkart|BOM T2|Head Office'
+ALLOCATABLE_BUCKETS = ['good']
+# Units per case when the SKU master has no case_pack column or value
+CASE_PACK_COLUMN = 'case_pack'
+DEFAULT_CASE_PACK = 1
+
+ALLOCATION_COLUMNS = [
+    'store_id', 'store_name', 'sku_id', 'brand_line', 'sku_name', 'sku_segment', 'store_type',
+    'priority', 'potential_revenue_loss', 'reorder_qty', 'transfer_in_qty', 'case_pack',
+    'requested_qty', 'allocated_qty', 'warehouse_stock'
+]
+
+
+def load_warehouse_stock(path=WAREHOUSE_STOCK_PATH):
+    """
+    Allocatable warehouse units per SKU from the merged Vinculum report,
+    with the site and bucket clean-up of expiry_ageing.py
+    """
+    stock = pd.read_csv(path, usecols=['SKU', 'Site Location ', 'Zone', 'Inv Bucket', 'Available Qty'])
+    stock = stock[~stock['Site Location '].str.contains(EXCLUDED_SITES, case=False, na=False)]
+    # IGE-2 stock still 'In Process' is sellable
+    in_process = (stock['Zone'] == 'IGE-2') & (stock['Inv Bucket'] == 'In Process')
+    stock.loc[in_process, 'Inv Bucket'] = 'good'
+    stock = stock[stock['Inv Bucket'].str.lower().isin(ALLOCATABLE_BUCKETS)]
+    stock['Available Qty'] = pd.to_numeric(stock['Available Qty'], errors='coerce').fillna(0)
+    stock = stock.groupby('SKU', as_index=False)['Available Qty'].sum()
+    stock.columns = ['sku_id', 'warehouse_stock']
+    stock['sku_id'] = stock['sku_id'].astype(str)
+    return stock[stock['warehouse_stock'] > 0].reset_index(drop=True)
+
+
+def remaining_stock(warehouse_stock, allocation):
+    """
+    Warehouse stock per SKU less the units of an allocation, for the next
+    channel to allocate from; SKUs allocated out completely are dropped
+    """
+    allocated = allocation.groupby(allocation['sku_id'].astype(str))['allocated_qty'].sum()
+    stock = warehouse_stock.copy()
+    taken = allocated.reindex(stock['sku_id'].astype(str)).fillna(0).to_numpy()
+    stock['warehouse_stock'] = stock['warehouse_stock'] - taken
+    return stock[stock['warehouse_stock'] > 0].reset_index(drop=True)
+
+
+def _rule_order(config, key):
+    """Labels of a rule set in priority order, the default label last"""
+    return [label for label, _ in config[key]] + [config['default']]
+
+
+def _per_sku(sku_labels, table, column, default):
+    """Value of table[column] for each SKU label, default where the SKU is missing"""
+    if table is None or column not in table.columns:
+        return np.full(len(sku_labels), default, dtype=float)
+    table = table.drop_duplicates('sku_id')
+    values = pd.Series(pd.to_numeric(table[column], errors='coerce').to_numpy(), index=table['sku_id'].astype(str))
+    return values.reindex(pd.Index(sku_labels).astype(str)).fillna(default).to_numpy(dtype=float)
+
+
+def allocate_packs(sku, tier, request, supply):
+    """
+    Share supply[sku] packs over the requests of each SKU at once.
+
+    Rows must be sorted by sku, tier and rank within the tier. Tiers are
+    filled in order while supply lasts (priority fill); the tier where
+    supply runs out gets a fair share, floor(request * left / tier request),
+    and the packs left over go one each to its best ranked rows.
+    Returns packs per row.
+    """
+    n = len(sku)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    # (sku, tier) blocks in row order
+    new_block = np.r_[True, (sku[1:] != sku[:-1]) | (tier[1:] != tier[:-1])]
+    block = np.cumsum(new_block) - 1
+    block_start = np.flatnonzero(new_block)
+    block_request = np.add.reduceat(request, block_start)
+    block_sku = sku[block_start]
+
+    # Requests of the same SKU's higher tiers come first
+    running = np.cumsum(block_request)
+    sku_first_block = np.searchsorted(block_sku, block_sku, side='left')
+    before = running - block_request - (running[sku_first_block] - block_request[sku_first_block])
+    block_left = np.clip(supply[block_sku] - before, 0, block_request)
+
+    full = block_left == block_request
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(block_request > 0, block_left / block_request, 0)
+    packs = np.where(full[block], request, np.floor(request * share[block])).astype(np.int64)
+    leftover = block_left - np.add.reduceat(packs, block_start)
+    position = np.arange(n) - block_start[block]
+    packs += (~full[block]) & (position < leftover[block])
+    return packs
+
+
+def build_allocation(recommendations, metrics, warehouse_stock, transfers=None, sku_master=None, rules=ARS_RULES):
+    """
+    Allocate warehouse stock per SKU to the stock alert orders of the
+    recommendation table.
+
+    The request is the reorder_qty of each Stock Alert row less the units
+    already coming in on the transfer plan, rounded up to whole case packs.
+    Stores compete per SKU by sku_segment, then performance_bucket (both in
+    the order of the rules), then potential revenue loss. Allocation is in
+    whole case packs of the available warehouse stock.
+    """
+    recs = recommendations[recommendations['category'] == 'Stock Alert'].reset_index(drop=True)
+    reorder_qty = pd.to_numeric(recs['reorder_qty'], errors='coerce').fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+    transfer_in = np.zeros(len(recs))
+    if transfers is not None and len(transfers):
+        inbound = transfers.groupby(['to_store_id', 'sku_id'], observed=True)['transfer_qty'].sum()
+        inbound.index.names = ['store_id', 'sku_id']
+        keys = pd.MultiIndex.from_frame(recs[['store_id', 'sku_id']])
+        transfer_in = inbound.reindex(keys).fillna(0).to_numpy(dtype=float)
+
+    segments = metrics.drop_duplicates(['store_id', 'sku_id'])
+    segments = segments.set_index(pd.MultiIndex.from_frame(segments[['store_id', 'sku_id']]))['sku_segment']
+    sku_segment = segments.reindex(pd.MultiIndex.from_frame(recs[['store_id', 'sku_id']])).to_numpy(dtype=object)
+
+    # Per-SKU supply and case pack, looked up once per distinct SKU
+    sku_codes, sku_labels = pd.factorize(recs['sku_id'])
+    case_pack = _per_sku(sku_labels, sku_master, CASE_PACK_COLUMN, DEFAULT_CASE_PACK)
+    case_pack = np.where(case_pack >= 1, np.floor(case_pack), 1).astype(np.int64)
+    stock = _per_sku(sku_labels, warehouse_stock, 'warehouse_stock', 0)
+    supply_packs = np.floor(stock / case_pack).astype(np.int64)
+
+    row_pack = case_pack[sku_codes]
+    requested = np.clip(reorder_qty - transfer_in, 0, None)
+    request_packs = np.ceil(requested / row_pack).astype(np.int64)
+
+    segment_order = _rule_order(rules['sku_segment'], 'rules')
+    bucket_order = _rule_order(rules['performance_bucket'], 'quantiles')
+    segment_rank = pd.Index(segment_order).get_indexer(pd.Index(sku_segment).astype(str))
+    bucket_rank = pd.Index(bucket_order).get_indexer(recs['store_type'].astype(str))
+    # Unknown labels rank after every configured one
+    segment_rank = np.where(segment_rank < 0, len(segment_order), segment_rank)
+    bucket_rank = np.where(bucket_rank < 0, len(bucket_order), bucket_rank)
+    tier = segment_rank * (len(bucket_order) + 1) + bucket_rank
+    revenue_loss = pd.to_numeric(recs['potential_revenue_loss'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    # Rows still asking for stock, by SKU, tier and revenue loss
+    order = np.flatnonzero(request_packs > 0)
+    order = order[np.lexsort((-revenue_loss[order], tier[order], sku_codes[order]))]
+    packs = np.zeros(len(recs), dtype=np.int64)
+    packs[order] = allocate_packs(sku_codes[order], tier[order], request_packs[order], supply_packs)
+
+    allocation = pd.DataFrame({
+        'store_id': recs['store_id'],
+        'store_name': recs['store_name'],
+        'sku_id': recs['sku_id'],
+        'brand_line': recs['brand_line'],
+        'sku_name': recs['sku_name'],
+        'sku_segment': sku_segment,
+        'store_type': recs['store_type'],
+        'priority': recs['priority'],
+        'potential_revenue_loss': recs['potential_revenue_loss'],
+        'reorder_qty': recs['reorder_qty'],
+        'transfer_in_qty': transfer_in.astype(np.int64),
+        'case_pack': row_pack,
+        'requested_qty': request_packs * row_pack,
+        'allocated_qty': packs * row_pack,
+        'warehouse_stock': stock[sku_codes].astype(np.int64)
+    }, columns=ALLOCATION_COLUMNS)
+    return allocation
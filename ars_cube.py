@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _encode_axis(values):
+    """Integer codes and sorted labels; categorical ids keep their shared vocabulary"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.is_monotonic_increasing:
+        return values.cat.codes.to_numpy().astype(np.int64), values.cat.categories
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def week_starts(dates):
+    """Day number (days since epoch) of the Monday starting each date's ISO week"""
+    day_number = pd.Series(dates).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return day_number - (day_number + 3) % 7
+
+
+def std_from_moments(total, total_sq, n_weeks, ddof=1):
+    """Std of weekly units from their sum and sum of squares over n_weeks, zero weeks included"""
+    n = float(n_weeks)
+    total = np.asarray(total, dtype=float)
+    if n - ddof <= 0:
+        return np.full(len(total), np.nan)
+    var = (n * np.asarray(total_sq, dtype=float) - total * total) / (n * (n - ddof))
+    return np.sqrt(np.clip(var, 0, None))
+
+
+class StoreSkuPairs:
+    """Row -> store-SKU pair code for a frame of buckets, pairs in (store, sku) order"""
+
+    def __init__(self, stores, skus, pair_keys, codes):
+        self.stores = stores
+        self.skus = skus
+        self.pair_keys = pair_keys
+        self.codes = codes
+
+    @classmethod
+    def from_frame(cls, frame):
+        store_codes, stores = _encode_axis(frame['store_id'])
+        sku_codes, skus = _encode_axis(frame['sku_id'])
+        pair_key = store_codes.astype(np.int64) * len(skus) + sku_codes
+        pair_keys, codes = np.unique(pair_key, return_inverse=True)
+        return cls(stores, skus, pair_keys, codes)
+
+    def __len__(self):
+        return len(self.pair_keys)
+
+
+class DemandCube:
+    """
+    Store x SKU x ISO-week demand built from daily sales buckets.
+
+    Store and SKU ids are integer-encoded (sorted vocabularies, shared with
+    the pipeline when the ids arrive as ars_keys categoricals). Only store-SKU
+    pairs that sold in the window get a row, and weeks form the columns of a
+    sparse matrix. Memory is bounded by the non-zero store-SKU-weeks rather
+    than stores x SKUs x weeks. Weeks without sales read as zero demand.
+    """
+
+    def __init__(self, stores, skus, weeks, pair_store, pair_sku, units, value, weeks_present, days_present):
+        self.stores = stores
+        self.skus = skus
+        self.weeks = weeks
+        self.pair_store = pair_store
+        self.pair_sku = pair_sku
+        self.units = units
+        self.value = value
+        self.weeks_present = weeks_present
+        self.days_present = days_present
+
+    @classmethod
+    def from_daily(cls, daily, pairs=None, weeks=None):
+        """
+        Build the cube in one pass over daily buckets (store_id, sku_id, date, units, value)
+        pairs: StoreSkuPairs of daily, when the caller already computed them
+        weeks: sorted Monday dates of the week columns, e.g. the whole channel's
+        when daily holds one shard of it; the weeks of daily if not given
+        """
+        if pairs is None:
+            pairs = StoreSkuPairs.from_frame(daily)
+        stores, skus, pair_keys, pair_codes = pairs.stores, pairs.skus, pairs.pair_keys, pairs.codes
+        # ISO weeks run Monday to Sunday; label each week by its Monday
+        day_number = daily['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        monday = week_starts(daily['date'])
+        if weeks is None:
+            weeks, week_codes = np.unique(monday, return_inverse=True)
+        else:
+            weeks = np.asarray(weeks, dtype='datetime64[D]').astype(np.int64)
+            week_codes = np.searchsorted(weeks, monday)
+            if len(monday) and (week_codes.max() >= len(weeks) or (weeks[week_codes] != monday).any()):
+                raise ValueError("Sales fall in weeks outside the given week calendar")
+        shape = (len(pair_keys), len(weeks))
+
+        units = sparse.csr_matrix(
+            (daily['sales_units'].to_numpy(dtype=float), (pair_codes, week_codes)), shape=shape
+        )
+        value = sparse.csr_matrix(
+            (daily['sales_value'].to_numpy(dtype=float), (pair_codes, week_codes)), shape=shape
+        )
+        # Weeks and days with at least one sales row, even if units net to zero
+        cells = np.unique(pair_codes * len(weeks) + week_codes)
+        weeks_present = np.bincount(cells // len(weeks), minlength=len(pair_keys))
+        first_day = day_number.min() if len(day_number) else 0
+        n_days = int(day_number.max() - first_day) + 1 if len(day_number) else 1
+        cells = np.unique(pair_codes * n_days + (day_number - first_day))
+        days_present = np.bincount(cells // n_days, minlength=len(pair_keys))
+
+        return cls(
+            stores=stores,
+            skus=skus,
+            weeks=weeks.astype('datetime64[D]'),
+            pair_store=(pair_keys // len(skus)).astype(np.int32),
+            pair_sku=(pair_keys % len(skus)).astype(np.int32),
+            units=units,
+            value=value,
+            weeks_present=weeks_present,
+            days_present=days_present
+        )
+
+    @classmethod
+    def from_weekly(cls, weekly, pairs=None):
+        """
+        Build the cube from store-SKU-week buckets (store_id, sku_id, week, units,
+        value, n_days), e.g. the weekly rollup persisted by ars_state; the week
+        columns are the weeks present in weekly
+        """
+        if pairs is None:
+            pairs = StoreSkuPairs.from_frame(weekly)
+        weeks, week_codes = np.unique(weekly['week'].to_numpy(dtype='datetime64[D]'), return_inverse=True)
+        shape = (len(pairs), len(weeks))
+        units = sparse.csr_matrix((weekly['sales_units'].to_numpy(dtype=float), (pairs.codes, week_codes)), shape=shape)
+        value = sparse.csr_matrix((weekly['sales_value'].to_numpy(dtype=float), (pairs.codes, week_codes)), shape=shape)
+        return cls(
+            stores=pairs.stores,
+            skus=pairs.skus,
+            weeks=weeks,
+            pair_store=(pairs.pair_keys // len(pairs.skus)).astype(np.int32),
+            pair_sku=(pairs.pair_keys % len(pairs.skus)).astype(np.int32),
+            units=units,
+            value=value,
+            weeks_present=np.bincount(pairs.codes, minlength=len(pairs)),
+            days_present=np.bincount(pairs.codes, weights=weekly['n_days'].to_numpy(dtype=float),
+                                     minlength=len(pairs)).astype(np.int64)
+        )
+
+    @property
+    def n_weeks(self):
+        return len(self.weeks)
+
+    def keys(self):
+        """store_id / sku_id of each cube row, categorical over the cube vocabularies"""
+        return pd.DataFrame({
+            'store_id': pd.Categorical.from_codes(self.pair_store, self.stores),
+            'sku_id': pd.Categorical.from_codes(self.pair_sku, self.skus)
+        })
+
+    def total_units(self):
+        return np.asarray(self.units.sum(axis=1)).ravel()
+
+    def total_value(self):
+        return np.asarray(self.value.sum(axis=1)).ravel()
+
+    def weekly_mean(self):
+        return self.total_units() / self.n_weeks
+
+    def weekly_std(self, ddof=1):
+        """Std of weekly units with weeks without sales counted as zero"""
+        total_sq = np.asarray(self.units.multiply(self.units).sum(axis=1)).ravel()
+        return std_from_moments(self.total_units(), total_sq, self.n_weeks, ddof=ddof)
+
+    def sale_frequency(self):
+        """Share of weeks in the window with any sales"""
+        return self.weeks_present / self.n_weeks
+
+    def dense_units(self, rows=None, dtype=np.float32):
+        """Dense (pairs x weeks) units for a slice of rows, for per-series models"""
+        block = self.units if rows is None else self.units[rows]
+        return block.toarray().astype(dtype, copy=False)
+
+    def nbytes(self):
+        arrays = [self.pair_store, self.pair_sku, self.weeks_present, self.days_present]
+        matrices = [self.units, self.value]
+        return (sum(a.nbytes for a in arrays)
+                + sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in matrices))
@@ -0,0 +1,584 @@
+import atexit
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+from ars_fetch import read_frame
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+DB_BACKENDS = ('mssql', 'sqlite', 'duckdb')
+# Idle connections kept open per pool
+POOL_SIZE = 4
+# An idle connection older than this is checked with PING_QUERY before it is handed out again
+PING_AFTER_S = 60.0
+PING_QUERY = 'SELECT 1'
+# Per-call timing records kept until take_calls() drains them
+CALL_LOG_SIZE = 1000
+
+_TRY_CONVERT_105 = re.compile(r'TRY_CONVERT\(\s*date\s*,\s*(.+?)\s*,\s*105\s*\)', re.IGNORECASE)
+_CHECKSUM = re.compile(r'CHECKSUM\(([^()]+)\)', re.IGNORECASE)
+_BRACKETED = re.compile(r'\[([^\[\]]+)\]')
+# Leading name of a CREATE TABLE statement, to re-target a table's DDL
+_CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:\w+\.)?["\[`]?\w+["\]`]?', re.IGNORECASE)
+_INSERT_VALUES = re.compile(r'^\s*(INSERT\s+INTO\s+.+?)\s+VALUES\s*\((?:\s*\?\s*,)*\s*\?\s*\)\s*$', re.IGNORECASE | re.DOTALL)
+
+
+def connection_string(config):
+    """ODBC connection string for SQL Server from a DB_CONFIG dict, with TLS"""
+    return (
+        f"DRIVER={config['driver']};"
+        f"SERVER={config['server']},{config['port']};"
+        f"DATABASE={config['database']};"
+        f"UID={config['uid']};"
+        f"PWD={config['pwd']};"
+        "Encrypt=yes;TrustServerCertificate=yes;"
+    )
+
+
+class MSSQLBackend:
+    """SQL Server through pyodbc; queries are written in its dialect, so they run unchanged"""
+    name = 'mssql'
+
+    def __init__(self):
+        import pyodbc
+        self.pyodbc = pyodbc
+        self.Error = pyodbc.Error
+
+    def connect(self, config):
+        return self.pyodbc.connect(connection_string(config), autocommit=False)
+
+    def prepare(self, query, params):
+        return query, params
+
+    def begin(self, connection):
+        # autocommit is off, every statement already runs in a transaction
+        pass
+
+    def temp_table(self, name, like, columns='*'):
+        """Session temp table name and the statement creating it empty, with the (given) columns of table `like`"""
+        return f"#{name}", f"SELECT TOP 0 {columns} INTO #{name} FROM {like}"
+
+    def merge_into(self, table):
+        # HOLDLOCK keeps the key range locked between MERGE's match and its insert
+        return f"MERGE {table} WITH (HOLDLOCK) AS t"
+
+    def bulk_insert_into(self, table):
+        # TABLOCK on an empty table lets the insert be minimally logged
+        return f"INSERT INTO {table} WITH (TABLOCK)"
+
+    def app_lock(self, resource):
+        """Statements taking and releasing an exclusive application lock held by the connection"""
+        resource = resource.replace("'", "''")
+        return (
+            f"DECLARE @granted int; EXEC @granted = sp_getapplock @Resource = '{resource}', @LockMode = 'Exclusive', "
+            f"@LockOwner = 'Session', @LockTimeout = 600000; "
+            f"IF @granted < 0 THROW 50000, 'Lock {resource} not granted', 1;",
+            f"EXEC sp_releaseapplock @Resource = '{resource}', @LockOwner = 'Session'"
+        )
+
+    def _partitioning(self, session, table):
+        """(partition function, partition scheme) table is stored on; swap writes need RANGE RIGHT on channel"""
+        found = session.read_frame(
+            "SELECT pf.name, ps.name, pf.boundary_value_on_right FROM sys.indexes AS i "
+            "JOIN sys.partition_schemes AS ps ON ps.data_space_id = i.data_space_id "
+            "JOIN sys.partition_functions AS pf ON pf.function_id = ps.function_id "
+            "WHERE i.object_id = OBJECT_ID(?) AND i.index_id IN (0, 1)", [table])
+        if found.empty or not found.iloc[0, 2]:
+            raise ValueError(f"{table} is not partitioned on channel by a RANGE RIGHT function, "
+                             f"which swap writes need (see ars_schema.RETAIL_ARS_1)")
+        return found.iloc[0, 0], found.iloc[0, 1]
+
+    def _partition_number(self, session, function, channel):
+        return int(session.read_frame(f"SELECT $PARTITION.{function}(?)", [channel]).iloc[0, 0])
+
+    def prepare_shadow(self, session, table, shadow, old, channel):
+        """
+        Give channel a partition of its own and empty that partition of
+        `shadow`, the load table. table, `shadow` and `old` (the switch
+        target) share one RANGE RIGHT partition function on channel, so a
+        partition switches between them as is. A channel is split out once,
+        at its own value and at the next channel stored above it; only that
+        first split can move rows.
+        """
+        function, scheme = self._partitioning(session, table)
+        boundaries = session.read_frame(
+            "SELECT CAST(v.value AS nvarchar(4000)) FROM sys.partition_range_values AS v "
+            "JOIN sys.partition_functions AS f ON f.function_id = v.function_id WHERE f.name = ?", [function])
+        next_channel = session.read_frame(f"SELECT MIN(channel) FROM {table} WHERE channel > ?", [channel]).iloc[0, 0]
+        splits = [value for value in (channel, next_channel)
+                  if value is not None and value not in set(boundaries.iloc[:, 0])]
+        if splits:
+            # New partitions go to the filegroup of the one they are split from
+            filegroup = session.read_frame(
+                f"SELECT fg.name FROM sys.partition_schemes AS ps "
+                f"JOIN sys.destination_data_spaces AS dds ON dds.partition_scheme_id = ps.data_space_id "
+                f"JOIN sys.filegroups AS fg ON fg.data_space_id = dds.data_space_id "
+                f"WHERE ps.name = ? AND dds.destination_id = $PARTITION.{function}(?)", [scheme, channel]).iloc[0, 0]
+            for value in splits:
+                session.execute(f"ALTER PARTITION SCHEME {scheme} NEXT USED [{filegroup}]")
+                session.execute(f"ALTER PARTITION FUNCTION {function}() SPLIT RANGE (?)", [value])
+        partition = self._partition_number(session, function, channel)
+        session.execute(f"TRUNCATE TABLE {shadow} WITH (PARTITIONS ({partition}))")
+
+    def swap_channel(self, session, table, shadow, old, channel, columns):
+        """
+        Metadata-only swap of channel's partition: the live rows move to the
+        same partition of `old` (emptied first), the shadow's become live.
+        Raises ValueError if another channel has since been written into
+        the partition; the next prepare_shadow splits it out.
+        """
+        function, _ = self._partitioning(session, table)
+        partition = self._partition_number(session, function, channel)
+        shared = session.read_frame(f"SELECT COUNT(*) FROM {table} WHERE $PARTITION.{function}(channel) = ? "
+                                    f"AND channel <> ?", [partition, channel]).iloc[0, 0]
+        if shared:
+            raise ValueError(f"Partition {partition} of {table} also holds {shared} rows of other channels")
+        session.execute(f"TRUNCATE TABLE {old} WITH (PARTITIONS ({partition}))")
+        session.execute(f"ALTER TABLE {table} SWITCH PARTITION {partition} TO {old} PARTITION {partition}")
+        session.execute(f"ALTER TABLE {shadow} SWITCH PARTITION {partition} TO {table} PARTITION {partition}")
+
+    def executemany(self, cursor, query, rows, input_sizes=None):
+        """input_sizes: ('varchar', 255) / ('float',) ... per parameter, pyodbc SQL_<TYPE> names"""
+        if input_sizes:
+            cursor.setinputsizes([
+                (getattr(self.pyodbc, 'SQL_' + size[0].upper()),) + tuple(size[1:]) for size in input_sizes
+            ])
+        cursor.fast_executemany = True
+        cursor.executemany(query, rows)
+
+
+def _try_convert_date_105(value):
+    """TRY_CONVERT(date, value, 105): dd-mm-yyyy to an ISO date string, None when it does not parse"""
+    try:
+        return datetime.datetime.strptime(value, '%d-%m-%Y').date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _checksum(value):
+    """
+    Signed 32-bit hash standing in for CHECKSUM, over the same range (so
+    -2147483648 occurs as on SQL Server); only has to be stable within one database
+    """
+    if value is None:
+        return None
+    checksum = zlib.crc32(str(value).encode())
+    return checksum - (1 << 32) if checksum >= 1 << 31 else checksum
+
+
+def _prepare_local_shadow(session, ddl, shadow, old, channel):
+    """
+    Shadow and old tables of the local stand-ins, which have no partitions:
+    created once from the live table's DDL (without its indexes, they only
+    hold one swap's rows per channel), and channel's shadow rows cleared
+    """
+    for name in (shadow, old):
+        session.execute(_CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {name}", ddl, count=1))
+    session.execute(f"DELETE FROM {shadow} WHERE channel = ?", [channel])
+
+
+def _swap_local_channel(session, table, shadow, old, channel, columns):
+    """
+    Stand-in for a partition switch: channel's live rows are moved to old and
+    its shadow rows into table, in the caller's transaction. The live
+    table's indexes are updated row by row, so the swap costs the channel's
+    rows rather than being metadata-only; no table is dropped or renamed.
+    """
+    names = ', '.join(columns)
+    for query in (f"DELETE FROM {old} WHERE channel = ?",
+                  f"INSERT INTO {old} ({names}) SELECT {names} FROM {table} WHERE channel = ?",
+                  f"DELETE FROM {table} WHERE channel = ?",
+                  f"INSERT INTO {table} ({names}) SELECT {names} FROM {shadow} WHERE channel = ?",
+                  f"DELETE FROM {shadow} WHERE channel = ?"):
+        session.execute(query, [channel])
+
+
+class SQLiteBackend:
+    """
+    Local SQLite file holding the same tables (Base, [Retail Inventory],
+    retail_ars_1), for running and benchmarking the pipeline offline.
+    TRY_CONVERT(date, x, 105) and CHECKSUM are provided as functions;
+    dates are compared as ISO strings.
+    """
+    name = 'sqlite'
+    Error = sqlite3.Error
+
+    def connect(self, config):
+        # One checkout uses a connection at a time, whichever thread it runs on
+        connection = sqlite3.connect(config['database'], check_same_thread=False)
+        connection.create_function('try_convert_date_105', 1, _try_convert_date_105, deterministic=True)
+        connection.create_function('CHECKSUM', 1, _checksum, deterministic=True)
+        return connection
+
+    def prepare(self, query, params):
+        query = _TRY_CONVERT_105.sub(r'try_convert_date_105(\1)', query)
+        if params:
+            params = [value.isoformat() if isinstance(value, datetime.date) else value for value in params]
+        return query, params
+
+    def begin(self, connection):
+        # sqlite3 only opens a transaction by itself before DML; DDL (e.g. a table swap) needs an explicit one
+        if not connection.in_transaction:
+            connection.execute('BEGIN')
+
+    def temp_table(self, name, like, columns='*'):
+        return name, f"CREATE TEMP TABLE {name} AS SELECT {columns} FROM {like} WHERE 0"
+
+    def merge_into(self, table):
+        # No MERGE in SQLite; callers fall back to DELETE / UPDATE ... FROM / INSERT ... SELECT
+        return None
+
+    def bulk_insert_into(self, table):
+        return f"INSERT INTO {table}"
+
+    def app_lock(self, resource):
+        # One writer per database file already
+        return None
+
+    def prepare_shadow(self, session, table, shadow, old, channel):
+        ddl = session.read_frame("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", [table])
+        _prepare_local_shadow(session, ddl.iloc[0, 0], shadow, old, channel)
+
+    def swap_channel(self, session, table, shadow, old, channel, columns):
+        _swap_local_channel(session, table, shadow, old, channel, columns)
+
+    def executemany(self, cursor, query, rows, input_sizes=None):
+        cursor.executemany(query, rows)
+
+
+class _DuckDBCursor:
+    """DB-API cursor over the DuckDB connection itself, so it shares the connection's transaction"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @property
+    def description(self):
+        return self.connection.description
+
+    def execute(self, query, params=None):
+        self.connection.execute(query, params or [])
+        return self
+
+    def executemany(self, query, rows):
+        self.connection.executemany(query, rows)
+        return self
+
+    def fetchmany(self, size):
+        return self.connection.fetchmany(size)
+
+    def fetchall(self):
+        return self.connection.fetchall()
+
+    def close(self):
+        pass
+
+
+class _DuckDBConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.in_transaction = False
+
+    def cursor(self):
+        return _DuckDBCursor(self.connection)
+
+    def begin(self):
+        self.connection.begin()
+        self.in_transaction = True
+
+    def commit(self):
+        if self.in_transaction:
+            self.in_transaction = False
+            self.connection.commit()
+
+    def rollback(self):
+        if self.in_transaction:
+            self.in_transaction = False
+            self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+class DuckDBBackend:
+    """
+    Local DuckDB file with the same tables. Bracketed names are quoted,
+    TRY_CONVERT(date, x, 105) becomes TRY_STRPTIME and CHECKSUM DuckDB's hash.
+    """
+    name = 'duckdb'
+
+    def __init__(self):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the duckdb backend")
+        self.Error = duckdb.Error
+
+    def connect(self, config):
+        return _DuckDBConnection(duckdb.connect(config['database']))
+
+    def prepare(self, query, params):
+        query = _BRACKETED.sub(r'"\1"', query)
+        query = _TRY_CONVERT_105.sub(r"CAST(TRY_STRPTIME(\1, '%d-%m-%Y') AS DATE)", query)
+        # Signed 32-bit range like CHECKSUM, so ABS(CHECKSUM(x) % n) behaves as on SQL Server
+        query = _CHECKSUM.sub(r'(CASE WHEN \1 IS NULL THEN NULL '
+                              r'ELSE CAST(hash(\1) % 4294967296 AS BIGINT) - 2147483648 END)', query)
+        return query, params
+
+    def begin(self, connection):
+        connection.begin()
+
+    def temp_table(self, name, like, columns='*'):
+        return name, f"CREATE TEMP TABLE {name} AS SELECT {columns} FROM {like} LIMIT 0"
+
+    def merge_into(self, table):
+        return f"MERGE INTO {table} AS t"
+
+    def bulk_insert_into(self, table):
+        return f"INSERT INTO {table}"
+
+    def app_lock(self, resource):
+        return None
+
+    def prepare_shadow(self, session, table, shadow, old, channel):
+        ddl = session.read_frame("SELECT sql FROM duckdb_tables() WHERE table_name = ?", [table])
+        _prepare_local_shadow(session, ddl.iloc[0, 0], shadow, old, channel)
+
+    def swap_channel(self, session, table, shadow, old, channel, columns):
+        _swap_local_channel(session, table, shadow, old, channel, columns)
+
+    def executemany(self, cursor, query, rows, input_sizes=None):
+        # DuckDB binds executemany row by row; an INSERT ... VALUES (?, ...) loads the rows as one frame instead
+        match = _INSERT_VALUES.match(query)
+        if match is None or not rows:
+            cursor.executemany(query, rows)
+            return
+        # object columns keep Python ints exact and None as NULL
+        cursor.connection.register('_insert_rows', pd.DataFrame(rows, dtype=object))
+        try:
+            cursor.execute(match.group(1) + ' SELECT * FROM _insert_rows')
+        finally:
+            cursor.connection.unregister('_insert_rows')
+
+
+_BACKENDS = {'mssql': MSSQLBackend, 'sqlite': SQLiteBackend, 'duckdb': DuckDBBackend}
+
+
+class Session:
+    """One checked-out connection; every statement goes through the backend's dialect translation"""
+
+    def __init__(self, pool, connection, record):
+        self.pool = pool
+        self.connection = connection
+        self.record = record
+
+    def execute(self, query, params=None):
+        query, params = self.pool.backend.prepare(query, params)
+        cursor = self.connection.cursor()
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor.rowcount if hasattr(cursor, 'rowcount') else None
+        finally:
+            cursor.close()
+
+    def executemany(self, query, rows, input_sizes=None):
+        query, _ = self.pool.backend.prepare(query, None)
+        cursor = self.connection.cursor()
+        try:
+            self.pool.backend.executemany(cursor, query, rows, input_sizes)
+        finally:
+            cursor.close()
+        self.record['rows'] = (self.record['rows'] or 0) + len(rows)
+
+    def commit(self):
+        """Commit the work so far and carry on in a new transaction"""
+        self.connection.commit()
+        self.pool.backend.begin(self.connection)
+
+    @contextmanager
+    def exclusive(self, resource):
+        """
+        Hold the backend's exclusive application lock on resource for the
+        block (nothing on single-writer stand-ins). The block's work is
+        committed before the lock is released, so the next holder sees it; a
+        block that raises releases it with the connection, which the pool closes.
+        """
+        lock = self.pool.backend.app_lock(resource)
+        if lock:
+            self.execute(lock[0])
+        yield
+        self.commit()
+        if lock:
+            self.execute(lock[1])
+
+    def temp_table_like(self, name, like, columns=None):
+        """
+        Empty temp table with the columns of table `like` (or only the listed
+        ones), replacing one left on this connection; returns its name
+        """
+        temp, create = self.pool.backend.temp_table(name, like, ', '.join(columns) if columns else '*')
+        self.execute(f"DROP TABLE IF EXISTS {temp}")
+        self.execute(create)
+        return temp
+
+    def read_frame(self, query, params=None):
+        query, params = self.pool.backend.prepare(query, params)
+        frame = read_frame(self.connection, query, params)
+        self.record['rows'] = (self.record['rows'] or 0) + len(frame)
+        return frame
+
+
+class ConnectionPool:
+    """
+    Reusable connections to one database. session() checks a connection out
+    (reusing an idle one, pinging it first if it sat idle past ping_after
+    seconds), and returns it afterwards; a connection that raised is closed
+    instead of reused. Every checkout is timed: connect_s is the time to get
+    a usable connection, wall_s the whole call. take_calls() drains the log.
+    """
+
+    def __init__(self, config, size=POOL_SIZE, ping_after=PING_AFTER_S):
+        backend = config.get('backend', 'mssql')
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown database backend {backend!r}, expected one of {DB_BACKENDS}")
+        self.backend = _BACKENDS[backend]()
+        self.config = dict(config)
+        self.size = size
+        self.ping_after = ping_after
+        self.idle = []
+        self.calls = deque(maxlen=CALL_LOG_SIZE)
+        self.lock = threading.Lock()
+
+    @property
+    def Error(self):
+        return self.backend.Error
+
+    def _alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute(PING_QUERY)
+            cursor.fetchall()
+            cursor.close()
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self, record):
+        while True:
+            with self.lock:
+                connection, idle_since = self.idle.pop() if self.idle else (None, None)
+            if connection is None:
+                return self.backend.connect(self.config)
+            if time.monotonic() - idle_since < self.ping_after or self._alive(connection):
+                record['reused'] = True
+                return connection
+            _close(connection)
+
+    def _checkin(self, connection):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((connection, time.monotonic()))
+                return
+        _close(connection)
+
+    @contextmanager
+    def session(self, label, transaction=False):
+        """
+        Session on a pooled connection. With transaction=True the work is
+        committed when the block succeeds and rolled back if it raises;
+        otherwise it is rolled back on return, so reads leave no transaction open.
+        """
+        record = {'call': label, 'backend': self.backend.name, 'reused': False, 'rows': None, 'ok': False}
+        start = time.perf_counter()
+        connection = self._checkout(record)
+        record['connect_s'] = round(time.perf_counter() - start, 4)
+        try:
+            if transaction:
+                self.backend.begin(connection)
+            yield Session(self, connection, record)
+            if transaction:
+                connection.commit()
+            else:
+                connection.rollback()
+            record['ok'] = True
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            _close(connection)
+            connection = None
+            raise
+        finally:
+            record['wall_s'] = round(time.perf_counter() - start, 4)
+            self.calls.append(record)
+            if connection is not None:
+                self._checkin(connection)
+
+    def read_frame(self, query, params=None, label='query'):
+        """Query result as a DataFrame (ars_fetch.read_frame) on a pooled connection"""
+        with self.session(label) as session:
+            return session.read_frame(query, params)
+
+    def take_calls(self):
+        """Timing records of the calls since the last take_calls()"""
+        calls = []
+        while self.calls:
+            calls.append(self.calls.popleft())
+        return calls
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            _close(connection)
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(config):
+    """
+    The pool for a DB_CONFIG dict, created on first use. Pools are per
+    process (connections are not shared with forked workers) and per
+    config, so changing DB_CONFIG (e.g. a staging server) gets its own pool.
+    """
+    key = (os.getpid(), tuple(sorted((k, str(v)) for k, v in config.items())))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(config)
+    return pool
+
+
+def close_pools():
+    with _POOLS_LOCK:
+        pools = [pool for (pid, _), pool in _POOLS.items() if pid == os.getpid()]
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+# Ties between weekdays go to the alphabetically first day name, as idxmax
+# over the unstacked day_name columns did
+_TIE_ORDER = np.argsort(DAY_NAMES)
+# Weekday unit and invoice line sums as frame columns, Monday first (ars_state moments)
+UNIT_SUM_COLUMNS = [f"units_{day}" for day in DAY_NAMES]
+LINE_SUM_COLUMNS = [f"lines_{day}" for day in DAY_NAMES]
+# Share of a store-SKU's units sold on each weekday, for phasing deliveries
+SHARE_COLUMNS = [f"share_{day}" for day in DAY_NAMES]
+
+
+class WeekdayProfile:
+    """
+    Per store-SKU weekday demand: mean units per invoice line by weekday
+    (NaN on weekdays without sales), share of units sold on each weekday,
+    and the peak day. Rows follow the pair codes they were built from.
+    """
+
+    def __init__(self, line_means, unit_shares):
+        self.line_means = line_means
+        self.unit_shares = unit_shares
+
+    @staticmethod
+    def weekday_sums(pair_codes, n_pairs, dates, values):
+        """(pairs x 7) sums of values by weekday with one bincount, Monday first"""
+        day_number = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        # 1970-01-01 was a Thursday; Monday = 0
+        weekday = (day_number + 3) % 7
+        cell = pair_codes * 7 + weekday
+        weights = values.to_numpy(dtype=float)
+        return np.bincount(cell, weights=weights, minlength=n_pairs * 7).reshape(n_pairs, 7)
+
+    @classmethod
+    def from_sums(cls, unit_sums, line_sums):
+        """Profile from (pairs x 7) unit and invoice line sums, e.g. the persisted ars_state moments"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            line_means = np.where(line_sums > 0, unit_sums / line_sums, np.nan)
+            unit_shares = unit_sums / unit_sums.sum(axis=1, keepdims=True)
+        return cls(line_means, unit_shares)
+
+    @classmethod
+    def from_buckets(cls, pair_codes, n_pairs, dates, units, n_lines):
+        """Accumulate daily buckets into (pairs x 7) sums with one bincount per measure"""
+        return cls.from_sums(
+            cls.weekday_sums(pair_codes, n_pairs, dates, units),
+            cls.weekday_sums(pair_codes, n_pairs, dates, n_lines)
+        )
+
+    def peak_day(self):
+        """Weekday name with the highest mean units per line"""
+        ordered = self.line_means[:, _TIE_ORDER]
+        missing = np.isnan(ordered)
+        best = np.argmax(np.where(missing, -np.inf, ordered), axis=1)
+        peak = DAY_NAMES[_TIE_ORDER[best]]
+        peak[missing.all(axis=1)] = None
+        return peak
+
+    def shares_frame(self, decimals=3):
+        """Weekday unit shares as columns share_Monday ... share_Sunday (NaN without net units sold)"""
+        return pd.DataFrame(self.unit_shares, columns=SHARE_COLUMNS).round(decimals)
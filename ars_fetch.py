@@ -0,0 +1,117 @@
+import datetime
+import decimal
+
+import numpy as np
+import pandas as pd
+
+# Rows per cursor.fetchmany call; only one batch of Python row objects is alive at a time
+FETCH_BATCH_ROWS = 50_000
+
+_FLOAT_TYPES = (float, decimal.Decimal)
+
+
+def _column_kind(type_code):
+    """Column kind from a cursor.description type code (pyodbc reports Python types); None to infer"""
+    if not isinstance(type_code, type) or issubclass(type_code, bool):
+        return None
+    if issubclass(type_code, int):
+        return 'int'
+    if issubclass(type_code, _FLOAT_TYPES):
+        return 'float'
+    if issubclass(type_code, datetime.datetime):
+        return 'datetime'
+    if issubclass(type_code, str):
+        return 'str'
+    return None
+
+
+def _to_array(values, kind):
+    """
+    One column of a batch (object array of Python values) as a typed array,
+    with the dtypes pd.read_sql gives: integers with NULLs and decimals become
+    float64, datetimes datetime64[ns]. Columns without a usable declared type
+    (SQLite reports none) are inferred from the values.
+    """
+    if kind in ('int', 'float'):
+        nulls = values == None  # noqa: E711, elementwise on an object array
+        if nulls.any():
+            values = np.where(nulls, np.nan, values)
+            return values.astype(float)
+        return values.astype(np.int64 if kind == 'int' else float)
+    if kind == 'datetime':
+        return values.astype('datetime64[ns]')
+    if kind == 'str':
+        return values.copy()
+    return pd.Series(values).infer_objects().to_numpy()
+
+
+def _transpose(rows, n_columns):
+    """Object array per column of a list of row tuples / pyodbc Rows"""
+    block = np.array(rows, dtype=object)
+    if block.ndim == 2 and block.shape[1] == n_columns:
+        return list(block.T)
+    # Rows holding sequences (e.g. binary values) do not make a clean 2-D block
+    columns = []
+    for values in zip(*rows):
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        columns.append(column)
+    return columns
+
+
+def _concat_column(chunks):
+    """Batches of one column as one array; batches typed apart (e.g. all NULL) are re-inferred together"""
+    if len(chunks) == 1:
+        return chunks[0]
+    if all(chunk.dtype != object for chunk in chunks) or all(chunk.dtype == object for chunk in chunks):
+        return np.concatenate(chunks)
+    objects = np.concatenate([chunk.astype(object) for chunk in chunks])
+    return pd.Series(objects, copy=False).infer_objects().to_numpy()
+
+
+def _frame(names, arrays):
+    # Positional build, so repeated column names survive as in pd.read_sql
+    frame = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+    frame.columns = names
+    return frame
+
+
+def _execute(connection, query, params):
+    cursor = connection.cursor()
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+    return cursor
+
+
+def _column_batches(cursor, batch_rows):
+    """(column names, [array per column]) for each fetchmany batch of an executed cursor"""
+    names = [column[0] for column in cursor.description]
+    kinds = [_column_kind(column[1]) for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        columns = _transpose(rows, len(names))
+        del rows
+        yield names, [_to_array(values, kind) for values, kind in zip(columns, kinds)]
+
+
+def read_frame(connection, query, params=None, batch_rows=FETCH_BATCH_ROWS):
+    """
+    pd.read_sql replacement: the same DataFrame, built from fetchmany batches
+    converted straight to column arrays instead of one list of row tuples.
+    """
+    cursor = _execute(connection, query, params)
+    try:
+        names = [column[0] for column in cursor.description]
+        chunks = [[] for _ in names]
+        for _, arrays in _column_batches(cursor, batch_rows):
+            for column_chunks, array in zip(chunks, arrays):
+                column_chunks.append(array)
+    finally:
+        cursor.close()
+    if not chunks or not chunks[0]:
+        return pd.DataFrame(columns=names)
+    return _frame(names, [_concat_column(column_chunks) for column_chunks in chunks])
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+# Smoothing constants; intermittent-demand methods use the low alphas usual
+# for slow movers
+FORECAST_PARAMS = {
+    'ses_alpha': 0.2,
+    'croston_alpha': 0.1,
+    'tsb_alpha': 0.1,
+    'tsb_beta': 0.1,
+}
+# Syntetos-Boylan cut-offs on average inter-demand interval and squared CV
+# of the non-zero demand sizes
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+# A series whose last sale is this many average intervals old is treated as
+# fading out and forecast with TSB, which decays with the demand probability
+STALE_INTERVALS = 2.0
+CHUNK_ROWS = 200_000
+
+PATTERNS = np.array(['smooth', 'erratic', 'intermittent', 'lumpy', 'no demand'], dtype=object)
+METHODS = np.array(['SES', 'Croston', 'SBA', 'TSB', 'None'], dtype=object)
+
+
+def demand_pattern_stats(y):
+    """ADI, CV^2 of non-zero sizes and weeks since the last sale for a (series x weeks) block"""
+    n_weeks = y.shape[1]
+    nonzero = y > 0
+    n_nonzero = nonzero.sum(axis=1)
+    sizes = np.where(nonzero, y, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        adi = n_weeks / n_nonzero
+        mean_size = sizes.sum(axis=1) / n_nonzero
+        var_size = (sizes ** 2).sum(axis=1) / n_nonzero - mean_size ** 2
+        cv2 = np.clip(var_size, 0, None) / mean_size ** 2
+    last_sale = n_weeks - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    weeks_since_sale = np.where(n_nonzero > 0, n_weeks - 1 - last_sale, n_weeks)
+    return adi, cv2, weeks_since_sale, n_nonzero
+
+
+def forecast_all_methods(y, params=FORECAST_PARAMS):
+    """
+    One-step-ahead weekly forecast of every method for a (series x weeks)
+    block. The recursions step through the weeks; each step updates all
+    series at once.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n_series, n_weeks = y.shape
+    a_ses = params['ses_alpha']
+    a_cro = params['croston_alpha']
+    a_tsb, b_tsb = params['tsb_alpha'], params['tsb_beta']
+
+    nonzero = y > 0
+    n_nonzero = nonzero.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_size = np.where(n_nonzero > 0, y.sum(axis=1, where=nonzero) / n_nonzero, 0)
+
+    level = y[:, 0].copy()
+    size = np.zeros(n_series)
+    interval = np.ones(n_series)
+    since = np.zeros(n_series)
+    seen = np.zeros(n_series, dtype=bool)
+    probability = nonzero.mean(axis=1)
+    tsb_size = mean_size.copy()
+
+    for week in range(n_weeks):
+        demand = y[:, week]
+        sold = nonzero[:, week]
+        if week > 0:
+            level += a_ses * (demand - level)
+        since += 1
+        first = sold & ~seen
+        update = sold & seen
+        # Croston / SBA: size and interval only move in weeks with a sale
+        size = np.where(first, demand, np.where(update, size + a_cro * (demand - size), size))
+        interval = np.where(first, since, np.where(update, interval + a_cro * (since - interval), interval))
+        since = np.where(sold, 0, since)
+        seen |= sold
+        # TSB: demand probability decays every week, size moves on sales
+        probability += b_tsb * (sold - probability)
+        tsb_size = np.where(sold, tsb_size + a_tsb * (demand - tsb_size), tsb_size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        croston = np.where(seen, size / interval, 0)
+    return {
+        'SES': np.clip(level, 0, None),
+        'Croston': croston,
+        'SBA': croston * (1 - a_cro / 2),
+        'TSB': probability * tsb_size,
+    }
+
+
+def select_methods(adi, cv2, weeks_since_sale, n_nonzero):
+    """Demand pattern and forecasting method index per series"""
+    intermittent = adi >= ADI_CUTOFF
+    variable = cv2 >= CV2_CUTOFF
+    pattern = np.select(
+        [n_nonzero == 0, ~intermittent & ~variable, ~intermittent & variable, intermittent & ~variable],
+        [4, 0, 1, 2],
+        default=3
+    )
+    # smooth -> SES, erratic/lumpy -> SBA, intermittent -> Croston, fading -> TSB
+    method = np.select([pattern == 4, pattern == 0, pattern == 2], [4, 0, 1], default=2)
+    fading = (n_nonzero > 0) & (pattern != 0) & (weeks_since_sale >= STALE_INTERVALS * adi)
+    method = np.where(fading, 3, method)
+    return pattern, method
+
+
+def forecast_block(y, params=FORECAST_PARAMS):
+    adi, cv2, weeks_since_sale, n_nonzero = demand_pattern_stats(y)
+    pattern, method = select_methods(adi, cv2, weeks_since_sale, n_nonzero)
+    forecasts = forecast_all_methods(y, params)
+    stacked = np.vstack([forecasts[name] for name in METHODS[:4]] + [np.zeros(len(y))])
+    chosen = stacked[method, np.arange(len(y))]
+    return pattern, method, chosen
+
+
+def forecast_cube(cube, params=FORECAST_PARAMS, chunk_rows=CHUNK_ROWS):
+    """
+    Weekly demand forecast for every store-SKU row of a DemandCube, with the
+    method picked per series from its demand pattern. Zero weeks of the cube
+    count as weeks without demand. Returns a frame aligned to the cube rows.
+    """
+    n_rows = len(cube.pair_store)
+    patterns = np.empty(n_rows, dtype=np.int64)
+    methods = np.empty(n_rows, dtype=np.int64)
+    values = np.empty(n_rows)
+    for start in range(0, n_rows, chunk_rows):
+        rows = slice(start, min(start + chunk_rows, n_rows))
+        y = cube.dense_units(rows, dtype=np.float64)
+        patterns[rows], methods[rows], values[rows] = forecast_block(y, params)
+    return pd.DataFrame({
+        'demand_pattern': PATTERNS[patterns],
+        'forecast_method': METHODS[methods],
+        'forecast_weekly_sales': values.round(3)
+    })
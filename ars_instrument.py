@@ -0,0 +1,179 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REPORT_DIR = 'E:/Nykaa_Analysis/run_reports'
+
+
+def _peak_rss_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def _peak_rss_linux():
+    # VmHWM belongs to this process image; ru_maxrss carries over the parent's peak across fork/exec
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) << 10
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB, None if the platform does not report it"""
+    try:
+        if sys.platform.startswith('linux') and os.path.exists('/proc/self/status'):
+            peak = _peak_rss_linux()
+            if peak is not None:
+                return round(peak / (1 << 20), 1)
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux reports KB, macOS bytes
+            return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+        if sys.platform == 'win32':
+            peak = _peak_rss_windows()
+            return None if peak is None else round(peak / (1 << 20), 1)
+    except Exception:
+        return None
+    return None
+
+
+def rows(value):
+    """Row count of a frame (or any sized value), None when not given"""
+    return None if value is None else len(value)
+
+
+class _Stage:
+    """Context manager measuring one stage; the caller may set rows_out and extra fields on .record"""
+
+    def __init__(self, report, name, rows_in):
+        self.report = report
+        self.record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        self.profiler = None
+
+    def __enter__(self):
+        if self.report.trace_memory:
+            tracemalloc.reset_peak()
+            self.traced_start = tracemalloc.get_traced_memory()[0]
+        self.rss_start = peak_rss_mb()
+        if self.record['stage'] == self.report.profile_stage:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.record['profile'] = self.report.dump_profile(self.profiler, self.record['stage'])
+        rss = peak_rss_mb()
+        self.record.update({
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'peak_rss_mb': rss,
+            'peak_rss_growth_mb': None if rss is None or self.rss_start is None else round(rss - self.rss_start, 1),
+            'ok': exc_type is None
+        })
+        if self.report.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.record['traced_peak_mb'] = round((peak - self.traced_start) / 1e6, 1)
+            self.record['traced_delta_mb'] = round((current - self.traced_start) / 1e6, 1)
+        self.report.records.append(self.record)
+        return False
+
+
+class RunReport:
+    """
+    Per-channel stage report. Each `with report.stage(name, rows_in=n) as
+    stage:` block records wall and CPU seconds, the process peak RSS and
+    its growth during the stage, and rows in/out (set stage['rows_out']).
+    CPU time is for the whole process, so it includes the background
+    output writer threads; stages must not be nested.
+    trace_memory adds tracemalloc peak/delta per stage, at a large cost.
+    profile_stage names one stage to run under cProfile; its stats go to
+    a .prof file next to the report. write() appends the records as JSON
+    lines to <report_dir>/ars_run_<channel>.jsonl, one run id per run.
+    """
+
+    def __init__(self, channel, report_dir=REPORT_DIR, profile_stage=None, trace_memory=False):
+        self.channel = channel
+        self.report_dir = report_dir
+        self.profile_stage = profile_stage
+        self.trace_memory = trace_memory
+        self.run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.records = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name, rows_in=None):
+        return _Stage(self, name, rows_in)
+
+    def _file_stem(self):
+        return ''.join(c if c.isalnum() else '_' for c in self.channel)
+
+    def dump_profile(self, profiler, stage):
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"ars_run_{self._file_stem()}_{self.run_id}_{stage}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    def write(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"ars_run_{self._file_stem()}.jsonl")
+        with open(path, 'a') as f:
+            for record in self.records:
+                f.write(json.dumps({'run_id': self.run_id, 'channel': self.channel, **record}, default=str) + '\n')
+        total = sum(record['wall_s'] for record in self.records)
+        print(f"Run report for {self.channel}: {len(self.records)} stages, {total:.1f}s -> {path}")
+        return path
+
+
+class _NullStage:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullReport:
+    """Stand-in when instrumentation is off: stages cost one method call"""
+
+    def stage(self, name, rows_in=None):
+        return _NULL_STAGE
+
+    def write(self):
+        return None
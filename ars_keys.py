@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['store_id', 'sku_id']
+
+
+def _codes_and_labels(values):
+    """Integer codes plus string labels for a key column, converting only the distinct values"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), pd.Index(values.cat.categories.astype(str))
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes, pd.Index(pd.Index(uniques).astype(str))
+
+
+def _recode(codes, mapping):
+    """Translate codes through mapping, keeping -1 (missing) as -1"""
+    return np.where(codes >= 0, mapping[codes], -1) if len(mapping) else np.full(len(codes), -1)
+
+
+def as_key_categorical(values):
+    """
+    String-valued categorical for a store/SKU id column. Same labels as
+    values.astype(str), but only the distinct ids are converted to strings.
+    """
+    codes, labels = _codes_and_labels(values)
+    vocabulary = labels.unique().sort_values()
+    return pd.Series(
+        pd.Categorical.from_codes(_recode(codes, vocabulary.get_indexer(labels)), vocabulary),
+        index=values.index,
+        name=values.name
+    )
+
+
+class KeyEncoder:
+    """
+    One shared, sorted vocabulary per key column (store_id, sku_id). Frames
+    encoded with the same encoder carry identical categories, so merges and
+    groupbys run on integer codes. Categorical columns write out as their
+    string labels in CSV/Excel/DB output.
+    """
+
+    def __init__(self, vocabularies):
+        self.vocabularies = vocabularies
+
+    @classmethod
+    def fit(cls, *frames, columns=KEY_COLUMNS):
+        vocabularies = {}
+        for column in columns:
+            labels = [
+                _codes_and_labels(frame[column])[1]
+                for frame in frames
+                if frame is not None and column in frame.columns
+            ]
+            vocabulary = labels[0].append(labels[1:]) if labels else pd.Index([], dtype=object)
+            vocabularies[column] = vocabulary.unique().sort_values()
+        return cls(vocabularies)
+
+    def encode(self, frame):
+        """Copy of frame with its key columns recoded to the shared vocabulary"""
+        if frame is None:
+            return None
+        frame = frame.copy()
+        for column, vocabulary in self.vocabularies.items():
+            if column not in frame.columns:
+                continue
+            codes, labels = _codes_and_labels(frame[column])
+            frame[column] = pd.Categorical.from_codes(_recode(codes, vocabulary.get_indexer(labels)), vocabulary)
+        return frame
+
+    def size(self, column):
+        return len(self.vocabularies[column])
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from ars_dow import SHARE_COLUMNS
+from ars_rules import compile_segment_rules, compile_quantile_buckets, compile_service_levels
+
+KEYS = ['store_id', 'sku_id']
+LEAD_TIME_WEEKS = 3
+# Weeks of average demand a refill brings stock up to, before safety stock
+REFILL_COVER_WEEKS = 8
+
+SALES_COLUMNS = [
+    'total_sales', 'total_sales_value', 'total_sales_days', 'weeks_of_data', 'total_weeks',
+    'sales_std', 'avg_weekly_sales', 'avg_weekly_revenue', 'sale_frequency_in_weeks'
+]
+VELOCITY_COLUMNS = ['sales_velocity', 'avg_sales_90day', 'avg_sales_30day']
+FORECAST_COLUMNS = ['demand_pattern', 'forecast_method', 'forecast_weekly_sales']
+
+
+def _key_index(columns):
+    """Index over one or more key columns; categorical keys stay as integer codes"""
+    if len(columns) == 1:
+        return pd.Index(columns[0])
+    return pd.MultiIndex.from_arrays(columns)
+
+
+def _lookup(table, key_columns, value_columns, keys, unique=False):
+    """
+    Values of a dimension table for each key, first row per key wins.
+    The result is aligned to keys positionally (NaN where a key is missing).
+    unique: raise if the table holds a key more than once.
+    """
+    table_keys = _key_index([table[column] for column in key_columns])
+    first = ~table_keys.duplicated()
+    if unique and not first.all():
+        raise ValueError(f"{key_columns} is not unique in {value_columns} data")
+    positions = table_keys[first].get_indexer(keys)
+    values = table.loc[first, value_columns].reset_index(drop=True)
+    return values.reindex(positions)
+
+
+def build_store_sku_metrics(sales_summary, stock_data, plano_data, sku_master, rules, lead_time_weeks=LEAD_TIME_WEEKS,
+                            cover_weeks=REFILL_COVER_WEEKS, use_forecast=False, store_bucket=None):
+    """
+    Store-SKU metrics table keyed on (store_id, sku_id).
+
+    Every feature stage writes its columns into one keyed frame by index
+    alignment instead of merging a growing frame; planogram mdq, SKU master
+    and store name/channel are looked up against the key index. Returned
+    flat, one row per store-SKU with sales.
+
+    use_forecast: size refill_level and weeks_until_stockout on
+    forecast_weekly_sales (summary built with forecast=True) instead of the
+    average weekly sales and 90-day velocity.
+
+    store_bucket: performance_bucket per store_id when sales_summary holds
+    only some of the channel's stores (ars_shards.store_buckets); computed
+    from this table's store revenue if not given.
+    """
+    # 1. Basic Store-SKU Performance Metrics, indexed on the store-SKU key
+    metrics = sales_summary[SALES_COLUMNS].copy()
+    index = _key_index([sales_summary[column] for column in KEYS])
+    metrics.index = index
+
+    # 2. Current stock and Stock Coverage
+    current_stock = _lookup(stock_data, KEYS, 'current_stock', index, unique=True).to_numpy()
+    metrics['current_stock'] = pd.Series(current_stock, index=index).replace([np.inf, -np.inf, 0, ''], np.nan).fillna(0)
+    metrics['weeks_coverage'] = (
+        metrics['current_stock'] / metrics['avg_weekly_sales']
+    ).replace([np.inf, -np.inf, ''], np.nan).round(2).fillna(0)
+
+    # 3. Sales Velocity (last 90/30 days)
+    for column in VELOCITY_COLUMNS:
+        velocity = sales_summary[column].replace([np.inf, -np.inf, 0, '', ' '], np.nan).fillna(0)
+        metrics[column] = velocity.to_numpy()
+    if use_forecast:
+        for column in FORECAST_COLUMNS:
+            metrics[column] = sales_summary[column].to_numpy()
+        demand_rate = metrics['forecast_weekly_sales']
+        stockout_rate = metrics['forecast_weekly_sales']
+    else:
+        demand_rate = metrics['avg_weekly_sales']
+        stockout_rate = metrics['sales_velocity']
+
+    # 4. SKU Segmentation and store performance buckets
+    metrics['revenue_rank'] = metrics.groupby(level='store_id', observed=True)['avg_weekly_revenue'].rank(ascending=False).round()
+    metrics['sku_segment'] = compile_segment_rules(rules['sku_segment'])(metrics)
+    if store_bucket is None:
+        store_revenue = metrics.groupby(level='store_id', observed=True)['avg_weekly_revenue'].sum()
+        store_bucket = compile_quantile_buckets(rules['performance_bucket'])(store_revenue)
+    store_rows = store_bucket.index.get_indexer(index.get_level_values('store_id'))
+    metrics['performance_bucket'] = store_bucket.to_numpy()[store_rows]
+
+    # 5. Safety Stock and Reorder Points, at least the planogram mdq
+    service_level_z = compile_service_levels(rules['service_level_z'])
+    metrics['safety_stock'] = (
+        service_level_z(metrics['sku_segment']) * metrics['sales_std'] * np.sqrt(lead_time_weeks)
+    ).round(2)
+    metrics['refill_level'] = (demand_rate * cover_weeks + metrics['safety_stock']).round()
+    metrics['mdq'] = _lookup(plano_data, KEYS, 'mdq', index).to_numpy()
+    metrics['refill_level'] = metrics[['refill_level', 'mdq']].max(axis=1)
+
+    # 6. Lost Sales Risk Analysis
+    metrics['weeks_until_stockout'] = np.where(
+        stockout_rate > 0,
+        metrics['current_stock'] / stockout_rate,
+        float('inf')
+    ).round(1)
+    metrics['potential_revenue_loss'] = np.where(
+        metrics['weeks_coverage'] < lead_time_weeks,
+        metrics['avg_weekly_revenue'] * (lead_time_weeks - metrics['weeks_coverage']),
+        0
+    ).astype(int)
+
+    # 7. Day of Week Patterns: peak day and the weekday unit shares deliveries can be phased on
+    metrics['peak_day'] = sales_summary['peak_day'].to_numpy()
+    for column in SHARE_COLUMNS:
+        metrics[column] = sales_summary[column].to_numpy()
+
+    # 8. Dimensions, attached once against the key index
+    sku_columns = ['brand_line', 'sku_name', 'MRP']
+    sku_dims = _lookup(sku_master, ['sku_id'], sku_columns, index.get_level_values('sku_id'))
+    store_dims = _lookup(plano_data, ['store_id'], ['store_name', 'channel'], index.get_level_values('store_id'))
+    for frame in (sku_dims, store_dims):
+        for column in frame.columns:
+            metrics[column] = frame[column].to_numpy()
+
+    # Flat output: key columns in front, without copying the metric columns again
+    metrics.index = sales_summary.index
+    metrics.insert(0, 'sku_id', sales_summary['sku_id'])
+    metrics.insert(0, 'store_id', sales_summary['store_id'])
+    return metrics
@@ -0,0 +1,118 @@
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+OUTPUT_DIR = 'E:/Nykaa_Analysis'
+OUTPUT_FORMATS = ('csv', 'parquet')
+# Excel sheet limit, header row included
+EXCEL_MAX_ROWS = 1048576
+EXCEL_CHUNK_ROWS = 50000
+
+
+def _excel_cells(frame):
+    """Columns of a row chunk as Python values: NaN -> empty cell, +-inf -> 'inf'/'-inf' like to_excel"""
+    columns = []
+    for _, values in frame.items():
+        cells = values.to_numpy(dtype=object)
+        missing = pd.isna(values).to_numpy()
+        if missing.any():
+            cells[missing] = None
+        if pd.api.types.is_float_dtype(values):
+            infinite = np.isinf(values.to_numpy())
+            cells[infinite] = np.where(values.to_numpy()[infinite] > 0, 'inf', '-inf')
+        columns.append(cells)
+    return zip(*columns)
+
+
+def _sheet_names(name, n_sheets):
+    """name, name_2, name_3 ... within Excel's 31 character limit"""
+    names = [name[:31]]
+    for part in range(2, n_sheets + 1):
+        suffix = f"_{part}"
+        names.append(name[:31 - len(suffix)] + suffix)
+    return names
+
+
+def write_excel_streaming(path, sheets, max_rows=EXCEL_MAX_ROWS, chunk_rows=EXCEL_CHUNK_ROWS):
+    """
+    Write {sheet name: frame} with openpyxl's write-only workbook, which
+    streams rows to disk instead of holding every cell in memory. A frame
+    longer than one sheet continues on <sheet>_2, <sheet>_3 ...
+    """
+    from openpyxl import Workbook
+
+    rows_per_sheet = max_rows - 1
+    workbook = Workbook(write_only=True)
+    for name, frame in sheets.items():
+        n_sheets = max(1, math.ceil(len(frame) / rows_per_sheet))
+        for part, sheet_name in enumerate(_sheet_names(name, n_sheets)):
+            sheet = workbook.create_sheet(sheet_name)
+            sheet.append([str(column) for column in frame.columns])
+            sheet_rows = frame.iloc[part * rows_per_sheet:(part + 1) * rows_per_sheet]
+            for start in range(0, len(sheet_rows), chunk_rows):
+                for row in _excel_cells(sheet_rows.iloc[start:start + chunk_rows]):
+                    sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def write_table(frame, stem, formats=('csv',), output_dir=OUTPUT_DIR):
+    """Write frame as <stem>.csv and/or <stem>.parquet; returns the paths written"""
+    paths = []
+    for output_format in formats:
+        path = os.path.join(output_dir, f"{stem}.{output_format}")
+        if output_format == 'csv':
+            frame.to_csv(path, index=False)
+        elif output_format == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+        paths.append(path)
+    return paths
+
+
+class ArtifactWriter:
+    """
+    Writes ARS output files on a small thread pool so CSV, Parquet and Excel
+    writing overlaps the rest of the channel run. Frames handed over must not
+    be modified afterwards. wait() blocks until every file is written and
+    re-raises the first failure. timings holds the write seconds per file.
+    """
+
+    def __init__(self, formats=('csv',), output_dir=OUTPUT_DIR, max_workers=4):
+        self.formats = tuple(formats)
+        self.output_dir = output_dir
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ars-output')
+        self.pending = []
+        self.timings = {}
+
+    def _timed(self, name, write, *args):
+        start = time.perf_counter()
+        try:
+            return write(*args)
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def table(self, frame, stem):
+        future = self.pool.submit(self._timed, stem, write_table, frame, stem, self.formats, self.output_dir)
+        self.pending.append((stem, future))
+
+    def excel(self, file_name, sheets):
+        path = os.path.join(self.output_dir, file_name)
+        self.pending.append((file_name, self.pool.submit(self._timed, file_name, write_excel_streaming, path, sheets)))
+
+    def wait(self):
+        errors = []
+        for name, future in self.pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error writing {name}: {str(e)}")
+                errors.append(e)
+        self.pending = []
+        self.pool.shutdown()
+        if errors:
+            raise errors[0]
@@ -0,0 +1,100 @@
+import pandas as pd
+import numpy as np
+
+HIGH_VALUE_SEGMENTS = ['A - High Value', 'B - Regular']
+LOW_VALUE_SEGMENTS = ['C - Moderate', 'D - Slow Moving']
+
+RECOMMENDATION_COLUMNS = [
+    'store_id', 'store_name', 'sku_id', 'brand_line', 'sku_name', 'mdq',
+    'avg_sale_unit_weekly', 'avg_mrp_sales_weekly', 'current_stock', 'store_type',
+    'priority', 'category', 'inventory_weeks', 'refill_level', 'reorder_qty',
+    'potential_revenue_loss', 'action'
+]
+
+
+def _fmt(values, spec):
+    """Format a numeric column with a printf style spec, e.g. '%.1f'"""
+    return pd.Series(np.char.mod(spec, np.asarray(values, dtype=float)), index=values.index, dtype=object)
+
+
+def build_sku_recommendations(store_sku_metrics, lead_time=3):
+    """
+    Build the store-SKU recommendation table column-wise.
+
+    Gives the same rows, in the same order, as the four iterrows blocks it
+    replaced: critical (A/B), medium (C/D), overstock A/B and overstock C/D.
+    A store-SKU can appear in both a stock alert and an overstock block.
+    """
+    metrics = store_sku_metrics.reset_index(drop=True)
+    segment = metrics['sku_segment']
+    high_value = segment.isin(HIGH_VALUE_SEGMENTS).to_numpy()
+    low_value = segment.isin(LOW_VALUE_SEGMENTS).to_numpy()
+
+    # 1. Stock alerts and overstock situations as boolean masks
+    overstock_threshold = lead_time + 1
+    stock_alert = (metrics['weeks_until_stockout'] < lead_time).to_numpy() & (high_value | low_value)
+    overstock = (metrics['weeks_coverage'] > overstock_threshold).to_numpy() & (high_value | low_value)
+
+    alert_rows = np.flatnonzero(stock_alert)
+    overstock_rows = np.flatnonzero(overstock)
+    rows = np.concatenate([alert_rows, overstock_rows])
+    is_alert = np.concatenate([
+        np.ones(len(alert_rows), dtype=bool),
+        np.zeros(len(overstock_rows), dtype=bool)
+    ])
+    is_high = high_value[rows]
+
+    # Block order of the old loops: critical, medium, overstock A/B, overstock C/D
+    block = np.select(
+        [is_alert & is_high, is_alert, is_high],
+        [0, 1, 2],
+        default=3
+    )
+    order = np.lexsort((rows, block))
+    rows, is_alert, block = rows[order], is_alert[order], block[order]
+
+    selected = metrics.iloc[rows].reset_index(drop=True)
+    priority = np.select([block == 0, block == 1, block == 2], ['CRITICAL', 'Medium', 'MEDIUM'], default='Low')
+    category = np.select([is_alert], ['Stock Alert'], default='Inventory Optimization')
+
+    # 2. Order quantities: refill gap for alerts, surplus for overstock
+    refill_gap = selected['refill_level'] - selected['current_stock']
+    surplus = selected['current_stock'] - selected['refill_level']
+    reorder_qty = refill_gap.where(is_alert, surplus)
+
+    # 3. Action text built column-wise; alert rows sort ahead of overstock rows
+    n_alert = int(is_alert.sum())
+    sku_text = selected['sku_id'].astype(str)
+    alerts = selected.iloc[:n_alert]
+    alert_action = (
+        'SKU ' + sku_text.iloc[:n_alert] + ' (' + alerts['sku_segment'].astype(str) + ') will stockout in '
+        + _fmt(alerts['weeks_until_stockout'], '%.1f') + ' weeks. '
+        + 'Order ' + _fmt(np.maximum(refill_gap.iloc[:n_alert], 0), '%.0f') + ' units. '
+        + 'Potential weekly revenue loss: INR ' + _fmt(alerts['potential_revenue_loss'], '%.2f')
+    )
+    overstock_action = (
+        'Excess inventory of SKU ' + sku_text.iloc[n_alert:] + '. Consider redistributing '
+        + _fmt(surplus.iloc[n_alert:], '%.0f') + ' units. '
+        + 'Current coverage: ' + _fmt(selected['weeks_coverage'].iloc[n_alert:], '%.1f') + ' weeks'
+    )
+
+    recommendations = pd.DataFrame({
+        'store_id': selected['store_id'],
+        'store_name': selected['store_name'],
+        'sku_id': selected['sku_id'],
+        'brand_line': selected['brand_line'],
+        'sku_name': selected['sku_name'],
+        'mdq': selected['mdq'],
+        'avg_sale_unit_weekly': selected['avg_weekly_sales'],
+        'avg_mrp_sales_weekly': selected['avg_weekly_revenue'],
+        'current_stock': selected['current_stock'],
+        'store_type': selected['performance_bucket'],
+        'priority': priority,
+        'category': category,
+        'inventory_weeks': selected['weeks_until_stockout'],
+        'refill_level': selected['refill_level'],
+        'reorder_qty': reorder_qty,
+        'potential_revenue_loss': selected['potential_revenue_loss'],
+        'action': pd.concat([alert_action, overstock_action])
+    }, columns=RECOMMENDATION_COLUMNS)
+    return recommendations
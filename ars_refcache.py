@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from datetime import datetime
+
+# Typed reference frames (merged planogram, store and SKU masters) cached as
+# Parquet next to a JSON manifest of their source files. An entry is reused
+# while every source keeps its content hash; size/mtime only decide whether
+# the hash has to be recomputed.
+CACHE_DIR = 'E:/Nykaa_Analysis/ref_cache'
+# Bump when a builder changes the shape or types of what it returns
+CACHE_VERSION = 1
+
+
+def _file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_signatures(paths, known):
+    """size, mtime and sha1 per source file; reuses the known hash when size and mtime match"""
+    signatures = []
+    for path in paths:
+        stat = os.stat(path)
+        previous = known.get(os.path.abspath(path), {})
+        if previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+            sha1 = previous['sha1']
+        else:
+            sha1 = _file_sha1(path)
+        signatures.append({
+            'path': os.path.abspath(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': sha1
+        })
+    return signatures
+
+
+def _entry_path(name, paths, cache_dir):
+    sources = '|'.join(os.path.abspath(path) for path in paths)
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha1(sources.encode()).hexdigest()[:12]}")
+
+
+def _replace_file(write, path):
+    """Write through a temp file so concurrent readers never see a partial entry"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _save_frame(frame, path):
+    try:
+        _replace_file(lambda tmp: frame.to_parquet(tmp, index=False), path + '.parquet')
+        stale = path + '.pkl'
+    except (ImportError, ValueError, TypeError):
+        # No pyarrow, or mixed-type object columns Parquet cannot hold
+        _replace_file(frame.to_pickle, path + '.pkl')
+        stale = path + '.parquet'
+    if os.path.exists(stale):
+        os.remove(stale)
+
+
+def _load_frame(path):
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    if os.path.exists(path + '.pkl'):
+        return pd.read_pickle(path + '.pkl')
+    return None
+
+
+def _write_manifest(path, manifest):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _replace_file(write, path + '.json')
+
+
+def cached_frame(name, sources, build, cache_dir=CACHE_DIR):
+    """
+    Return build() for the given source files, from the cache when none of
+    the sources changed since the entry was written.
+    """
+    path = _entry_path(name, sources, cache_dir)
+    manifest = {}
+    if os.path.exists(path + '.json'):
+        with open(path + '.json') as f:
+            manifest = json.load(f)
+    known = {source['path']: source for source in manifest.get('sources', [])}
+    signatures = _source_signatures(sources, known)
+
+    fresh = (
+        manifest.get('version') == CACHE_VERSION
+        and [s['sha1'] for s in signatures] == [s['sha1'] for s in manifest.get('sources', [])]
+    )
+    if fresh:
+        frame = _load_frame(path)
+        if frame is not None:
+            if signatures != manifest['sources']:
+                # Touched but identical content: remember the new mtimes
+                _write_manifest(path, {**manifest, 'sources': signatures})
+            print(f"Reference cache hit for {name} ({len(frame)} rows)")
+            return frame
+
+    frame = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    _save_frame(frame, path)
+    _write_manifest(path, {
+        'name': name,
+        'version': CACHE_VERSION,
+        'sources': signatures,
+        'rows': int(len(frame)),
+        'created_at': datetime.now().isoformat(timespec='seconds')
+    })
+    print(f"Reference cache rebuilt for {name} ({len(frame)} rows)")
+    return frame
+
+
+def cached_csv(path, cache_dir=CACHE_DIR):
+    """pd.read_csv(path) served from the reference cache"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return cached_frame(name, [path], lambda: pd.read_csv(path), cache_dir)
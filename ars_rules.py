@@ -0,0 +1,124 @@
+import json
+import operator
+
+import numpy as np
+import pandas as pd
+
+# Segment, bucket and service-level rules for the ARS engine. Segment rules
+# are checked in order and the first match wins; each rule is a list of
+# (column, op, value) conditions that must all hold. Extra rule sets, e.g.
+# ABC-XYZ on revenue rank and demand variability, only need new entries here.
+ARS_RULES = {
+    'sku_segment': {
+        'rules': [
+            ['A - High Value', [['revenue_rank', '<', 10]]],
+            ['B - Regular', [['sale_frequency_in_weeks', '>', 0.99]]],
+            ['C - Moderate', [['sale_frequency_in_weeks', '>', 0.7]]]
+        ],
+        'default': 'D - Slow Moving'
+    },
+    'performance_bucket': {
+        # Stores at or above the quantile of total weekly revenue get the label
+        'quantiles': [
+            ['Star_Store', 0.8],
+            ['Average_Store', 0.5]
+        ],
+        'default': 'Laggard_Store'
+    },
+    'service_level_z': {
+        'A - High Value': 2.326,
+        'B - Regular': 1.96,
+        'C - Moderate': 1.645,
+        'D - Slow Moving': 1.28
+    }
+}
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'in': lambda column, values: column.isin(values),
+}
+
+
+def load_rules(path=None):
+    """
+    Return ARS_RULES, overridden section by section from a JSON file if given.
+    Every section is compiled once here, so a bad file fails before any data is fetched.
+    """
+    rules = dict(ARS_RULES)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(ARS_RULES))
+        if unknown:
+            raise ValueError(f"Unknown rule section(s) {unknown}, expected some of {sorted(ARS_RULES)}")
+        rules.update(overrides)
+    compile_segment_rules(rules['sku_segment'])
+    compile_quantile_buckets(rules['performance_bucket'])
+    compile_service_levels(rules['service_level_z'])
+    return rules
+
+
+def compile_segment_rules(config):
+    """
+    Compile ordered label rules into a function that labels a whole frame
+    with one np.select call.
+    """
+    labels = [label for label, _ in config['rules']]
+    conditions = []
+    for label, clauses in config['rules']:
+        for column, op, value in clauses:
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator '{op}' in rule for {label}")
+        conditions.append(clauses)
+    default = config['default']
+
+    def assign(frame):
+        masks = []
+        for clauses in conditions:
+            mask = np.ones(len(frame), dtype=bool)
+            for column, op, value in clauses:
+                mask &= np.asarray(OPERATORS[op](frame[column], value), dtype=bool)
+            masks.append(mask)
+        return pd.Series(np.select(masks, labels, default=default), index=frame.index, dtype=object)
+
+    return assign
+
+
+def compile_quantile_buckets(config):
+    """
+    Compile quantile bucket rules into a function labelling a numeric series;
+    thresholds are taken from the series itself.
+    """
+    labels = [label for label, _ in config['quantiles']]
+    quantiles = [q for _, q in config['quantiles']]
+    default = config['default']
+
+    def assign(values):
+        thresholds = values.quantile(quantiles).to_numpy()
+        masks = [(values >= threshold).to_numpy() for threshold in thresholds]
+        return pd.Series(np.select(masks, labels, default=default), index=values.index, dtype=object)
+
+    return assign
+
+
+def compile_service_levels(z_values):
+    """
+    Compile the segment -> z table into a lookup returning z for each row via
+    np.take over the segment codes.
+    """
+    segments = list(z_values)
+    table = np.array([z_values[segment] for segment in segments], dtype=float)
+
+    def lookup(segment):
+        codes = pd.Categorical(segment, categories=segments).codes
+        if (codes < 0).any():
+            missing = sorted(set(segment[codes < 0].astype(str)))
+            raise KeyError(f"No service level z for segment(s): {missing}")
+        return pd.Series(np.take(table, codes), index=segment.index)
+
+    return lookup
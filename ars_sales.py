@@ -0,0 +1,195 @@
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+
+from ars_cube import DemandCube, StoreSkuPairs, std_from_moments, week_starts
+from ars_dow import LINE_SUM_COLUMNS, SHARE_COLUMNS, UNIT_SUM_COLUMNS, WeekdayProfile
+from ars_forecast import forecast_cube
+
+KEYS = ['store_id', 'sku_id']
+BUCKET_COLUMNS = ['store_id', 'sku_id', 'date', 'sales_units', 'sales_value', 'n_lines']
+
+SUMMARY_COLUMNS = [
+    'store_id', 'sku_id', 'total_sales', 'total_sales_value', 'total_sales_days',
+    'weeks_of_data', 'total_weeks', 'sales_std', 'avg_weekly_sales', 'avg_weekly_revenue',
+    'sale_frequency_in_weeks', 'sales_velocity', 'avg_sales_90day', 'avg_sales_30day', 'peak_day'
+] + SHARE_COLUMNS
+FORECAST_COLUMNS = ['demand_pattern', 'forecast_method', 'forecast_weekly_sales']
+
+
+def is_daily_buckets(sales_data):
+    """True if the frame is already bucketed per store-SKU-day"""
+    return 'n_lines' in sales_data.columns
+
+
+def bucket_daily_sales(sales_data):
+    """
+    Collapse invoice lines into one row per store-SKU-day holding the unit and
+    value sums and the line count. Every sales statistic the ARS engine needs
+    can be rebuilt from these buckets.
+    """
+    lines = sales_data[['store_id', 'sku_id', 'date', 'sales_units', 'sales_value']].copy()
+    lines['n_lines'] = 1
+    daily = lines.groupby(['store_id', 'sku_id', 'date'], sort=False, observed=True).agg(
+        sales_units=('sales_units', 'sum'),
+        sales_value=('sales_value', 'sum'),
+        n_lines=('n_lines', 'sum')
+    ).reset_index()
+    return daily[BUCKET_COLUMNS]
+
+
+def _as_source_dtype(totals, source):
+    """Keep integer sums integer, as a groupby sum over the source column would"""
+    if pd.api.types.is_integer_dtype(source):
+        return totals.round().astype(np.int64)
+    return totals
+
+
+def sales_calendar(dates):
+    """Week calendar (sorted Mondays) and last sales date of a set of sales dates"""
+    dates = pd.Series(dates).dropna()
+    weeks = np.unique(week_starts(dates)).astype('datetime64[D]')
+    return weeks, dates.max()
+
+
+def _add_recent_velocity(weekly_stats, daily, last_date):
+    """90/30-day unit and value velocity per store-SKU; store-SKUs without sales in daily get zero"""
+    recent_90 = daily['date'] > last_date - timedelta(days=90)
+    recent_30 = daily['date'] > last_date - timedelta(days=30)
+    recent = pd.DataFrame({
+        'store_id': daily['store_id'],
+        'sku_id': daily['sku_id'],
+        'units_90': daily['sales_units'].where(recent_90, 0),
+        'value_90': daily['sales_value'].where(recent_90, 0),
+        'value_30': daily['sales_value'].where(recent_30, 0)
+    }).groupby(KEYS, observed=True).sum().reset_index()
+    weekly_stats = pd.merge(weekly_stats, recent, on=KEYS, how='left')
+    recent_columns = ['units_90', 'value_90', 'value_30']
+    weekly_stats[recent_columns] = weekly_stats[recent_columns].fillna(0)
+    weekly_stats['sales_velocity'] = (weekly_stats['units_90'] / 12.85).round(2)
+    weekly_stats['avg_sales_90day'] = (weekly_stats['value_90'] / 12.85).round(2)
+    weekly_stats['avg_sales_30day'] = (weekly_stats['value_30'] / 4.2).round(2)
+    return weekly_stats
+
+
+def summarize_sales(daily, forecast=False, calendar=None):
+    """
+    Per store-SKU sales statistics from daily buckets: totals, zero-filled
+    weekly mean/std and sale frequency, 90/30-day velocity, the peak day and
+    the weekday unit shares.
+    forecast: also add the intermittent-demand forecast columns (FORECAST_COLUMNS)
+    calendar: (weeks, last date) of the whole channel from sales_calendar, for
+    a daily frame that only holds some of its stores; taken from daily if not given
+    """
+    weeks, last_date = calendar if calendar is not None else (None, daily['date'].max())
+    # 1. Totals and weekly statistics from the store x SKU x week demand cube
+    pairs = StoreSkuPairs.from_frame(daily)
+    cube = DemandCube.from_daily(daily, pairs, weeks=weeks)
+    weekly_stats = cube.keys()
+    weekly_stats['total_sales'] = _as_source_dtype(cube.total_units(), daily['sales_units'])
+    weekly_stats['total_sales_value'] = _as_source_dtype(cube.total_value(), daily['sales_value'])
+    weekly_stats['total_sales_days'] = cube.days_present
+    weekly_stats['weeks_of_data'] = cube.weeks_present
+    weekly_stats['total_weeks'] = cube.n_weeks
+    weekly_stats['sales_std'] = cube.weekly_std()
+    weekly_stats['avg_weekly_sales'] = cube.weekly_mean()
+    weekly_stats['avg_weekly_revenue'] = weekly_stats['total_sales_value'] / cube.n_weeks
+    weekly_stats = weekly_stats.round(3)
+    weekly_stats['sales_std'] = weekly_stats['sales_std'].fillna(0)
+    weekly_stats['sale_frequency_in_weeks'] = cube.sale_frequency().round(2)
+
+    # 2. Recent velocity over the last 90 and 30 days of the window
+    weekly_stats = _add_recent_velocity(weekly_stats, daily, last_date)
+
+    # 3. Day of week with the highest mean units per invoice line and weekday unit shares (rows are in cube order)
+    profile = WeekdayProfile.from_buckets(
+        pairs.codes, len(pairs), daily['date'], daily['sales_units'], daily['n_lines']
+    )
+    weekly_stats['peak_day'] = profile.peak_day()
+    weekly_stats[SHARE_COLUMNS] = profile.shares_frame()
+
+    # 4. Weekly demand forecast per series from the same cube (rows are in cube order)
+    if forecast:
+        forecasts = forecast_cube(cube)
+        for column in FORECAST_COLUMNS:
+            weekly_stats[column] = forecasts[column].to_numpy()
+        return weekly_stats[SUMMARY_COLUMNS + FORECAST_COLUMNS]
+
+    return weekly_stats[SUMMARY_COLUMNS]
+
+
+def summarize_rollup(rollup, daily, forecast=False):
+    """
+    summarize_sales read from a persisted ars_state.SalesRollup (weekly
+    buckets and store-SKU moments) instead of re-bucketing the whole window;
+    of daily only the last 90 days are read. Same rows, columns and values.
+    """
+    moments = rollup.moments
+    last_date = daily['date'].max()
+    n_weeks = rollup.weekly['week'].nunique()
+    # Rows in cube order, as summarize_sales returns them
+    pairs = StoreSkuPairs.from_frame(moments)
+    moments = moments.iloc[np.argsort(pairs.codes, kind='stable')]
+    total_units = moments['total_units'].to_numpy(dtype=float)
+    weeks_present = moments['weeks_present'].to_numpy(dtype=np.int64)
+
+    weekly_stats = pd.DataFrame({
+        'store_id': pd.Categorical.from_codes(pairs.pair_keys // len(pairs.skus), pairs.stores),
+        'sku_id': pd.Categorical.from_codes(pairs.pair_keys % len(pairs.skus), pairs.skus)
+    })
+    weekly_stats['total_sales'] = _as_source_dtype(total_units, daily['sales_units'])
+    weekly_stats['total_sales_value'] = _as_source_dtype(moments['total_value'].to_numpy(dtype=float), daily['sales_value'])
+    weekly_stats['total_sales_days'] = moments['days_present'].to_numpy(dtype=np.int64)
+    weekly_stats['weeks_of_data'] = weeks_present
+    weekly_stats['total_weeks'] = n_weeks
+    weekly_stats['sales_std'] = std_from_moments(total_units, moments['units_sq'].to_numpy(dtype=float), n_weeks)
+    weekly_stats['avg_weekly_sales'] = total_units / n_weeks
+    weekly_stats['avg_weekly_revenue'] = weekly_stats['total_sales_value'] / n_weeks
+    weekly_stats = weekly_stats.round(3)
+    weekly_stats['sales_std'] = weekly_stats['sales_std'].fillna(0)
+    weekly_stats['sale_frequency_in_weeks'] = pd.Series(weeks_present / n_weeks).round(2)
+
+    recent = daily[(daily['date'] > last_date - timedelta(days=90)).to_numpy()]
+    weekly_stats = _add_recent_velocity(weekly_stats, recent, last_date)
+
+    profile = WeekdayProfile.from_sums(
+        moments[UNIT_SUM_COLUMNS].to_numpy(dtype=float), moments[LINE_SUM_COLUMNS].to_numpy(dtype=float)
+    )
+    weekly_stats['peak_day'] = profile.peak_day()
+    weekly_stats[SHARE_COLUMNS] = profile.shares_frame()
+
+    if forecast:
+        forecasts = forecast_cube(DemandCube.from_weekly(rollup.weekly))
+        for column in FORECAST_COLUMNS:
+            weekly_stats[column] = forecasts[column].to_numpy()
+        return weekly_stats[SUMMARY_COLUMNS + FORECAST_COLUMNS]
+
+    return weekly_stats[SUMMARY_COLUMNS]
+
+
+def compare_sales_summaries(expected, actual, rtol=1e-9):
+    """
+    Compare two sales summaries keyed on store-SKU; returns a list of
+    human-readable differences (empty when they match).
+    """
+    problems = []
+    # Compare on string ids, the two sides may use different key vocabularies
+    expected = expected.astype({key: str for key in KEYS}).set_index(KEYS).sort_index()
+    actual = actual.astype({key: str for key in KEYS}).set_index(KEYS).sort_index()
+    missing = expected.index.difference(actual.index)
+    extra = actual.index.difference(expected.index)
+    if len(missing):
+        problems.append(f"{len(missing)} store-SKUs missing, e.g. {list(missing[:3])}")
+    if len(extra):
+        problems.append(f"{len(extra)} unexpected store-SKUs, e.g. {list(extra[:3])}")
+    common = expected.index.intersection(actual.index)
+    for column in SUMMARY_COLUMNS[2:]:
+        left = expected.loc[common, column]
+        right = actual.loc[common, column]
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            same = np.isclose(left.astype(float), right.astype(float), rtol=rtol, atol=1e-9, equal_nan=True)
+        else:
+            same = (left.astype(str) == right.astype(str)).to_numpy()
+        if not same.all():
+            problems.append(f"{column}: {int((~same).sum())} store-SKUs differ")
+    return problems
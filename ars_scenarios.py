@@ -0,0 +1,137 @@
+import argparse
+import itertools
+import json
+import numpy as np
+import pandas as pd
+
+from ars_metrics import LEAD_TIME_WEEKS, REFILL_COVER_WEEKS
+from ars_recommendations import HIGH_VALUE_SEGMENTS, LOW_VALUE_SEGMENTS
+from ars_rules import ARS_RULES, compile_service_levels
+
+METRICS_PATH = 'E:/Nykaa_Analysis/store_metric.csv'
+SCENARIOS_OUTPUT = 'E:/Nykaa_Analysis/ars_scenarios.csv'
+# Store-SKU rows per chunk are sized so one (scenarios x rows) block stays
+# around this many cells
+CHUNK_CELLS = 4_000_000
+
+RESULT_COLUMNS = ['skus_to_order', 'total_order_units', 'inventory_investment', 'revenue_at_risk']
+
+
+def scenario_grid(lead_times, z_tables, cover_weeks):
+    """Every (lead time, z table, cover weeks) combination, one row per scenario"""
+    return pd.DataFrame(
+        list(itertools.product(lead_times, list(z_tables), cover_weeks)),
+        columns=['lead_time_weeks', 'z_table', 'cover_weeks']
+    )
+
+
+def evaluate_scenarios(metrics, scenarios, z_tables, chunk_cells=CHUNK_CELLS):
+    """
+    Replay safety stock, refill level, reorder and revenue-at-risk rules of
+    the ARS engine for every scenario in one pass over the metrics table.
+
+    metrics: store-SKU metrics (store_metric.csv / build_store_sku_metrics)
+    scenarios: frame with lead_time_weeks, z_table, cover_weeks per row
+    z_tables: {z table name: {segment: z}}
+
+    Returns scenarios with skus_to_order, total_order_units,
+    inventory_investment and revenue_at_risk added. Store-SKU rows are
+    processed in chunks, scenarios are broadcast along the first axis.
+    """
+    table_names = list(z_tables)
+    unknown = set(scenarios['z_table']) - set(table_names)
+    if unknown:
+        raise KeyError(f"Scenarios use undefined z table(s): {sorted(unknown)}")
+
+    segment = metrics['sku_segment'].astype(str)
+    # (tables x rows) z per store-SKU, picked per scenario below
+    z_by_table = np.vstack([
+        compile_service_levels(z_tables[name])(segment).to_numpy() for name in table_names
+    ])
+    lead_time = scenarios['lead_time_weeks'].to_numpy(dtype=float)[:, None]
+    cover = scenarios['cover_weeks'].to_numpy(dtype=float)[:, None]
+    table_rows = pd.Index(table_names).get_indexer(scenarios['z_table'])
+
+    sales_std = metrics['sales_std'].to_numpy(dtype=float)
+    avg_sales = metrics['avg_weekly_sales'].to_numpy(dtype=float)
+    avg_revenue = metrics['avg_weekly_revenue'].to_numpy(dtype=float)
+    stock = metrics['current_stock'].to_numpy(dtype=float)
+    coverage = metrics['weeks_coverage'].to_numpy(dtype=float)
+    stockout = metrics['weeks_until_stockout'].to_numpy(dtype=float)
+    mdq = pd.to_numeric(metrics['mdq'], errors='coerce').to_numpy(dtype=float)
+    # Realised price per unit, as the summary report values inventory
+    with np.errstate(invalid='ignore', divide='ignore'):
+        unit_value = np.nan_to_num(avg_revenue / avg_sales, nan=0.0, posinf=0.0, neginf=0.0)
+    alert_segment = segment.isin(HIGH_VALUE_SEGMENTS + LOW_VALUE_SEGMENTS).to_numpy()
+
+    n_scenarios = len(scenarios)
+    totals = np.zeros((n_scenarios, len(RESULT_COLUMNS)))
+    chunk_rows = max(1, chunk_cells // max(n_scenarios, 1))
+    for start in range(0, len(metrics), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        z = z_by_table[table_rows, rows]
+        safety_stock = np.round(z * sales_std[rows] * np.sqrt(lead_time), 2)
+        refill_level = np.fmax(np.round(avg_sales[rows] * cover + safety_stock), mdq[rows])
+        # Stock alerts get topped up to the refill level, as in the recommendations
+        alert = (stockout[rows] < lead_time) & alert_segment[rows]
+        order_units = np.where(alert, np.clip(refill_level - stock[rows], 0, None), 0)
+        revenue_at_risk = np.where(
+            coverage[rows] < lead_time,
+            avg_revenue[rows] * (lead_time - coverage[rows]),
+            0
+        ).astype(int)
+        totals[:, 0] += (order_units > 0).sum(axis=1)
+        totals[:, 1] += order_units.sum(axis=1)
+        totals[:, 2] += (order_units * unit_value[rows]).sum(axis=1)
+        totals[:, 3] += revenue_at_risk.sum(axis=1)
+
+    results = scenarios.reset_index(drop=True).copy()
+    for i, column in enumerate(RESULT_COLUMNS):
+        results[column] = totals[:, i]
+    results['skus_to_order'] = results['skus_to_order'].astype(np.int64)
+    results['revenue_at_risk'] = results['revenue_at_risk'].astype(np.int64)
+    results['inventory_investment'] = results['inventory_investment'].round(2)
+    return results
+
+
+def _numbers(text, cast):
+    return [cast(value) for value in text.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep ARS replenishment policies over a saved metrics table')
+    parser.add_argument('--metrics', default=METRICS_PATH, help='store_metric.csv (or .parquet) of a channel run')
+    parser.add_argument('--lead-times', default=str(LEAD_TIME_WEEKS), help='comma separated lead times in weeks')
+    parser.add_argument('--cover-weeks', default=str(REFILL_COVER_WEEKS), help='comma separated refill cover weeks')
+    parser.add_argument('--z-scales', default='1.0',
+                        help='comma separated multipliers applied to the configured service level z table')
+    parser.add_argument('--z-tables', help='JSON file of {name: {segment: z}} tables to sweep instead')
+    parser.add_argument('--output', default=SCENARIOS_OUTPUT)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.metrics.endswith('.parquet'):
+            metrics = pd.read_parquet(args.metrics)
+        else:
+            metrics = pd.read_csv(args.metrics)
+        if args.z_tables:
+            with open(args.z_tables) as f:
+                z_tables = json.load(f)
+        else:
+            z_tables = {
+                f"z x{scale:g}": {segment: z * scale for segment, z in ARS_RULES['service_level_z'].items()}
+                for scale in _numbers(args.z_scales, float)
+            }
+        scenarios = scenario_grid(_numbers(args.lead_times, float), z_tables, _numbers(args.cover_weeks, float))
+        results = evaluate_scenarios(metrics, scenarios, z_tables)
+        results.to_csv(args.output, index=False)
+        print(f"Evaluated {len(results)} scenarios over {len(metrics)} store-SKUs -> {args.output}")
+        print(results.to_string(index=False))
+        return results
+    except Exception as e:
+        print(f"Error evaluating scenarios: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+# Column schemas of the tables the metrics are written to: [name, input size, coercion] in
+# table column order. Input sizes are ars_db executemany types (pyodbc SQL_<TYPE> names).
+# Coercion kinds:
+#   'float'  parsed as a number (unparseable -> missing), inf counts as missing, missing
+#            becomes `fill` (left NULL when fill is None), rounded to `round` places
+#   'text'   str() of the value, stripped, cut to `max_len` characters, non-ASCII characters
+#            dropped with ascii=True
+#   'number_text'  cleaned as 'float', then written as 'text'
+# The columns written from the metrics. The diff write mode (ars_upsert) also keeps a hash per
+# row in a row_hash column, not listed here as it is never coerced; add it to an existing table
+# once, with the index its per-channel key read uses:
+#   ALTER TABLE retail_ars_1 ADD row_hash BIGINT NULL;
+#   CREATE INDEX ix_retail_ars_1_channel_keys ON retail_ars_1 (channel, store_id, sku_id) INCLUDE (row_hash);
+# Rows written before the column existed hold NULL, and the channel's next diff write fully replaces them.
+# The swap write mode switches one channel's partition between retail_ars_1, retail_ars_1_shadow
+# and retail_ars_1_old, so all three are partitioned on channel by one RANGE RIGHT function, with
+# identical columns and aligned indexes; channels get their boundaries on their first swap write:
+#   CREATE PARTITION FUNCTION pf_retail_ars_1_channel (nvarchar(255)) AS RANGE RIGHT FOR VALUES ();
+#   CREATE PARTITION SCHEME ps_retail_ars_1_channel AS PARTITION pf_retail_ars_1_channel ALL TO ([PRIMARY]);
+#   -- rebuild retail_ars_1's clustered index ON ps_retail_ars_1_channel (channel), then create
+#   -- retail_ars_1_shadow and retail_ars_1_old with the same columns and indexes on that scheme
+RETAIL_ARS_1 = [
+    ['store_id', ('varchar', 255), {'kind': 'text'}],
+    ['sku_id', ('varchar', 255), {'kind': 'text'}],
+    ['total_sales', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['total_sales_value', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['total_sales_days', ('float',), {'kind': 'float', 'round': 2}],
+    ['weeks_of_data', ('float',), {'kind': 'float', 'round': 2}],
+    ['total_weeks', ('float',), {'kind': 'float', 'round': 2}],
+    ['sales_std', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['avg_weekly_sales', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['avg_weekly_revenue', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['sale_frequency_in_weeks', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['current_stock', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['weeks_coverage', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['sales_velocity', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['avg_sales_90day', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['avg_sales_30day', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['revenue_rank', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['sku_segment', ('varchar', 255), {'kind': 'text'}],
+    ['performance_bucket', ('varchar', 255), {'kind': 'text'}],
+    ['safety_stock', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['refill_level', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['mdq', ('float',), {'kind': 'float', 'fill': 0.0, 'round': 2}],
+    ['weeks_until_stockout', ('wvarchar', 255), {'kind': 'number_text', 'fill': 0.0, 'max_len': 55, 'ascii': True}],
+    ['potential_revenue_loss', ('float',), {'kind': 'float', 'round': 2}],
+    ['peak_day', ('wvarchar', 255), {'kind': 'text', 'max_len': 55, 'ascii': True}],
+    ['brand_line', ('wvarchar', 255), {'kind': 'text', 'max_len': 55, 'ascii': True}],
+    ['sku_name', ('wvarchar', 255), {'kind': 'text', 'max_len': 55, 'ascii': True}],
+    ['MRP', ('varchar', 255), {'kind': 'text'}],
+    ['store_name', ('wvarchar', 255), {'kind': 'text', 'max_len': 254, 'ascii': True}],
+    ['channel', ('wvarchar', 255), {'kind': 'text', 'max_len': 55, 'ascii': True}],
+]
+
+# The older retail_ars table (test_insert.py); id is an identity column and not written
+RETAIL_ARS = [
+    ['store_id', ('varchar', 50), {'kind': 'text'}],
+    ['sku_id', ('varchar', 50), {'kind': 'text'}],
+    ['total_sales', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['total_sales_value', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['total_sales_days', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['weeks_of_data', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['total_weeks', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['sales_std', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['avg_weekly_sales', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['avg_weekly_revenue', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['sale_frequency_in_weeks', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['current_stock', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['weeks_coverage', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['sales_velocity', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['avg_sales_90day', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['avg_sales_30day', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['revenue_rank', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['sku_segment', ('varchar', 50), {'kind': 'text'}],
+    ['performance_bucket', ('varchar', 50), {'kind': 'text'}],
+    ['safety_stock', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['refill_level', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['mdq', ('varchar', 50), {'kind': 'text'}],
+    ['weeks_until_stockout', ('varchar', 50), {'kind': 'text'}],
+    ['potential_revenue_loss', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['brand_line', ('varchar', 100), {'kind': 'text'}],
+    ['sku_name', ('varchar', 255), {'kind': 'text'}],
+    ['MRP', ('float',), {'kind': 'float', 'fill': 0.0}],
+    ['store_name', ('varchar', 100), {'kind': 'text'}],
+    ['channel', ('varchar', 50), {'kind': 'text'}],
+]
+
+COERCION_KINDS = ('float', 'text', 'number_text')
+
+
+def _compile_float(options):
+    fill, decimals = options.get('fill'), options.get('round')
+
+    def convert(values):
+        numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        if fill is not None:
+            numbers = np.where(np.isfinite(numbers), numbers, fill)
+        else:
+            numbers = np.where(np.isinf(numbers), np.nan, numbers)
+        return np.round(numbers, decimals) if decimals is not None else numbers
+
+    return convert
+
+
+def _compile_text(options):
+    max_len, to_ascii = options.get('max_len'), options.get('ascii', False)
+
+    def clean(text):
+        text = text.strip()[:max_len]
+        return text.encode('ascii', 'ignore').decode('ascii') if to_ascii else text
+
+    def convert(values):
+        # Each distinct string is cleaned once; metric text columns repeat a handful of values
+        codes, uniques = pd.factorize(np.asarray(values.astype(str), dtype=object))
+        cleaned = np.array([clean(text) for text in uniques], dtype=object)
+        return cleaned[codes] if len(codes) else np.array([], dtype=object)
+
+    return convert
+
+
+def compile_column(options):
+    """Vectorised converter for one column's coercion options: Series in, array of the table's values out"""
+    kind = options['kind']
+    if kind not in COERCION_KINDS:
+        raise ValueError(f"Unknown coercion kind '{kind}', expected one of {COERCION_KINDS}")
+    if kind == 'float':
+        return _compile_float(options)
+    if kind == 'text':
+        return _compile_text(options)
+    as_number, as_text = _compile_float(options), _compile_text(options)
+    return lambda values: as_text(pd.Series(as_number(values)))
+
+
+class TableSchema:
+    """
+    A table schema compiled once: coerce() converts a whole frame to the
+    table's columns, in order, with every column's conversion applied as one
+    array operation; input_sizes are the matching executemany parameter types.
+    """
+
+    def __init__(self, columns):
+        self.columns = [name for name, _, _ in columns]
+        self.input_sizes = [tuple(size) for _, size, _ in columns]
+        self.converters = [(name, compile_column(options)) for name, _, options in columns]
+
+    def coerce(self, frame):
+        """Frame of the schema's columns converted for the table; raises KeyError if one is missing"""
+        missing = [name for name in self.columns if name not in frame.columns]
+        if missing:
+            raise KeyError(f"Columns missing for the table schema: {missing}")
+        return pd.DataFrame({name: convert(frame[name]) for name, convert in self.converters}, index=frame.index)
+
+    def insert_sql(self, table):
+        return f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})"
+
+    def rows(self, frame):
+        """Coerced frame as executemany parameter rows"""
+        return list(frame.itertuples(index=False, name=None))
+
+
+def compile_schema(columns):
+    """Compile a [name, input size, coercion] column list into a TableSchema"""
+    return TableSchema(columns)
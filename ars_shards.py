@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from ars_rules import compile_quantile_buckets
+
+KEYS = ['store_id', 'sku_id']
+# Stores are split on the server by a hash of the store code. Rows without
+# a store code go to shard 0, so every row lands in exactly one shard.
+# ABS is taken after the modulo: CHECKSUM can return -2147483648, whose ABS
+# overflows an int; % truncates toward zero, so the shards are the same.
+SHARD_HASH = "ABS(CHECKSUM([Store code]) % ?)"
+
+
+def shard_filter(shard):
+    """WHERE clause fragment and parameters selecting one (index, count) shard of the stores"""
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} out of range for {count} shards")
+    clause = f" AND ({SHARD_HASH} = ?" + (" OR [Store code] IS NULL)" if index == 0 else ")")
+    return clause, [count, index]
+
+
+def store_buckets(sales_summaries, rules):
+    """
+    performance_bucket per store from the per-shard sales summaries. Only
+    the store revenues are combined, so this pass is cheap, and each store's
+    revenue is summed over the same rows as in a single build_store_sku_metrics.
+    """
+    store_revenue = pd.concat([
+        summary.groupby('store_id', observed=True)['avg_weekly_revenue'].sum()
+        for summary in sales_summaries
+    ])
+    return compile_quantile_buckets(rules['performance_bucket'])(store_revenue)
+
+
+def concat_shards(frames):
+    """
+    Per-shard store-SKU frames as one, rows in the (store, sku) order of an
+    in-memory run. Key columns must be encoded with one shared KeyEncoder.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    combined = pd.concat(frames, ignore_index=True)
+    order = np.lexsort((combined['sku_id'].cat.codes, combined['store_id'].cat.codes))
+    combined = combined.take(order)
+    # Relabel in place, reset_index would copy the whole table again
+    combined.index = pd.RangeIndex(len(combined))
+    return combined
+
+
+def check_calendar(calendar, observed):
+    """
+    Problems with the week calendar a sharded run summarized against, given
+    the (weeks, last date) each shard actually saw; an empty list if it held.
+    """
+    weeks, last_date = calendar
+    seen_weeks = np.unique(np.concatenate([shard_weeks for shard_weeks, _ in observed]))
+    seen_last = max(shard_last for _, shard_last in observed)
+    problems = []
+    if not np.array_equal(seen_weeks, weeks):
+        problems.append(f"calendar has {len(weeks)} weeks, the shards sold in {len(seen_weeks)}")
+    if seen_last != last_date:
+        problems.append(f"calendar ends {last_date}, the shards' last sale is {seen_last}")
+    return problems
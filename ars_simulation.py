@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from ars_metrics import LEAD_TIME_WEEKS
+
+SIMULATION_COLUMNS = ['sim_fill_rate', 'sim_stockout_prob']
+# Store-SKUs per chunk are sized so one (store-SKUs x paths) block stays
+# around this many cells
+CHUNK_CELLS = 2_000_000
+
+
+def simulate_chunk(mean, std, reorder_point, refill_level, n_paths, horizon_weeks, lead_time_weeks, seed):
+    """
+    Replay the weekly reorder policy for a block of store-SKUs over n_paths
+    demand paths at once. Weekly demand is normal(mean, std) clipped at zero
+    and unmet demand is lost. Each week: receive the order placed
+    lead_time_weeks ago, serve demand, then order up to refill_level when
+    on hand + on order is below the reorder point.
+
+    Returns (fill rate, share of path-weeks with a stockout) per store-SKU.
+    """
+    rng = np.random.default_rng(seed)
+    mean = mean.astype(np.float32)[:, None]
+    std = std.astype(np.float32)[:, None]
+    reorder_point = reorder_point.astype(np.float32)[:, None]
+    refill_level = refill_level.astype(np.float32)[:, None]
+    shape = (len(mean), n_paths)
+
+    on_hand = np.broadcast_to(refill_level, shape).copy()
+    on_order = np.zeros(shape, dtype=np.float32)
+    pipeline = np.zeros((max(lead_time_weeks, 1),) + shape, dtype=np.float32)
+    demand_total = np.zeros(len(mean))
+    lost_total = np.zeros(len(mean))
+    stockout_weeks = np.zeros(len(mean))
+
+    for week in range(horizon_weeks):
+        slot = week % len(pipeline)
+        if lead_time_weeks > 0:
+            on_hand += pipeline[slot]
+            on_order -= pipeline[slot]
+            pipeline[slot] = 0
+
+        demand = rng.standard_normal(shape, dtype=np.float32)
+        demand *= std
+        demand += mean
+        np.maximum(demand, 0, out=demand)
+        served = np.minimum(on_hand, demand)
+        on_hand -= served
+        demand_total += demand.sum(axis=1)
+        lost_total += (demand - served).sum(axis=1)
+        stockout_weeks += (demand > served).sum(axis=1)
+
+        position = on_hand + on_order
+        order = np.where(position < reorder_point, refill_level - position, 0).astype(np.float32)
+        if lead_time_weeks > 0:
+            pipeline[slot] = order
+            on_order += order
+        else:
+            on_hand += order
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fill_rate = np.where(demand_total > 0, 1 - lost_total / demand_total, 1.0)
+    stockout_prob = stockout_weeks / (horizon_weeks * n_paths)
+    return fill_rate, stockout_prob
+
+
+def _simulate_chunk_args(args):
+    return simulate_chunk(*args)
+
+
+def simulate_service_levels(metrics, n_paths=500, horizon_weeks=26, lead_time_weeks=LEAD_TIME_WEEKS,
+                            workers=1, seed=0, chunk_cells=CHUNK_CELLS):
+    """
+    Monte Carlo check of safety_stock / refill_level for every store-SKU in a
+    metrics table. The reorder point is lead-time demand plus safety stock.
+    Store-SKUs are simulated in chunks to bound memory; with workers > 1 the
+    chunks run in a process pool. Every chunk has its own seed from one
+    SeedSequence, so results do not depend on the number of workers.
+
+    Returns a frame aligned to metrics with sim_fill_rate and sim_stockout_prob.
+    """
+    mean = metrics['avg_weekly_sales'].to_numpy(dtype=float)
+    std = metrics['sales_std'].fillna(0).to_numpy(dtype=float)
+    refill_level = metrics['refill_level'].fillna(0).to_numpy(dtype=float)
+    reorder_point = mean * lead_time_weeks + metrics['safety_stock'].fillna(0).to_numpy(dtype=float)
+
+    chunk_rows = max(1, chunk_cells // n_paths)
+    starts = list(range(0, len(metrics), chunk_rows))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [
+        (mean[start:start + chunk_rows], std[start:start + chunk_rows],
+         reorder_point[start:start + chunk_rows], refill_level[start:start + chunk_rows],
+         n_paths, horizon_weeks, lead_time_weeks, chunk_seed)
+        for start, chunk_seed in zip(starts, seeds)
+    ]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_simulate_chunk_args, tasks))
+    else:
+        results = [simulate_chunk(*task) for task in tasks]
+
+    fill_rate = np.concatenate([r[0] for r in results]) if results else np.array([])
+    stockout_prob = np.concatenate([r[1] for r in results]) if results else np.array([])
+    return pd.DataFrame({
+        'sim_fill_rate': fill_rate.round(4),
+        'sim_stockout_prob': stockout_prob.round(4)
+    }, index=metrics.index)
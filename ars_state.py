@@ -0,0 +1,239 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+from ars_cube import week_starts
+from ars_dow import LINE_SUM_COLUMNS, UNIT_SUM_COLUMNS
+from ars_sales import BUCKET_COLUMNS, KEYS, bucket_daily_sales, is_daily_buckets
+
+# Persisted per channel:
+#   <channel>.parquet          one row per store-SKU-day (units, value, line count) for the
+#                              rolling sales window; kept so refreshed and expired days can
+#                              be taken back out of the rollups
+#   <channel>_weekly.parquet   one row per store-SKU-week (units, value, days with sales,
+#                              last sales date)
+#   <channel>_moments.parquet  one row per store-SKU: unit and value sums, sum of squared
+#                              weekly units, weeks and days with sales, last sales date and
+#                              unit / invoice line sums per weekday
+#   <channel>.json             meta, with the last sales date folded in
+# An incremental run re-buckets only the weeks holding refreshed or expired days, recomputes
+# the moments of the store-SKUs in those weeks and reads the sales statistics from the
+# moments (ars_sales.summarize_rollup); only the last 90 days of daily buckets are read back.
+STATE_DIR = 'E:/Nykaa_Analysis/ars_state'
+WINDOW_DAYS = 270
+# Trailing days re-read on every run so late or corrected invoices are picked up
+REFRESH_DAYS = 3
+
+WEEKLY_COLUMNS = ['store_id', 'sku_id', 'week', 'sales_units', 'sales_value', 'n_days', 'last_date']
+MOMENT_COLUMNS = [
+    'store_id', 'sku_id', 'total_units', 'total_value', 'units_sq', 'weeks_present', 'days_present', 'last_date'
+] + UNIT_SUM_COLUMNS + LINE_SUM_COLUMNS
+
+
+def _state_path(channel, state_dir):
+    return os.path.join(state_dir, channel.replace(' ', '_'))
+
+
+def _write_frame(frame, path):
+    """Write Parquet when pyarrow is available, pickle otherwise"""
+    try:
+        frame.to_parquet(path + '.parquet', index=False)
+        stale = path + '.pkl'
+    except ImportError:
+        frame.to_pickle(path + '.pkl')
+        stale = path + '.parquet'
+    if os.path.exists(stale):
+        os.remove(stale)
+
+
+def _read_frame(path):
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    if os.path.exists(path + '.pkl'):
+        return pd.read_pickle(path + '.pkl')
+    return None
+
+
+def window_start(now=None):
+    """Start of the rolling sales window, same cut-off as the full fetch"""
+    return (now or datetime.now()) - timedelta(days=WINDOW_DAYS)
+
+
+def _week_of(dates):
+    """Monday of each date's ISO week"""
+    return pd.Series(week_starts(dates).astype('datetime64[D]').astype('datetime64[ns]'))
+
+
+def weekly_buckets(daily):
+    """Store-SKU-week rollup of daily buckets: units, value, days with sales and last sales date"""
+    frame = daily[KEYS + ['date', 'sales_units', 'sales_value']].assign(week=_week_of(daily['date']).to_numpy())
+    weekly = frame.groupby(KEYS + ['week'], observed=True).agg(
+        sales_units=('sales_units', 'sum'),
+        sales_value=('sales_value', 'sum'),
+        n_days=('date', 'size'),
+        last_date=('date', 'max')
+    ).reset_index()
+    return weekly[WEEKLY_COLUMNS]
+
+
+def _pair_moments(weekly):
+    """Per store-SKU sums and sum of squared weekly units from weekly buckets, without the weekday sums"""
+    frame = weekly[KEYS + ['sales_units', 'sales_value', 'n_days', 'last_date']].assign(
+        units_sq=weekly['sales_units'] * weekly['sales_units']
+    )
+    return frame.groupby(KEYS, observed=True).agg(
+        total_units=('sales_units', 'sum'),
+        total_value=('sales_value', 'sum'),
+        units_sq=('units_sq', 'sum'),
+        weeks_present=('sales_units', 'size'),
+        days_present=('n_days', 'sum'),
+        last_date=('last_date', 'max')
+    ).reset_index()
+
+
+def _weekday_sums(daily):
+    """Per store-SKU unit and invoice line sums by weekday, indexed by store-SKU"""
+    day_number = daily['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    frame = daily[KEYS].assign(
+        weekday=(day_number + 3) % 7,
+        units=daily['sales_units'].to_numpy(dtype=float),
+        lines=daily['n_lines'].to_numpy(dtype=float)
+    )
+    sums = frame.groupby(KEYS + ['weekday'], observed=True)[['units', 'lines']].sum().unstack('weekday', fill_value=0.0)
+    sums = sums.reindex(columns=pd.MultiIndex.from_product([['units', 'lines'], range(7)]), fill_value=0.0)
+    sums.columns = UNIT_SUM_COLUMNS + LINE_SUM_COLUMNS
+    return sums
+
+
+def _pair_index(frame):
+    return pd.MultiIndex.from_frame(frame[KEYS])
+
+
+class SalesRollup:
+    """
+    Weekly buckets and per store-SKU running moments of a channel's daily
+    buckets (WEEKLY_COLUMNS / MOMENT_COLUMNS), persisted next to them.
+    """
+
+    def __init__(self, weekly, moments):
+        self.weekly = weekly
+        self.moments = moments
+
+    @classmethod
+    def from_daily(cls, daily):
+        weekly = weekly_buckets(daily)
+        moments = _pair_moments(weekly).join(_weekday_sums(daily), on=KEYS)
+        return cls(weekly, moments[MOMENT_COLUMNS])
+
+
+def load_sales_state(channel, state_dir=STATE_DIR):
+    """
+    Return (daily buckets, SalesRollup, meta) for a channel, or (None, None, {})
+    before the first load; the rollup is None for a state saved without one
+    """
+    path = _state_path(channel, state_dir)
+    daily = _read_frame(path)
+    if daily is None or not os.path.exists(path + '.json'):
+        return None, None, {}
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    weekly, moments = _read_frame(path + '_weekly'), _read_frame(path + '_moments')
+    rollup = SalesRollup(weekly, moments) if weekly is not None and moments is not None else None
+    return daily, rollup, meta
+
+
+def save_sales_state(channel, daily, rollup, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    path = _state_path(channel, state_dir)
+    meta = {
+        'channel': channel,
+        'window_days': WINDOW_DAYS,
+        'first_date': daily['date'].min().strftime('%Y-%m-%d') if len(daily) else None,
+        'last_date': daily['date'].max().strftime('%Y-%m-%d') if len(daily) else None,
+        'store_skus': int(len(rollup.moments)),
+        'buckets': int(len(daily)),
+        'weekly_buckets': int(len(rollup.weekly)),
+        'updated_at': datetime.now().isoformat(timespec='seconds')
+    }
+    _write_frame(daily, path)
+    _write_frame(rollup.weekly, path + '_weekly')
+    _write_frame(rollup.moments, path + '_moments')
+    with open(path + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def refresh_start(meta):
+    """First sales date to fetch for an incremental run; None means full load"""
+    if not meta.get('last_date'):
+        return None
+    return datetime.strptime(meta['last_date'], '%Y-%m-%d') - timedelta(days=REFRESH_DAYS)
+
+
+def fold_sales(daily_state, new_sales, since, now=None):
+    """
+    Fold freshly fetched sales (dates >= since) into the daily buckets and
+    expire days that fell out of the window.
+    """
+    cutoff = window_start(now)
+    new_daily = new_sales if is_daily_buckets(new_sales) else bucket_daily_sales(new_sales)
+    new_daily = new_daily[new_daily['date'] >= cutoff]
+    if since is not None:
+        new_daily = new_daily[new_daily['date'] >= since]
+    if daily_state is None or since is None:
+        daily = new_daily
+    else:
+        kept = daily_state[(daily_state['date'] < since) & (daily_state['date'] >= cutoff)]
+        daily = pd.concat([kept, new_daily], ignore_index=True)
+    return daily.sort_values(['date', 'store_id', 'sku_id']).reset_index(drop=True)[BUCKET_COLUMNS]
+
+
+def fold_rollup(rollup, daily_state, daily, since, now=None):
+    """
+    Bring the rollup of daily_state in line with daily, the buckets fold_sales
+    returned for the same since/now. Weeks holding refreshed days (since on)
+    or expired days (before the window) are re-bucketed from daily, and the
+    moments of every store-SKU with such a week are recomputed from its
+    weekly buckets. The weekday sums are running sums: the refreshed days are
+    added and the days they replace or that expired are subtracted. Without
+    a previous rollup (or for a full load) the rollup is built from daily.
+    """
+    if rollup is None or daily_state is None or since is None:
+        return SalesRollup.from_daily(daily)
+    cutoff = window_start(now)
+    first_refreshed = _week_of([since])[0]
+    last_expired = _week_of([cutoff])[0]
+
+    stale = ((rollup.weekly['week'] >= first_refreshed) | (rollup.weekly['week'] <= last_expired)).to_numpy()
+    daily_week = _week_of(daily['date'])
+    rebucket = ((daily_week >= first_refreshed) | (daily_week <= last_expired)).to_numpy()
+    rebucketed = weekly_buckets(daily[rebucket])
+    weekly = pd.concat([rollup.weekly[~stale], rebucketed], ignore_index=True)
+    weekly = weekly.sort_values(KEYS + ['week'], ignore_index=True)
+
+    touched = _pair_index(pd.concat([rollup.weekly.loc[stale, KEYS], rebucketed[KEYS]])).unique()
+    moments = _pair_moments(weekly[_pair_index(weekly).isin(touched)])
+    keys = _pair_index(moments)
+    removed = daily_state[((daily_state['date'] >= since) | (daily_state['date'] < cutoff)).to_numpy()]
+    added = daily[(daily['date'] >= since).to_numpy()]
+    weekday = rollup.moments.set_index(KEYS)[UNIT_SUM_COLUMNS + LINE_SUM_COLUMNS].reindex(keys, fill_value=0.0)
+    weekday = weekday + _weekday_sums(added).reindex(keys, fill_value=0.0) - _weekday_sums(removed).reindex(keys, fill_value=0.0)
+    moments = pd.concat([moments, weekday.reset_index(drop=True)], axis=1)
+
+    kept = rollup.moments[~_pair_index(rollup.moments).isin(touched)]
+    moments = pd.concat([kept, moments[MOMENT_COLUMNS]], ignore_index=True).sort_values(KEYS, ignore_index=True)
+    return SalesRollup(weekly, moments)
+
+
+def commit_sales_state(channel, daily, rollup, state_dir=STATE_DIR):
+    """
+    Persist the channel's daily buckets and their rollup (from fold_sales /
+    fold_rollup, or the full recompute's when verification failed); called
+    once they are known to be good, so a bad fold is never built on.
+    """
+    meta = save_sales_state(channel, daily, rollup, state_dir)
+    print(f"Sales state for {channel}: {meta['buckets']} daily buckets, {meta['weekly_buckets']} weekly buckets "
+          f"of {meta['store_skus']} store-SKUs, {meta['first_date']} to {meta['last_date']}")
+    return meta
@@ -0,0 +1,380 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+# Store master columns that bound a transfer pool, first one present wins;
+# without any of them the whole channel is one pool
+TRANSFER_GROUP_COLUMNS = ['region', 'city']
+# Smallest leg worth a transfer; smaller surpluses and deficits are not offered, and the
+# units of smaller legs are matched again
+MIN_TRANSFER_QTY = 2
+# Store master columns with a store's location in degrees; pools whose stores all have one
+# are matched on store-to-store distance, the others on the number of transfers
+STORE_LOCATION_COLUMNS = ['latitude', 'longitude']
+EARTH_RADIUS_KM = 6371.0
+
+TRANSFER_COLUMNS = [
+    'transfer_group', 'sku_id', 'brand_line', 'sku_name',
+    'from_store_id', 'from_store_name', 'from_surplus',
+    'to_store_id', 'to_store_name', 'to_deficit', 'to_priority',
+    'transfer_qty', 'distance_km', 'to_potential_revenue_loss'
+]
+
+
+def _transfer_groups(recommendations, store_master, group_column):
+    """Pool label per recommendation row: the store's region/city, or 'ALL'"""
+    if store_master is None or group_column is None:
+        return pd.Series('ALL', index=recommendations.index)
+    stores = store_master.drop_duplicates('store_id').set_index('store_id')[group_column]
+    groups = stores.reindex(recommendations['store_id']).to_numpy(dtype=object)
+    return pd.Series(groups, index=recommendations.index).fillna('UNKNOWN').astype(str)
+
+
+def _store_locations(recommendations, store_master):
+    """(latitude, longitude) in radians per recommendation row, NaN where unknown; None without the columns"""
+    if store_master is None or not set(STORE_LOCATION_COLUMNS) <= set(store_master.columns):
+        return None
+    stores = store_master.drop_duplicates('store_id').set_index('store_id')[STORE_LOCATION_COLUMNS]
+    stores = stores.apply(pd.to_numeric, errors='coerce').reindex(recommendations['store_id'])
+    return tuple(np.radians(stores[column].to_numpy(dtype=float)) for column in STORE_LOCATION_COLUMNS)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance between points in radians, broadcasting"""
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _empty_legs():
+    empty = np.array([], dtype=np.int64)
+    return empty, empty, empty
+
+
+def _concat_legs(*legs):
+    return tuple(np.concatenate([leg[i] for leg in legs]).astype(np.int64) for i in range(3))
+
+
+def match_transfers(pool, surplus, deficit):
+    """
+    Largest-first (northwest corner) fill of every pool at once.
+
+    pool: pool code per row; surplus / deficit: whole units per row, a row
+    is a source when surplus > 0 and a destination when deficit > 0.
+
+    Sources and destinations are sorted by pool and then by size, largest
+    first, and laid end to end on one line with each pool's matched volume
+    min(total surplus, total deficit) after the previous pool's. Every
+    segment between consecutive source/destination boundaries is one
+    transfer, so a pool with m sources and n destinations needs at most
+    m + n - 1 transfers. Returns (source row, destination row, units) arrays.
+    """
+    sources = np.flatnonzero(surplus > 0)
+    sinks = np.flatnonzero(deficit > 0)
+    sources = sources[np.lexsort((-surplus[sources], pool[sources]))]
+    sinks = sinks[np.lexsort((-deficit[sinks], pool[sinks]))]
+    if len(sources) == 0 or len(sinks) == 0:
+        return _empty_legs()
+
+    n_pools = int(pool.max()) + 1
+    supply = np.bincount(pool[sources], weights=surplus[sources], minlength=n_pools).astype(np.int64)
+    demand = np.bincount(pool[sinks], weights=deficit[sinks], minlength=n_pools).astype(np.int64)
+    matched = np.minimum(supply, demand)
+    offset = np.concatenate([[0], np.cumsum(matched)[:-1]])
+
+    def line_ends(rows, qty):
+        # Cumulative size within the pool, capped at the pool's matched volume
+        pools = pool[rows]
+        sizes = qty[rows]
+        running = np.cumsum(sizes)
+        first = np.searchsorted(pools, pools, side='left')
+        within = running - (running[first] - sizes[first])
+        return offset[pools] + np.minimum(within, matched[pools])
+
+    source_ends = line_ends(sources, surplus)
+    sink_ends = line_ends(sinks, deficit)
+    bounds = np.unique(np.concatenate([source_ends, sink_ends]))
+    units = np.diff(np.concatenate([[0], bounds]))
+    keep = units > 0
+    bounds, units = bounds[keep], units[keep]
+    # A segment belongs to the first source / destination whose end reaches it
+    from_rows = sources[np.searchsorted(source_ends, bounds, side='left')]
+    to_rows = sinks[np.searchsorted(sink_ends, bounds, side='left')]
+    return from_rows, to_rows, units
+
+
+def match_exact(pool, surplus, deficit):
+    """
+    Pair sources and destinations of the same pool with exactly the same
+    units, one transfer each; every pair settles two rows with one leg.
+    """
+    sources = np.flatnonzero(surplus > 0)
+    sinks = np.flatnonzero(deficit > 0)
+    offers = pd.DataFrame({'pool': pool[sources], 'units': surplus[sources], 'from_row': sources})
+    asks = pd.DataFrame({'pool': pool[sinks], 'units': deficit[sinks], 'to_row': sinks})
+    offers['rank'] = offers.groupby(['pool', 'units']).cumcount()
+    asks['rank'] = asks.groupby(['pool', 'units']).cumcount()
+    pairs = offers.merge(asks, on=['pool', 'units', 'rank'])
+    return pairs['from_row'].to_numpy(), pairs['to_row'].to_numpy(), pairs['units'].to_numpy()
+
+
+def match_fewest(pool, surplus, deficit):
+    """
+    Fixed cost per transfer: exact-size pairs first (match_exact), the rest
+    with the largest-first fill. The fewest transfers is a fixed-charge
+    problem with no fast exact solution; build_transfer_plan keeps the plain
+    fill for any pool where this comes out worse.
+    """
+    exact = match_exact(pool, surplus, deficit)
+    surplus, deficit = surplus.copy(), deficit.copy()
+    surplus[exact[0]] = 0
+    deficit[exact[1]] = 0
+    return _concat_legs(exact, match_transfers(pool, surplus, deficit))
+
+
+def _transport(pool, from_rows, to_rows, supply, demand, cost):
+    """
+    Minimum-cost transportation LP over a block of pools at once: one
+    variable per (source, destination) pair of the same pool (from_rows /
+    to_rows with their pool, supply, demand and cost per unit). In each pool
+    the short side ships or receives everything and the long side at most
+    its size, so min(total supply, total demand) units move. The HiGHS dual
+    simplex returns a vertex, which is whole units because the constraint
+    matrix is totally unimodular. Units per pair, or None if the solver fails.
+    """
+    n = len(from_rows)
+    variables = np.arange(n)
+    source_codes, source_node = np.unique(from_rows, return_inverse=True)
+    sink_codes, sink_node = np.unique(to_rows, return_inverse=True)
+    n_pools = int(pool.max()) + 1
+    short_source = (np.bincount(pool[source_codes], weights=supply[source_codes], minlength=n_pools)
+                    <= np.bincount(pool[sink_codes], weights=demand[sink_codes], minlength=n_pools))
+    by_source = sparse.csr_matrix((np.ones(n), (source_node, variables)), shape=(len(source_codes), n))
+    by_sink = sparse.csr_matrix((np.ones(n), (sink_node, variables)), shape=(len(sink_codes), n))
+    source_short = short_source[pool[source_codes]]
+    sink_short = ~short_source[pool[sink_codes]]
+    result = linprog(
+        cost,
+        A_ub=sparse.vstack([by_source[~source_short], by_sink[~sink_short]]).tocsr(),
+        b_ub=np.concatenate([supply[source_codes][~source_short], demand[sink_codes][~sink_short]]),
+        A_eq=sparse.vstack([by_source[source_short], by_sink[sink_short]]).tocsr(),
+        b_eq=np.concatenate([supply[source_codes][source_short], demand[sink_codes][sink_short]]),
+        bounds=(0, None), method='highs-ds'
+    )
+    if not result.success:
+        return None
+    return np.rint(result.x).astype(np.int64)
+
+
+def _pool_pairs(pool, surplus, deficit):
+    """Every (source, destination) row pair of the same pool, pools in order"""
+    sources = np.flatnonzero(surplus > 0)
+    sinks = np.flatnonzero(deficit > 0)
+    sources = sources[np.argsort(pool[sources], kind='stable')]
+    sinks = sinks[np.argsort(pool[sinks], kind='stable')]
+    n_pools = int(pool.max()) + 1 if len(pool) else 0
+    sink_count = np.bincount(pool[sinks], minlength=n_pools)
+    sink_start = np.concatenate([[0], np.cumsum(sink_count)[:-1]])
+    per_source = sink_count[pool[sources]]
+    pair_source = np.repeat(np.arange(len(sources)), per_source)
+    within = np.arange(len(pair_source)) - np.repeat(np.cumsum(per_source) - per_source, per_source)
+    pair_sink = sink_start[pool[sources]][pair_source] + within
+    return sources[pair_source], sinks[pair_sink]
+
+
+# Pair variables per transportation LP; pools are batched into LPs of about this size, small
+# blocks solve much faster than one LP over the whole channel
+TRANSPORT_BATCH_PAIRS = 3000
+
+
+def match_nearest(pool, surplus, deficit, latitude, longitude):
+    """
+    Minimum-cost transportation per pool with store-to-store distance as the
+    cost per unit (_transport), so each pool moves its matched volume with
+    the fewest unit-km. Pools are solved together in block LPs of about
+    TRANSPORT_BATCH_PAIRS pairs; a block the solver fails on gets the
+    largest-first fill.
+    """
+    from_rows, to_rows = _pool_pairs(pool, surplus, deficit)
+    if len(from_rows) == 0:
+        return _empty_legs()
+    cost = distance_km(latitude[from_rows], longitude[from_rows], latitude[to_rows], longitude[to_rows])
+    pair_pool = pool[from_rows]
+    # Block boundaries fall between pools
+    pool_start = np.flatnonzero(np.r_[True, pair_pool[1:] != pair_pool[:-1]])
+    cuts = np.unique(pool_start[np.searchsorted(pool_start, np.arange(0, len(pair_pool), TRANSPORT_BATCH_PAIRS))])
+    legs = []
+    for start, end in zip(cuts, np.r_[cuts[1:], len(pair_pool)]):
+        block = slice(start, end)
+        units = _transport(pool, from_rows[block], to_rows[block], surplus, deficit, cost[block])
+        if units is None:
+            in_block = np.isin(pool, pair_pool[block])
+            legs.append(match_transfers(pool, np.where(in_block, surplus, 0), np.where(in_block, deficit, 0)))
+            continue
+        moved = units > 0
+        legs.append((from_rows[block][moved], to_rows[block][moved], units[moved]))
+    return _concat_legs(*legs)
+
+
+def match_min_qty(pool, surplus, deficit, min_qty, match=match_transfers):
+    """
+    match (match_transfers, match_fewest, ...) keeping only legs of at least
+    min_qty units. The units of dropped legs go back to their source and
+    destination, and what is left (min_qty or more) is matched again until a
+    round adds no leg, so no units are lost that another pairing could move.
+    A pair matched in several rounds is one leg. Legs are ordered by pool,
+    first round first.
+    """
+    surplus, deficit = surplus.copy(), deficit.copy()
+    legs = []
+    while True:
+        from_rows, to_rows, units = match(pool, surplus, deficit)
+        keep = units >= min_qty
+        if not keep.any():
+            break
+        from_rows, to_rows, units = from_rows[keep], to_rows[keep], units[keep]
+        legs.append((from_rows, to_rows, units))
+        np.subtract.at(surplus, from_rows, units)
+        np.subtract.at(deficit, to_rows, units)
+        surplus[surplus < min_qty] = 0
+        deficit[deficit < min_qty] = 0
+    if not legs:
+        return _empty_legs()
+    legs = pd.DataFrame({
+        'from_row': np.concatenate([leg[0] for leg in legs]),
+        'to_row': np.concatenate([leg[1] for leg in legs]),
+        'units': np.concatenate([leg[2] for leg in legs])
+    })
+    legs = legs.groupby(['from_row', 'to_row'], sort=False, as_index=False)['units'].sum()
+    order = np.argsort(pool[legs['from_row'].to_numpy()], kind='stable')
+    legs = legs.iloc[order]
+    return legs['from_row'].to_numpy(), legs['to_row'].to_numpy(), legs['units'].to_numpy()
+
+
+def _pool_totals(pool, legs, leg_cost, n_pools):
+    """Units moved and cost per pool of a set of legs"""
+    from_rows, _, units = legs
+    codes = pool[from_rows]
+    return (np.bincount(codes, weights=units, minlength=n_pools),
+            np.bincount(codes, weights=leg_cost(legs), minlength=n_pools))
+
+
+def no_worse_than_greedy(pool, legs, greedy, leg_cost):
+    """
+    Per pool, the legs of the solve unless the largest-first fill (greedy)
+    moves more units, or the same units at a lower cost; leg_cost gives each
+    leg's cost (1 per transfer, or units x km). Legs stay ordered by pool.
+    """
+    n_pools = int(pool.max()) + 1 if len(pool) else 0
+    units, cost = _pool_totals(pool, legs, leg_cost, n_pools)
+    greedy_units, greedy_cost = _pool_totals(pool, greedy, leg_cost, n_pools)
+    # Costs compared with a little slack, float unit-km of equal plans differ in the last bits
+    worse = (greedy_units > units) | ((greedy_units == units) & (greedy_cost < cost - 1e-6 * (1 + cost)))
+    keep_solve = ~worse[pool[legs[0]]]
+    keep_greedy = worse[pool[greedy[0]]]
+    merged = _concat_legs(
+        tuple(part[keep_solve] for part in legs),
+        tuple(part[keep_greedy] for part in greedy)
+    )
+    order = np.argsort(pool[merged[0]], kind='stable')
+    return tuple(part[order] for part in merged)
+
+
+def build_transfer_plan(recommendations, store_master=None, min_qty=MIN_TRANSFER_QTY, solve=True):
+    """
+    Inter-store transfer plan from the recommendation table.
+
+    Overstock rows (Inventory Optimization) offer their surplus over the
+    refill level; CRITICAL stock alerts ask for their refill gap. Each SKU
+    is matched inside its pool (region or city of the store master, else
+    the whole channel). Pools whose stores all have a store master location
+    are solved as a minimum-cost transportation problem on store-to-store
+    distance (match_nearest); the others at a fixed cost per transfer
+    (match_fewest). Either way a pool keeps the largest-first fill instead
+    when that moves more units, or the same units with fewer transfers or
+    unit-km, so the plan is never worse than the plain fill. Surpluses and
+    deficits below min_qty are not offered; legs below min_qty are dropped
+    and their units matched again (match_min_qty).
+    solve: False for the plain largest-first fill alone, as the baseline the solve is checked against
+    """
+    recs = recommendations.reset_index(drop=True)
+    group_column = None
+    if store_master is not None:
+        group_column = next((c for c in TRANSFER_GROUP_COLUMNS if c in store_master.columns), None)
+    groups = _transfer_groups(recs, store_master, group_column)
+
+    qty = pd.to_numeric(recs['reorder_qty'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    overstock = (recs['category'] == 'Inventory Optimization').to_numpy()
+    critical = (recs['priority'] == 'CRITICAL').to_numpy()
+    # Whole units only: give away at most the surplus, ask for the full gap
+    surplus = np.where(overstock, np.floor(qty), 0).astype(np.int64)
+    deficit = np.where(critical, np.ceil(qty), 0).astype(np.int64)
+    surplus[surplus < min_qty] = 0
+    deficit[deficit < min_qty] = 0
+
+    # One pool per (region/city, SKU), as a combined integer code
+    group_codes, _ = pd.factorize(groups)
+    sku_codes, sku_labels = pd.factorize(recs['sku_id'])
+    pool = group_codes.astype(np.int64) * len(sku_labels) + sku_codes
+    pool = pd.factorize(pool, sort=True)[0].astype(np.int64)
+
+    locations = _store_locations(recs, store_master)
+    n_pools = int(pool.max()) + 1 if len(pool) else 0
+    located = np.zeros(n_pools, dtype=bool)
+    if locations is not None and n_pools:
+        # A pool is matched on distance only if every store offering or asking in it has a location
+        known = np.isfinite(locations[0]) & np.isfinite(locations[1])
+        involved = (surplus > 0) | (deficit > 0)
+        located = np.bincount(pool[involved & ~known], minlength=n_pools) == 0
+        located &= np.bincount(pool[involved], minlength=n_pools) > 0
+        latitude, longitude = np.nan_to_num(locations[0]), np.nan_to_num(locations[1])
+
+    def match(pool, surplus, deficit):
+        by_count = ~located[pool]
+        legs = match_fewest(pool, np.where(by_count, surplus, 0), np.where(by_count, deficit, 0))
+        if located.any():
+            legs = _concat_legs(legs, match_nearest(
+                pool, np.where(by_count, 0, surplus), np.where(by_count, 0, deficit), latitude, longitude
+            ))
+        return legs
+
+    def leg_cost(legs):
+        from_rows, to_rows, units = legs
+        cost = np.ones(len(units))
+        on_distance = located[pool[from_rows]]
+        if on_distance.any():
+            f, t = from_rows[on_distance], to_rows[on_distance]
+            cost[on_distance] = units[on_distance] * distance_km(latitude[f], longitude[f], latitude[t], longitude[t])
+        return cost
+
+    greedy = match_min_qty(pool, surplus, deficit, min_qty)
+    if solve:
+        legs = match_min_qty(pool, surplus, deficit, min_qty, match=match)
+        from_rows, to_rows, units = no_worse_than_greedy(pool, legs, greedy, leg_cost)
+    else:
+        from_rows, to_rows, units = greedy
+    distance = np.full(len(units), np.nan)
+    if locations is not None:
+        distance = distance_km(locations[0][from_rows], locations[1][from_rows],
+                               locations[0][to_rows], locations[1][to_rows]).round(1)
+
+    source = recs.iloc[from_rows].reset_index(drop=True)
+    sink = recs.iloc[to_rows].reset_index(drop=True)
+    plan = pd.DataFrame({
+        'transfer_group': groups.iloc[to_rows].to_numpy(),
+        'sku_id': sink['sku_id'],
+        'brand_line': sink['brand_line'],
+        'sku_name': sink['sku_name'],
+        'from_store_id': source['store_id'],
+        'from_store_name': source['store_name'],
+        'from_surplus': surplus[from_rows],
+        'to_store_id': sink['store_id'],
+        'to_store_name': sink['store_name'],
+        'to_deficit': deficit[to_rows],
+        'to_priority': sink['priority'],
+        'transfer_qty': units,
+        'distance_km': distance,
+        'to_potential_revenue_loss': sink['potential_revenue_loss']
+    }, columns=TRANSFER_COLUMNS)
+    return plan
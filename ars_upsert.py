@@ -0,0 +1,190 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# A row is identified by these columns; its values by a hash stored next to it
+KEYS = ['store_id', 'sku_id', 'channel']
+HASH_COLUMN = 'row_hash'
+# Swap loads stage a channel's new rows in <table>_shadow; its replaced rows are left in <table>_old
+SHADOW_SUFFIX = '_shadow'
+OLD_SUFFIX = '_old'
+# Identity columns are not moved, the live table numbers its rows itself
+IDENTITY_COLUMNS = ('id',)
+# Application lock every writer of a table holds, so replace, diff and swap writes never interleave
+WRITE_LOCK = '{table} write'
+# Application lock a swap load holds on its channel's share of the shadow table
+SWAP_LOCK = '{table} swap {channel}'
+# A snapshot with fewer rows than this share of the channel's live rows fails validation
+SWAP_MIN_ROW_RATIO = 0.5
+
+
+def row_hashes(frame):
+    """Stable 64-bit hash of each row's values as written, signed to fit a BIGINT column"""
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+def diff_rows(frame, hashes, stored, keys=KEYS):
+    """
+    Compare frame (with its row hashes) to the stored (keys..., row_hash)
+    rows; keys must be unique on both sides. Returns the positions of new
+    rows in frame, of changed rows in frame, and the stored keys frame no
+    longer has.
+    """
+    stored_keys = pd.MultiIndex.from_frame(stored[keys].astype(str))
+    current_keys = pd.MultiIndex.from_frame(frame[keys].astype(str))
+    position = stored_keys.get_indexer(current_keys)
+    is_new = position < 0
+    stored_hashes = stored[HASH_COLUMN].to_numpy(np.int64)
+    is_changed = ~is_new & (stored_hashes[position] != hashes)
+    gone = stored.loc[~stored_keys.isin(current_keys), keys]
+    return np.flatnonzero(is_new), np.flatnonzero(is_changed), gone
+
+
+def _insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def merge_statements(merge_into, table, stage, gone, columns, keys=KEYS):
+    """
+    Set-based apply of two staging tables: stage holds new and changed rows,
+    which are inserted or update the stored row; gone holds only the keys
+    to delete. One MERGE where the backend has it (the gone keys join its
+    source with NULL values, so no table has to hold them), else
+    DELETE / UPDATE ... FROM / INSERT ... SELECT.
+    """
+    values = [c for c in columns if c not in keys]
+    if merge_into is not None:
+        source = (f"SELECT {', '.join(columns)} FROM {stage} UNION ALL "
+                  f"SELECT {', '.join(c if c in keys else f'NULL AS {c}' for c in columns)} FROM {gone}")
+        return [
+            f"{merge_into} USING ({source}) AS s ON {' AND '.join(f't.{k} = s.{k}' for k in keys)} "
+            f"WHEN MATCHED AND s.{HASH_COLUMN} IS NULL THEN DELETE "
+            f"WHEN MATCHED THEN UPDATE SET {', '.join(f'{c} = s.{c}' for c in values)} "
+            f"WHEN NOT MATCHED AND s.{HASH_COLUMN} IS NOT NULL THEN "
+            f"INSERT ({', '.join(columns)}) VALUES ({', '.join(f's.{c}' for c in columns)});"
+        ]
+    match = ' AND '.join(f'{table}.{k} = s.{k}' for k in keys)
+    return [
+        f"DELETE FROM {table} WHERE ({', '.join(keys)}) IN (SELECT {', '.join(keys)} FROM {gone})",
+        f"UPDATE {table} SET {', '.join(f'{c} = s.{c}' for c in values)} FROM {stage} AS s WHERE {match}",
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(f's.{c}' for c in columns)} FROM {stage} AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {match})",
+    ]
+
+
+def upsert_rows(session, table, frame, channel, input_sizes=None, keys=KEYS):
+    """
+    Change-only write of one channel's rows to table on an ars_db session,
+    committed under the table's write lock. Each row is hashed; only new and
+    changed rows are bulk-loaded into a temp staging table, the keys that
+    disappeared into a key-only one, and both are applied with one
+    set-based merge. The channel is fully replaced instead when it has no
+    hashed rows yet (first load, or rows written by the plain replace) or
+    when keys are not unique.
+    Returns and records on the session the inserted / updated / deleted /
+    unchanged counts and rows_written.
+    """
+    with session.exclusive(WRITE_LOCK.format(table=table)):
+        hashes = row_hashes(frame)
+        columns = list(frame.columns) + [HASH_COLUMN]
+        sizes = list(input_sizes) + [('bigint',)] if input_sizes else None
+        stored = session.read_frame(f"SELECT {', '.join(keys)}, {HASH_COLUMN} FROM {table} WHERE channel = ?", [channel])
+
+        if (not len(stored) or stored[HASH_COLUMN].isna().any()
+                or stored.duplicated(keys).any() or frame.duplicated(keys).any()):
+            session.execute(f"DELETE FROM {table} WHERE channel = ?", [channel])
+            rows = list(frame.assign(**{HASH_COLUMN: hashes}).itertuples(index=False, name=None))
+            session.executemany(_insert_sql(table, columns), rows, input_sizes=sizes)
+            stats = {'write_mode': 'replace', 'inserted': len(frame), 'updated': 0, 'deleted': len(stored),
+                     'unchanged': 0, 'rows_written': len(rows)}
+        else:
+            new, changed, gone = diff_rows(frame, hashes, stored, keys)
+            positions = np.sort(np.concatenate([new, changed]))
+            rows = list(frame.iloc[positions].assign(**{HASH_COLUMN: hashes[positions]}).itertuples(index=False, name=None))
+            # Vanished keys go to a key-only table, a copy of table may have NOT NULL value columns
+            gone_rows = list(gone[keys].astype(str).itertuples(index=False, name=None))
+            if rows or gone_rows:
+                stage = session.temp_table_like(f"{table}_stage", table)
+                gone_keys = session.temp_table_like(f"{table}_gone", table, keys)
+                if rows:
+                    session.executemany(_insert_sql(stage, columns), rows, input_sizes=sizes)
+                if gone_rows:
+                    key_sizes = [sizes[columns.index(k)] for k in keys] if sizes else None
+                    session.executemany(_insert_sql(gone_keys, keys), gone_rows, input_sizes=key_sizes)
+                for statement in merge_statements(session.pool.backend.merge_into(table), table, stage, gone_keys,
+                                                  columns, keys):
+                    session.execute(statement)
+                session.execute(f"DROP TABLE IF EXISTS {stage}")
+                session.execute(f"DROP TABLE IF EXISTS {gone_keys}")
+            stats = {'write_mode': 'diff', 'inserted': len(new), 'updated': len(changed), 'deleted': len(gone),
+                     'unchanged': len(frame) - len(new) - len(changed), 'rows_written': len(rows) + len(gone_rows)}
+    session.record.update(stats)
+    return stats
+
+
+def _count(session, query, params=None):
+    return int(session.read_frame(query, params).iloc[0, 0])
+
+
+def swap_load(session, table, frame, channel, input_sizes=None, keys=KEYS, min_row_ratio=SWAP_MIN_ROW_RATIO):
+    """
+    Replace one channel's rows of table so readers see the old rows or the
+    new ones, never an empty channel. The snapshot is bulk-loaded into the
+    channel's share of the shadow table and committed, holding only the
+    channel's SWAP_LOCK: table stays open to readers and to other channels'
+    writers, and no other channel's rows are read or copied. The shadow rows
+    are validated (row count, no NULL keys, not below min_row_ratio of the
+    live channel) and swapped in under the table's WRITE_LOCK by the
+    backend's swap_channel: a metadata-only partition switch on SQL Server,
+    a move of the channel's rows on the local stand-ins. Raises ValueError
+    if validation fails, leaving table untouched. Returns and records on
+    the session the row counts, load_s and swap_s (the time WRITE_LOCK is
+    held for the swap).
+    """
+    if not (frame['channel'] == channel).all():
+        raise ValueError(f"Swap load of {table} for {channel} has rows of other channels")
+    backend = session.pool.backend
+    shadow, old = f"{table}{SHADOW_SUFFIX}", f"{table}{OLD_SUFFIX}"
+    with session.exclusive(SWAP_LOCK.format(table=table, channel=channel)):
+        start = time.perf_counter()
+        # May split a partition for a new channel, which changes the table's metadata
+        with session.exclusive(WRITE_LOCK.format(table=table)):
+            backend.prepare_shadow(session, table, shadow, old, channel)
+        live_columns = list(session.read_frame(f"SELECT * FROM {table} WHERE 1 = 0").columns)
+
+        columns, sizes = list(frame.columns), input_sizes
+        if HASH_COLUMN in live_columns:
+            # Keep the table ready for a later diff write
+            frame = frame.assign(**{HASH_COLUMN: row_hashes(frame)})
+            columns = columns + [HASH_COLUMN]
+            sizes = list(input_sizes) + [('bigint',)] if input_sizes else None
+        insert = f"{backend.bulk_insert_into(shadow)} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        session.executemany(insert, list(frame.itertuples(index=False, name=None)), input_sizes=sizes)
+        session.commit()
+        load_s = time.perf_counter() - start
+
+        live = _count(session, f"SELECT COUNT(*) FROM {table} WHERE channel = ?", [channel])
+        loaded = _count(session, f"SELECT COUNT(*) FROM {shadow} WHERE channel = ?", [channel])
+        null_keys = _count(session, f"SELECT COUNT(*) FROM {shadow} WHERE channel = ? AND "
+                                    f"({' OR '.join(f'{k} IS NULL' for k in keys)})", [channel])
+        problems = []
+        if loaded != len(frame) or not loaded:
+            problems.append(f"{loaded} rows loaded for {len(frame)} in the snapshot")
+        if null_keys:
+            problems.append(f"{null_keys} rows with a NULL key")
+        if loaded < min_row_ratio * live:
+            problems.append(f"{loaded} rows replace {live}, below the {min_row_ratio:.0%} floor")
+        if problems:
+            raise ValueError(f"Shadow load of {table} for {channel} failed validation: {'; '.join(problems)}")
+
+        with session.exclusive(WRITE_LOCK.format(table=table)):
+            start = time.perf_counter()
+            move_columns = [c for c in live_columns if c.lower() not in IDENTITY_COLUMNS]
+            backend.swap_channel(session, table, shadow, old, channel, move_columns)
+            session.commit()
+            swap_s = time.perf_counter() - start
+    stats = {'write_mode': 'swap', 'inserted': loaded, 'deleted': live, 'rows_written': loaded,
+             'load_s': round(load_s, 4), 'swap_s': round(swap_s, 4)}
+    session.record.update(stats)
+    return stats
@@ -0,0 +1,112 @@
+"""
+Benchmark: vectorized warehouse allocation vs a per-SKU priority/fair-share loop.
+
+Run from the repo root:
+    python -m benchmarks.bench_allocation --stores 2000 --skus 5000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ars_allocation import build_allocation
+from ars_rules import ARS_RULES
+
+SEGMENTS = ['A - High Value', 'B - Regular', 'C - Moderate', 'D - Slow Moving']
+BUCKETS = ['Star_Store', 'Average_Store', 'Laggard_Store']
+
+
+def make_inputs(n_stores, n_skus, row_share=0.1, seed=19):
+    """Stock alert rows with segments and store buckets, warehouse stock and case packs per SKU"""
+    rng = np.random.default_rng(seed)
+    n_rows = int(n_stores * n_skus * row_share)
+    keys = rng.choice(n_stores * n_skus, size=n_rows, replace=False)
+    stores = np.array([f'S{i:04d}' for i in range(n_stores)], dtype=object)
+    skus = np.array([str(30100000 + i) for i in range(n_skus)], dtype=object)
+    segment = np.array(SEGMENTS, dtype=object)[rng.integers(0, 4, n_rows)]
+    recommendations = pd.DataFrame({
+        'store_id': stores[keys // n_skus],
+        'store_name': 'Store ' + stores[keys // n_skus],
+        'sku_id': skus[keys % n_skus],
+        'brand_line': 'Brand',
+        'sku_name': 'Sku ' + skus[keys % n_skus],
+        'store_type': np.array(BUCKETS, dtype=object)[rng.integers(0, 3, n_rows)],
+        'priority': np.where(np.isin(segment, SEGMENTS[:2]), 'CRITICAL', 'Medium'),
+        'category': 'Stock Alert',
+        'reorder_qty': rng.gamma(1.5, 4.0, n_rows).round() + 1,
+        'potential_revenue_loss': rng.gamma(1.5, 500.0, n_rows).round(2)
+    })
+    metrics = recommendations[['store_id', 'sku_id']].assign(sku_segment=segment)
+    sku_master = pd.DataFrame({'sku_id': skus, 'case_pack': rng.choice([1, 1, 3, 6, 12], n_skus)})
+    # Roughly half the requested volume is on hand in the warehouse
+    requested = recommendations.groupby('sku_id')['reorder_qty'].sum().reindex(skus).fillna(0).to_numpy()
+    warehouse_stock = pd.DataFrame({'sku_id': skus, 'warehouse_stock': (requested * rng.uniform(0, 1, n_skus)).round()})
+    return recommendations, metrics, warehouse_stock, sku_master
+
+
+def loop_allocation(recommendations, metrics, warehouse_stock, sku_master):
+    """Per-SKU loop: fill tiers in order, fair-share the tier where stock runs out"""
+    segment_rank = {label: i for i, label in enumerate(SEGMENTS)}
+    bucket_rank = {label: i for i, label in enumerate(BUCKETS)}
+    stock = dict(zip(warehouse_stock['sku_id'], warehouse_stock['warehouse_stock']))
+    packs_of = dict(zip(sku_master['sku_id'], sku_master['case_pack']))
+    frame = recommendations.assign(sku_segment=metrics['sku_segment'].to_numpy())
+    allocated = {}
+    for sku, rows in frame.groupby('sku_id'):
+        pack = int(packs_of.get(sku, 1))
+        left = int(stock.get(sku, 0) // pack)
+        rows = rows.assign(
+            tier=rows['sku_segment'].map(segment_rank) * 4 + rows['store_type'].map(bucket_rank),
+            request=np.ceil(rows['reorder_qty'] / pack).astype(int)
+        ).sort_values(['tier', 'potential_revenue_loss'], ascending=[True, False])
+        for _, tier_rows in rows.groupby('tier', sort=True):
+            tier_request = tier_rows['request'].sum()
+            if left >= tier_request:
+                for index, request in tier_rows['request'].items():
+                    allocated[index] = request * pack
+                left -= tier_request
+                continue
+            shares = np.floor(tier_rows['request'].to_numpy() * left / tier_request).astype(int)
+            extra = left - shares.sum()
+            shares[:extra] += 1
+            for index, share in zip(tier_rows.index, shares):
+                allocated[index] = share * pack
+            left = 0
+    return pd.Series(allocated).reindex(recommendations.index).fillna(0).to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=2000)
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--loop-skus', type=int, default=200, help='SKUs to time with the per-SKU loop')
+    args = parser.parse_args()
+
+    recommendations, metrics, warehouse_stock, sku_master = make_inputs(args.stores, args.skus)
+    print(f"stock alert rows={len(recommendations):,} skus={args.skus:,}")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    allocation = build_allocation(recommendations, metrics, warehouse_stock, sku_master=sku_master, rules=ARS_RULES)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"vectorized time={secs:.2f}s peak={peak / 1e6:.0f}MB "
+          f"allocated={int(allocation['allocated_qty'].sum()):,} of {int(allocation['requested_qty'].sum()):,} units")
+
+    sample_skus = warehouse_stock['sku_id'].iloc[:args.loop_skus]
+    in_sample = recommendations['sku_id'].isin(sample_skus).to_numpy()
+    sample = recommendations[in_sample].reset_index(drop=True)
+    sample_metrics = metrics[in_sample].reset_index(drop=True)
+    start = time.perf_counter()
+    loop = loop_allocation(sample, sample_metrics, warehouse_stock, sku_master)
+    loop_secs = time.perf_counter() - start
+    print(f"loop       {loop_secs:.2f}s for {len(sample_skus)} SKUs, ~{loop_secs / len(sample_skus) * args.skus:.0f}s for all")
+    batched = build_allocation(sample, sample_metrics, warehouse_stock, sku_master=sku_master)
+    print(f"sample rows with a different allocation: {(batched['allocated_qty'].to_numpy() != loop).sum()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: build time and memory of the store x SKU x week demand cube.
+
+Run from the repo root:
+    python -m benchmarks.bench_demand_cube --stores 2000 --skus 5000 --weeks 40
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ars_cube import DemandCube
+
+
+def make_daily_buckets(n_stores, n_skus, n_weeks, pair_share, week_share, seed=11):
+    """One bucket per selling store-SKU-week, dated on a random weekday of that week"""
+    rng = np.random.default_rng(seed)
+    n_pairs = int(n_stores * n_skus * pair_share)
+    pair_keys = rng.choice(n_stores * n_skus, size=n_pairs, replace=False)
+    weeks_sold = rng.binomial(n_weeks, week_share, n_pairs).clip(1, n_weeks)
+    pair_rows = np.repeat(pair_keys, weeks_sold)
+    week_offsets = rng.integers(0, n_weeks, len(pair_rows))
+    start = pd.Timestamp('2024-01-01')
+    dates = start + pd.to_timedelta(week_offsets * 7 + rng.integers(0, 7, len(pair_rows)), unit='D')
+    units = rng.poisson(1.2, len(pair_rows)) + 1
+    return pd.DataFrame({
+        'store_id': pd.Categorical.from_codes(pair_rows // n_skus, [f'S{i:04d}' for i in range(n_stores)]),
+        'sku_id': pd.Categorical.from_codes(pair_rows % n_skus, [str(30100000 + i) for i in range(n_skus)]),
+        'date': dates,
+        'sales_units': units,
+        'sales_value': units * 499.0,
+        'n_lines': 1
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=2000)
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--weeks', type=int, default=40)
+    parser.add_argument('--pair-share', type=float, default=0.1, help='share of store-SKUs with any sale')
+    parser.add_argument('--week-share', type=float, default=0.3, help='share of weeks a selling store-SKU sells in')
+    args = parser.parse_args()
+
+    daily = make_daily_buckets(args.stores, args.skus, args.weeks, args.pair_share, args.week_share)
+    dense_bytes = args.stores * args.skus * args.weeks * np.dtype(np.float64).itemsize
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    cube = DemandCube.from_daily(daily)
+    build_secs = time.perf_counter() - start
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    cube.weekly_mean()
+    cube.weekly_std()
+    cube.sale_frequency()
+    reduce_secs = time.perf_counter() - start
+
+    print(f"buckets={len(daily):,} store-skus={len(cube.pair_store):,} weeks={cube.n_weeks}")
+    print(f"build={build_secs:.2f}s reductions={reduce_secs:.2f}s")
+    print(f"cube={cube.nbytes() / 1e6:.1f}MB build_peak={build_peak / 1e6:.1f}MB "
+          f"dense_float64={dense_bytes / 1e6:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: pd.read_sql vs the fetchmany column-batch reader (ars_fetch) on a local SQLite Base table.
+
+Run from the repo root:
+    python -m benchmarks.bench_fetch --rows 2000000
+
+Each method runs in its own process; memory is the peak RSS growth over the
+process after imports. read_frame must return the same DataFrame as
+pd.read_sql. SQLite reports no column types, so read_frame infers them;
+read_frame_typed wraps the cursor to declare them as pyodbc does for SQL
+Server.
+"""
+import argparse
+import os
+import pickle
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+QUERY = """
+    SELECT [Date] AS date_str, [Store code] AS store_id, [Mat code] AS sku_id,
+           [MRP Sales] AS sales_value, [Qty] AS sales_units
+    FROM Base
+    WHERE Platform = ?
+"""
+# Python types pyodbc reports in cursor.description for the QUERY columns
+QUERY_TYPES = [str, str, str, float, int]
+METHODS = ['read_sql', 'read_frame', 'read_frame_typed']
+
+
+class _TypedCursor:
+    def __init__(self, cursor, types):
+        self.cursor = cursor
+        self.types = types
+
+    @property
+    def description(self):
+        return [(column[0], type_code) + tuple(column[2:]) for column, type_code in zip(self.cursor.description, self.types)]
+
+    def execute(self, *args):
+        self.cursor.execute(*args)
+        return self
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def close(self):
+        self.cursor.close()
+
+
+class DeclaredTypes:
+    """sqlite3 connection whose cursors report column types the way pyodbc does"""
+
+    def __init__(self, connection, types):
+        self.connection = connection
+        self.types = types
+
+    def cursor(self):
+        return _TypedCursor(self.connection.cursor(), self.types)
+
+
+def make_database(path, n_rows, seed=0):
+    """SQLite Base table shaped like the sales source: dd-mm-yyyy date strings, codes, MRP Sales and Qty"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=400).strftime('%d-%m-%Y').to_numpy()
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE Base ([Date] TEXT, [Store code] TEXT, [Mat code] TEXT, '
+                       '[MRP Sales] REAL, [Qty] INTEGER, Platform TEXT)')
+    batch = 500_000
+    for start in range(0, n_rows, batch):
+        n = min(batch, n_rows - start)
+        qty = rng.geometric(0.7, n)
+        rows = zip(
+            days[rng.integers(0, len(days), n)].tolist(),
+            [f'S{i:04d}' for i in rng.integers(0, 500, n)],
+            [str(30100000 + i) for i in rng.integers(0, 20000, n)],
+            (qty * rng.choice([199.0, 499.0, 1299.5], n)).tolist(),
+            qty.tolist(),
+            ['Bench'] * n
+        )
+        connection.executemany('INSERT INTO Base VALUES (?, ?, ?, ?, ?, ?)', rows)
+    connection.commit()
+    connection.close()
+
+
+def run_method(db_path, method, output_path, batch_rows):
+    """Child process: fetch with one method, pickle timing, peak memory and the result"""
+    from ars_fetch import read_frame
+    from ars_instrument import peak_rss_mb
+
+    connection = sqlite3.connect(db_path)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if method == 'read_sql':
+        frame = pd.read_sql(QUERY, connection, params=['Bench'])
+    elif method == 'read_frame':
+        frame = read_frame(connection, QUERY, ['Bench'], batch_rows=batch_rows)
+    else:
+        frame = read_frame(DeclaredTypes(connection, QUERY_TYPES), QUERY, ['Bench'], batch_rows=batch_rows)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    with open(output_path, 'wb') as f:
+        pickle.dump({'seconds': elapsed, 'peak_growth_mb': peak_rss_mb() - baseline, 'frame': frame}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch-rows', type=int, default=50_000)
+    parser.add_argument('--db', help='SQLite file to reuse, generated in a temporary directory if not given')
+    parser.add_argument('--child', nargs=3, metavar=('DB', 'METHOD', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_method(*args.child, batch_rows=args.batch_rows)
+        return
+
+    scratch = tempfile.TemporaryDirectory()
+    try:
+        db_path = args.db or os.path.join(scratch.name, 'base.db')
+        if not os.path.exists(db_path):
+            make_database(db_path, args.rows)
+        results = {}
+        for method in METHODS:
+            output_path = os.path.join(scratch.name, f'{method}.pkl')
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_fetch', '--child', db_path, method, output_path,
+                            '--batch-rows', str(args.batch_rows)], check=True)
+            with open(output_path, 'rb') as f:
+                results[method] = pickle.load(f)
+            os.remove(output_path)
+
+        expected = results['read_sql']
+        print(f"rows={len(expected['frame']):,} batch_rows={args.batch_rows:,}")
+        for method, result in results.items():
+            same = result['frame'].equals(expected['frame'])
+            print(f"{method:<16} {result['seconds']:7.2f}s  peak RSS growth {result['peak_growth_mb']:7.0f}MB  "
+                  f"same={same}")
+    finally:
+        scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
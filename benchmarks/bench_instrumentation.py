@@ -0,0 +1,40 @@
+"""
+Benchmark: per-stage cost of the run report, switched off and on.
+
+Run from the repo root:
+    python -m benchmarks.bench_instrumentation --stages 100000
+"""
+import argparse
+import tempfile
+import time
+
+from ars_instrument import NullReport, RunReport
+
+
+def time_stages(report, n_stages):
+    start = time.perf_counter()
+    for i in range(n_stages):
+        with report.stage('stage', rows_in=i) as stage:
+            stage['rows_out'] = i
+    return (time.perf_counter() - start) / n_stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stages', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as report_dir:
+        reports = [
+            ('off', NullReport()),
+            ('on', RunReport('bench', report_dir=report_dir)),
+            ('on+trace', RunReport('bench', report_dir=report_dir, trace_memory=True)),
+        ]
+        for label, report in reports:
+            per_stage = time_stages(report, args.stages)
+            print(f"{label:<9} {per_stage * 1e6:.2f}us per stage")
+            report.write()
+
+
+if __name__ == '__main__':
+    main()
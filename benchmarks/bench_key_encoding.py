@@ -0,0 +1,89 @@
+"""
+Benchmark: string store/SKU keys vs dictionary-encoded keys through the sales stage.
+
+Run from the repo root:
+    python -m benchmarks.bench_key_encoding --lines 2000000 --stores 500 --skus 4000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ars_keys import KeyEncoder, as_key_categorical
+from ars_sales import bucket_daily_sales, summarize_sales
+
+
+def make_channel(n_lines, n_stores, n_skus, n_days=270, seed=5):
+    """Invoice lines and a stock snapshot with ids as they come out of the database (object strings)"""
+    rng = np.random.default_rng(seed)
+    store_ids = np.array([f'ST{i:05d}' for i in range(n_stores)], dtype=object)
+    sku_ids = np.array([str(30100000 + i) for i in range(n_skus)], dtype=object)
+    # Skewed SKU popularity, as in real assortments
+    sku_weights = 1 / np.arange(1, n_skus + 1) ** 0.8
+    sku_rows = rng.choice(n_skus, size=n_lines, p=sku_weights / sku_weights.sum())
+    units = rng.poisson(0.6, n_lines) + 1
+    sales = pd.DataFrame({
+        'store_id': store_ids[rng.integers(0, n_stores, n_lines)],
+        'sku_id': sku_ids[sku_rows],
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, n_days, n_lines), unit='D'),
+        'sales_units': units,
+        'sales_value': units * 399
+    })
+    stock = pd.DataFrame({
+        'store_id': np.repeat(store_ids, n_skus // 4),
+        'sku_id': np.tile(sku_ids[:n_skus // 4], n_stores),
+        'current_stock': rng.integers(0, 20, n_stores * (n_skus // 4))
+    })
+    return sales, stock
+
+
+def run_string_keys(sales, stock):
+    sales = sales.assign(store_id=sales['store_id'].astype(str), sku_id=sales['sku_id'].astype(str))
+    stock = stock.assign(store_id=stock['store_id'].astype(str), sku_id=stock['sku_id'].astype(str))
+    summary = summarize_sales(bucket_daily_sales(sales))
+    return pd.merge(summary, stock, on=['store_id', 'sku_id'], how='left')
+
+
+def run_encoded_keys(sales, stock):
+    sales = sales.assign(store_id=as_key_categorical(sales['store_id']), sku_id=as_key_categorical(sales['sku_id']))
+    stock = stock.assign(store_id=as_key_categorical(stock['store_id']), sku_id=as_key_categorical(stock['sku_id']))
+    encoder = KeyEncoder.fit(sales, stock)
+    summary = summarize_sales(bucket_daily_sales(encoder.encode(sales)))
+    return pd.merge(summary, encoder.encode(stock), on=['store_id', 'sku_id'], how='left')
+
+
+def measure(label, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} time={secs:.2f}s peak={peak / 1e6:.1f}MB "
+          f"result={result.memory_usage(deep=True).sum() / 1e6:.1f}MB rows={len(result):,}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=2_000_000)
+    parser.add_argument('--stores', type=int, default=500)
+    parser.add_argument('--skus', type=int, default=4000)
+    args = parser.parse_args()
+
+    sales, stock = make_channel(args.lines, args.stores, args.skus)
+    print(f"lines={len(sales):,} stock rows={len(stock):,}")
+    strings = measure('strings', run_string_keys, sales, stock)
+    encoded = measure('encoded', run_encoded_keys, sales, stock)
+
+    keys = ['store_id', 'sku_id']
+    left = strings.sort_values(keys).reset_index(drop=True)
+    right = encoded.astype({key: str for key in keys}).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(left, right, check_dtype=False)
+    print("outputs match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: keyed metrics table vs the chained pd.merge build of store-SKU metrics.
+
+Run from the repo root:
+    python -m benchmarks.bench_metrics_join --stores 1000 --skus 3000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ars_dow import SHARE_COLUMNS
+from ars_metrics import build_store_sku_metrics
+from ars_rules import ARS_RULES, compile_segment_rules, compile_quantile_buckets, compile_service_levels
+from ars_sales import SUMMARY_COLUMNS
+
+DAYS = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+
+def make_inputs(n_stores, n_skus, pair_share=0.6, seed=3):
+    """Sales summary, stock, planogram and SKU master sharing one key vocabulary"""
+    rng = np.random.default_rng(seed)
+    stores = pd.Index([f'ST{i:05d}' for i in range(n_stores)])
+    skus = pd.Index([str(30100000 + i) for i in range(n_skus)])
+    all_pairs = np.arange(n_stores * n_skus)
+    pairs = np.sort(rng.choice(all_pairs, size=int(len(all_pairs) * pair_share), replace=False))
+    n = len(pairs)
+
+    def keys(pair_rows):
+        return {
+            'store_id': pd.Categorical.from_codes(pair_rows // n_skus, stores),
+            'sku_id': pd.Categorical.from_codes(pair_rows % n_skus, skus)
+        }
+
+    weekly = rng.gamma(1.5, 2.0, n)
+    summary = pd.DataFrame({
+        **keys(pairs),
+        'total_sales': (weekly * 39).round().astype(np.int64),
+        'total_sales_value': (weekly * 39 * 450).round().astype(np.int64),
+        'total_sales_days': rng.integers(1, 270, n),
+        'weeks_of_data': rng.integers(1, 39, n),
+        'total_weeks': 39,
+        'sales_std': rng.gamma(1.0, 1.5, n).round(3),
+        'avg_weekly_sales': weekly.round(3),
+        'avg_weekly_revenue': (weekly * 450).round(3),
+        'sale_frequency_in_weeks': rng.random(n).round(2),
+        'sales_velocity': weekly.round(2),
+        'avg_sales_90day': (weekly * 450).round(2),
+        'avg_sales_30day': (weekly * 450).round(2),
+        'peak_day': DAYS[rng.integers(0, 7, n)],
+        **dict(zip(SHARE_COLUMNS, (rng.dirichlet(np.ones(7), n).round(3)).T))
+    })[SUMMARY_COLUMNS]
+    stock = pd.DataFrame({**keys(all_pairs), 'current_stock': rng.integers(0, 30, len(all_pairs)).astype(float)})
+    plano = pd.DataFrame({
+        **keys(all_pairs),
+        'mdq': rng.integers(1, 6, len(all_pairs)),
+        'store_name': np.repeat(np.array([f'Store {i}' for i in range(n_stores)], dtype=object), n_skus),
+        'channel': 'Nykaa FSN'
+    })
+    sku_master = pd.DataFrame({
+        'sku_id': pd.Categorical(skus, categories=skus),
+        'brand_line': 'Brand',
+        'sku_name': np.array([f'SKU {i}' for i in range(n_skus)], dtype=object),
+        'MRP': rng.integers(99, 2999, n_skus)
+    })
+    return summary, stock, plano, sku_master
+
+
+def legacy_store_sku_metrics(sales_summary, stock_data, plano_data, sku_master, rules, lead_time_weeks=3):
+    """The merge chain analyze_store_sku_performance used before the keyed table"""
+    weekly_stats = sales_summary[SUMMARY_COLUMNS[:11]]
+    m = pd.merge(weekly_stats, stock_data, on=['store_id', 'sku_id'], how='left', validate='1:1')
+    m['current_stock'] = m['current_stock'].replace([np.inf, -np.inf, 0, ''], np.nan).fillna(0)
+    m['weeks_coverage'] = (m['current_stock'] / m['avg_weekly_sales']).replace([np.inf, -np.inf, ''], np.nan).round(2)
+    m['weeks_coverage'] = m['weeks_coverage'].fillna(0)
+    m = pd.merge(m, sales_summary[['store_id', 'sku_id', 'sales_velocity', 'avg_sales_90day', 'avg_sales_30day']],
+                 on=['store_id', 'sku_id'], how='left')
+    for column in ['sales_velocity', 'avg_sales_90day', 'avg_sales_30day']:
+        m[column] = m[column].replace([np.inf, -np.inf, 0, '', ' '], np.nan).fillna(0)
+    m['revenue_rank'] = m.groupby('store_id', observed=True)['avg_weekly_revenue'].rank(ascending=False).round()
+    m['sku_segment'] = compile_segment_rules(rules['sku_segment'])(m)
+    store_revenue = m.groupby('store_id', observed=True)['avg_weekly_revenue'].sum().reset_index()
+    store_revenue.columns = ['store_id', 'total_revenue']
+    store_revenue['performance_bucket'] = compile_quantile_buckets(rules['performance_bucket'])(store_revenue['total_revenue'])
+    m = pd.merge(m, store_revenue[['store_id', 'performance_bucket']], on='store_id', how='left')
+    z = compile_service_levels(rules['service_level_z'])
+    m['safety_stock'] = (z(m['sku_segment']) * m['sales_std'] * np.sqrt(lead_time_weeks)).round(2)
+    m['refill_level'] = (m['avg_weekly_sales'] * 8 + m['safety_stock']).round()
+    m = pd.merge(m, plano_data[['store_id', 'sku_id', 'mdq']], on=['store_id', 'sku_id'], how='left')
+    m['refill_level'] = m[['refill_level', 'mdq']].max(axis=1)
+    m['weeks_until_stockout'] = np.where(m['sales_velocity'] > 0, m['current_stock'] / m['sales_velocity'],
+                                         float('inf')).round(1)
+    m['potential_revenue_loss'] = np.where(m['weeks_coverage'] < lead_time_weeks,
+                                           m['avg_weekly_revenue'] * (lead_time_weeks - m['weeks_coverage']),
+                                           0).astype(int)
+    m = pd.merge(m, sales_summary[['store_id', 'sku_id', 'peak_day'] + SHARE_COLUMNS], on=['store_id', 'sku_id'], how='left')
+    m = pd.merge(m, sku_master[['sku_id', 'brand_line', 'sku_name', 'MRP']], on=['sku_id'], how='left')
+    plano_store = plano_data.drop_duplicates(subset=['store_id'])
+    return pd.merge(m, plano_store[['store_id', 'store_name', 'channel']], on=['store_id'], how='left')
+
+
+def measure(label, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} time={secs:.2f}s peak={peak / 1e6:.1f}MB rows={len(result):,}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=1000)
+    parser.add_argument('--skus', type=int, default=3000)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    summary, stock, plano, sku_master = make_inputs(args.stores, args.skus)
+    print(f"store-skus with sales={len(summary):,} stock/planogram rows={len(stock):,}")
+    keyed = measure('keyed', build_store_sku_metrics, summary, stock, plano, sku_master, ARS_RULES)
+    if not args.skip_legacy:
+        legacy = measure('merges', legacy_store_sku_metrics, summary, stock, plano, sku_master, ARS_RULES)
+        pd.testing.assert_frame_equal(legacy, keyed)
+        print("outputs match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: serial to_csv + pd.ExcelWriter vs the concurrent ArtifactWriter with streaming Excel.
+
+Run from the repo root:
+    python -m benchmarks.bench_output_writers --rows 300000
+
+Each mode runs in its own process and reports its peak RSS; tracemalloc
+slows openpyxl's per-cell objects down too much to time it fairly.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ars_output import ArtifactWriter, write_excel_streaming
+
+
+def make_metrics(n_rows, seed=9):
+    """Store-SKU metrics shaped like store_metric.csv: ids, floats with inf, segment strings"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'store_id': pd.Categorical.from_codes(rng.integers(0, 1000, n_rows), [f'ST{i:05d}' for i in range(1000)]),
+        'sku_id': pd.Categorical.from_codes(rng.integers(0, 5000, n_rows), [str(30100000 + i) for i in range(5000)]),
+    })
+    for i in range(20):
+        frame[f'metric_{i}'] = rng.gamma(1.5, 2.0, n_rows).round(3)
+    frame['weeks_until_stockout'] = np.where(rng.random(n_rows) < 0.2, np.inf, rng.gamma(2, 2, n_rows).round(1))
+    frame['sku_segment'] = np.array(['A - High Value', 'B - Regular', 'C - Moderate', 'D - Slow Moving'],
+                                    dtype=object)[rng.integers(0, 4, n_rows)]
+    frame['store_name'] = 'Nykaa Luxe Store'
+    return frame
+
+
+def serial_outputs(metrics, no_sales, critical, output_dir):
+    metrics.to_csv(os.path.join(output_dir, 'store_metric.csv'), index=False)
+    no_sales.to_csv(os.path.join(output_dir, 'no_sale_inv.csv'), index=False)
+    critical.to_csv(os.path.join(output_dir, 'insights2.csv'), index=False)
+    with pd.ExcelWriter(os.path.join(output_dir, 'retail_ars.xlsx'), engine='openpyxl') as writer:
+        metrics.to_excel(writer, sheet_name='store_analysis', index=False)
+        no_sales.to_excel(writer, sheet_name='no_sales', index=False)
+
+
+def concurrent_outputs(metrics, no_sales, critical, output_dir, formats):
+    writer = ArtifactWriter(formats=formats, output_dir=output_dir)
+    writer.table(metrics, 'store_metric')
+    writer.table(no_sales, 'no_sale_inv')
+    writer.table(critical, 'insights2')
+    writer.excel('retail_ars.xlsx', {'store_analysis': metrics, 'no_sales': no_sales})
+    writer.wait()
+
+
+MODES = {
+    'serial': serial_outputs,
+    'concurrent-csv': lambda m, n, c, d: concurrent_outputs(m, n, c, d, ('csv',)),
+    'concurrent-csv+parquet': lambda m, n, c, d: concurrent_outputs(m, n, c, d, ('csv', 'parquet')),
+}
+
+
+def run_mode(mode, n_rows):
+    metrics = make_metrics(n_rows)
+    no_sales = metrics.iloc[:n_rows // 2]
+    critical = metrics.iloc[:n_rows // 5]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        MODES[mode](metrics, no_sales, critical, output_dir)
+        secs = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:<24} time={secs:.2f}s peak_rss={peak_rss / 1e3:.0f}MB (inputs {base_rss / 1e3:.0f}MB)")
+
+
+def spill_check(n_rows, rows_per_sheet):
+    from openpyxl import load_workbook
+    with tempfile.TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, 'spill.xlsx')
+        write_excel_streaming(path, {'store_analysis': make_metrics(n_rows)}, max_rows=rows_per_sheet)
+        workbook = load_workbook(path, read_only=True)
+        print("spill sheets:", [(ws.title, sum(1 for _ in ws.iter_rows(values_only=True))) for ws in workbook.worksheets])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--skip-serial', action='store_true')
+    parser.add_argument('--mode', choices=sorted(MODES), help='run a single mode in this process')
+    parser.add_argument('--spill-check', type=int, default=0,
+                        help='also write a workbook with this many rows per sheet to show spilling')
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows)
+        return
+    for mode in MODES:
+        if mode == 'serial' and args.skip_serial:
+            continue
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_output_writers',
+                        '--rows', str(args.rows), '--mode', mode], check=True)
+    if args.spill_check:
+        spill_check(args.rows, args.spill_check)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: columnar recommendation builder vs the old iterrows loops.
+
+Run from the repo root:
+    python -m benchmarks.bench_recommendations --rows 1000000 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ars_recommendations import build_sku_recommendations
+
+SEGMENTS = np.array(['A - High Value', 'B - Regular', 'C - Moderate', 'D - Slow Moving'], dtype=object)
+BUCKETS = np.array(['Star_Store', 'Average_Store', 'Laggard_Store'], dtype=object)
+
+
+def make_store_sku_metrics(n_rows, n_stores=2000, seed=7):
+    """Random store-SKU metrics with the columns generate_sku_recommendations reads"""
+    rng = np.random.default_rng(seed)
+    store_codes = rng.integers(0, n_stores, n_rows)
+    sku_codes = rng.integers(0, 100000, n_rows)
+    # Shared string vocabularies, as the real frame repeats each store and SKU id
+    store_ids = np.array([f'S{i:04d}' for i in range(n_stores)], dtype=object)
+    store_names = np.array([f'Store {i}' for i in range(n_stores)], dtype=object)
+    sku_ids = np.array([str(30100000 + i) for i in range(100000)], dtype=object)
+    avg_weekly_sales = rng.gamma(0.6, 1.5, n_rows).round(3)
+    current_stock = rng.poisson(4, n_rows).astype(float)
+    sales_velocity = rng.gamma(0.6, 1.5, n_rows).round(2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weeks_coverage = np.where(avg_weekly_sales > 0, current_stock / avg_weekly_sales, 0).round(2)
+        weeks_until_stockout = np.where(sales_velocity > 0, current_stock / sales_velocity, np.inf).round(1)
+    return pd.DataFrame({
+        'store_id': store_ids[store_codes],
+        'sku_id': sku_ids[sku_codes],
+        'store_name': store_names[store_codes],
+        'brand_line': 'Brand',
+        'sku_name': 'Product',
+        'mdq': rng.integers(1, 6, n_rows).astype(float),
+        'avg_weekly_sales': avg_weekly_sales,
+        'avg_weekly_revenue': (avg_weekly_sales * rng.integers(199, 2999, n_rows)).round(3),
+        'current_stock': current_stock,
+        'sku_segment': SEGMENTS[rng.integers(0, 4, n_rows)],
+        'performance_bucket': BUCKETS[rng.integers(0, 3, n_rows)],
+        'weeks_until_stockout': weeks_until_stockout,
+        'weeks_coverage': weeks_coverage,
+        'refill_level': rng.integers(1, 12, n_rows).astype(float),
+        'potential_revenue_loss': rng.integers(0, 5000, n_rows),
+    })
+
+
+def legacy_sku_recommendations(store_sku_metrics, lead_time=3):
+    """The four iterrows loops from generate_sku_recommendations, kept as the baseline"""
+    recommendations = []
+    blocks = [
+        (store_sku_metrics['weeks_until_stockout'] < lead_time, ['A - High Value', 'B - Regular'], 'CRITICAL', 'Stock Alert'),
+        (store_sku_metrics['weeks_until_stockout'] < lead_time, ['C - Moderate', 'D - Slow Moving'], 'Medium', 'Stock Alert'),
+        (store_sku_metrics['weeks_coverage'] > lead_time + 1, ['A - High Value', 'B - Regular'], 'MEDIUM', 'Inventory Optimization'),
+        (store_sku_metrics['weeks_coverage'] > lead_time + 1, ['C - Moderate', 'D - Slow Moving'], 'Low', 'Inventory Optimization'),
+    ]
+    for condition, segments, priority, category in blocks:
+        subset = store_sku_metrics[condition & store_sku_metrics['sku_segment'].isin(segments)]
+        for _, item in subset.iterrows():
+            if category == 'Stock Alert':
+                reorder_qty = item['refill_level'] - item['current_stock']
+                action = (f"SKU {item['sku_id']} ({item['sku_segment']}) will stockout in {item['weeks_until_stockout']:.1f} weeks. "
+                          f"Order {max(item['refill_level'] - item['current_stock'], 0):.0f} units. "
+                          f"Potential weekly revenue loss: INR {item['potential_revenue_loss']:.2f}")
+            else:
+                reorder_qty = item['current_stock'] - (item['refill_level'])
+                action = (f"Excess inventory of SKU {item['sku_id']}. Consider redistributing "
+                          f"{(item['current_stock'] - (item['refill_level'])):.0f} units. "
+                          f"Current coverage: {item['weeks_coverage']:.1f} weeks")
+            recommendations.append({
+                'store_id': item['store_id'],
+                'store_name': item['store_name'],
+                'sku_id': item['sku_id'],
+                'brand_line': item['brand_line'],
+                'sku_name': item['sku_name'],
+                'mdq': item['mdq'],
+                'avg_sale_unit_weekly': item['avg_weekly_sales'],
+                'avg_mrp_sales_weekly': item['avg_weekly_revenue'],
+                'current_stock': item['current_stock'],
+                'store_type': item['performance_bucket'],
+                'priority': priority,
+                'category': category,
+                'inventory_weeks': item['weeks_until_stockout'],
+                'refill_level': item['refill_level'],
+                'reorder_qty': reorder_qty,
+                'potential_revenue_loss': item['potential_revenue_loss'],
+                'action': action
+            })
+    return pd.DataFrame(recommendations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--skip-legacy', action='store_true', help='time only the columnar builder')
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        metrics = make_store_sku_metrics(n_rows)
+
+        start = time.perf_counter()
+        columnar = build_sku_recommendations(metrics)
+        columnar_secs = time.perf_counter() - start
+        line = f"rows={n_rows:>9,} recommendations={len(columnar):>9,} columnar={columnar_secs:8.2f}s"
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            legacy = legacy_sku_recommendations(metrics)
+            legacy_secs = time.perf_counter() - start
+            pd.testing.assert_frame_equal(columnar, legacy, check_dtype=False)
+            line += f" iterrows={legacy_secs:8.2f}s speedup={legacy_secs / columnar_secs:6.1f}x"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
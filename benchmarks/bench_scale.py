@@ -0,0 +1,222 @@
+"""
+Benchmark: time every ARS engine stage on synthetic data at 1x/10x/100x scale.
+
+Run from the repo root:
+    python -m benchmarks.bench_scale --scales 1,10,100 --output scale_results.csv
+    python -m benchmarks.bench_scale --scales 1,10 --baseline scale_results.csv
+
+Each scale runs in its own process, so peak RSS is per scale. The results
+file has one row per (scale, stage); with --baseline, stages slower than
+--tolerance times the baseline are listed and the exit status is 1.
+post_metric_to_db is only timed against a database: a staging SQL Server
+named with --db-server, or a local --db-backend sqlite/duckdb file, where
+the metrics table is created if missing. With --db-write-mode diff the
+first write is a full load, and db_insert_diff then writes the metrics
+again with 1% of the rows changed; with swap, db_insert_swap reloads them
+through the channel's share of the shadow table, its db_calls swap_s being
+the time the table's write lock is held.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataset, scale_shape
+
+RESULT_COLUMNS = [
+    'run_id', 'git_rev', 'scale', 'stores', 'skus', 'sales_rows', 'stage',
+    'wall_s', 'cpu_s', 'peak_rss_mb', 'rows_in', 'rows_out'
+]
+# Stages faster than this are too noisy to flag as regressions
+MIN_COMPARE_SECONDS = 0.05
+
+
+def run_stages(data_dir, records_path, db=None, output_formats=('csv',)):
+    """Child process: run the engine stages on one generated dataset and dump the stage records"""
+    import retail_ars_fromdb as ars
+    from ars_allocation import load_warehouse_stock
+    from ars_instrument import RunReport, rows
+    from ars_keys import KeyEncoder
+    from ars_output import ArtifactWriter
+
+    def path(name):
+        return os.path.join(data_dir, name)
+
+    report = RunReport('bench_scale', report_dir=data_dir)
+    with report.stage('load_inputs') as stage:
+        sales = pd.read_csv(path('preprocessed_sales.csv'), parse_dates=['date'])
+        stock = pd.read_csv(path('preprocessed_stock.csv'))
+        plano = pd.read_csv(path('merged_plano.csv'), dtype={'store_id': str, 'sku_id': str, 'format': str})
+        store_master = pd.read_csv(path('store_master.csv'), dtype={'store_id': str})
+        sku_master = pd.read_csv(path('sku_master.csv'), dtype={'sku_id': str})
+        warehouse_stock = load_warehouse_stock(path('merged_reports.csv'))
+        stage['rows_out'] = rows(sales)
+    with report.stage('preprocess', rows_in=rows(sales)) as stage:
+        sales_df, stock_df = ars.preprocess_data(sales, stock)
+        stage['rows_out'] = rows(sales_df)
+    with report.stage('encode_keys', rows_in=rows(sales_df)):
+        encoder = KeyEncoder.fit(sales_df, stock_df, plano, store_master, sku_master)
+        sales_df, stock_df, plano = encoder.encode(sales_df), encoder.encode(stock_df), encoder.encode(plano)
+        store_master, sku_master = encoder.encode(store_master), encoder.encode(sku_master)
+
+    writer = ArtifactWriter(formats=output_formats, output_dir=data_dir)
+    try:
+        insights = ars.analyze_store_sku_performance(
+            sales_df, stock_df, plano, store_master=store_master, sku_master=sku_master,
+            writer=writer, report=report, post_to_db=False
+        )
+        metrics = insights['store_sku_metrics']
+        with report.stage('recommendations', rows_in=rows(metrics)) as stage:
+            recommendations = ars.generate_sku_recommendations(insights, writer=writer)
+            stage['rows_out'] = rows(recommendations)
+        with report.stage('transfer_plan', rows_in=rows(recommendations)) as stage:
+            transfers = ars.generate_transfer_plan(recommendations, store_master, writer=writer)
+            stage['rows_out'] = rows(transfers)
+        with report.stage('warehouse_allocation', rows_in=rows(recommendations)) as stage:
+            allocation = ars.generate_warehouse_allocation(
+                recommendations, insights, warehouse_stock, transfers, sku_master, writer=writer
+            )
+            stage['rows_out'] = rows(allocation)
+        if db:
+            # A staging database only; the channel name keeps the rows apart
+            db = dict(db)
+            write_mode = db.pop('write_mode', 'replace')
+            ars.DB_CONFIG.update(db)
+            if ars.DB_CONFIG['backend'] != 'mssql':
+                create_metrics_table(ars.get_pool(ars.DB_CONFIG), metrics)
+            with report.stage('db_insert', rows_in=rows(metrics)) as stage:
+                ars.post_metric_to_db(metrics, 'Synthetic', mode=write_mode)
+                stage['db_calls'] = ars.db_calls()
+            if write_mode in ('diff', 'swap'):
+                # A day-to-day rerun: a few store-SKUs sold something since the last write
+                changed = metrics.copy()
+                step = max(len(changed) // 100, 1)
+                changed.iloc[::step, changed.columns.get_loc('total_sales')] += 1
+                with report.stage(f'db_insert_{write_mode}', rows_in=rows(changed)) as stage:
+                    ars.post_metric_to_db(changed, 'Synthetic', mode=write_mode)
+                    stage['db_calls'] = ars.db_calls()
+    finally:
+        with report.stage('write_outputs'):
+            writer.wait()
+
+    with open(records_path, 'w') as f:
+        json.dump(report.records, f, default=str)
+
+
+def create_metrics_table(pool, metrics):
+    """retail_ars_1 in a local database, one column per metrics column, indexed like the SQL Server table"""
+    keys = ('store_id', 'sku_id', 'channel')
+    columns = ', '.join(
+        f"[{name}] {'DOUBLE' if pd.api.types.is_numeric_dtype(dtype) and name not in keys else 'VARCHAR'}"
+        for name, dtype in metrics.dtypes.items()
+    )
+    with pool.session('create_metrics_table', transaction=True) as session:
+        session.execute(f"CREATE TABLE IF NOT EXISTS retail_ars_1 ({columns}, row_hash BIGINT)")
+        session.execute("CREATE INDEX IF NOT EXISTS ix_retail_ars_1_channel_keys ON retail_ars_1 (channel, store_id, sku_id)")
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return ''
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose wall time grew past tolerance x the baseline at the same scale"""
+    merged = results.merge(baseline[['scale', 'stage', 'wall_s']], on=['scale', 'stage'], suffixes=('', '_baseline'))
+    merged = merged[merged['wall_s_baseline'] >= MIN_COMPARE_SECONDS]
+    merged['ratio'] = (merged['wall_s'] / merged['wall_s_baseline']).round(2)
+    return merged[['scale', 'stage', 'wall_s_baseline', 'wall_s', 'ratio']], merged['ratio'] > tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='1,10,100', help='comma separated scale factors, 1x = 60 stores x 800 SKUs')
+    parser.add_argument('--data-dir', help='where datasets are generated, a temporary directory if not given')
+    parser.add_argument('--reuse-data', action='store_true', help='keep datasets already in --data-dir')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='scale_results.csv')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--db-server', help='staging SQL Server for timing post_metric_to_db')
+    parser.add_argument('--db-database')
+    parser.add_argument('--db-backend', choices=('sqlite', 'duckdb'),
+                        help='time post_metric_to_db against a local database file instead (see --db-file)')
+    parser.add_argument('--db-file', help='local database file, db_insert.<backend> in each data directory if not given')
+    parser.add_argument('--db-write-mode', choices=('replace', 'diff', 'swap'), default='replace')
+    parser.add_argument('--child', nargs=2, metavar=('DATA_DIR', 'RECORDS'), help=argparse.SUPPRESS)
+    parser.add_argument('--child-db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_stages(*args.child, db=json.loads(args.child_db) if args.child_db else None)
+        return
+
+    db = None
+    if args.db_server:
+        db = {'server': args.db_server}
+        if args.db_database:
+            db['database'] = args.db_database
+    elif args.db_backend:
+        db = {'backend': args.db_backend, 'database': args.db_file}
+    if db:
+        db['write_mode'] = args.db_write_mode
+
+    run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+    git_rev = _git_rev()
+    scratch = None if args.data_dir else tempfile.TemporaryDirectory()
+    data_root = args.data_dir or scratch.name
+    results = []
+    try:
+        for scale in [float(s) for s in args.scales.split(',') if s.strip()]:
+            n_stores, n_skus = scale_shape(scale)
+            data_dir = os.path.join(data_root, f'scale_{scale:g}x')
+            if not (args.reuse_data and os.path.exists(os.path.join(data_dir, 'preprocessed_sales.csv'))):
+                generate_dataset(data_dir, n_stores, n_skus, seed=args.seed)
+            sales_rows = sum(1 for _ in open(os.path.join(data_dir, 'preprocessed_sales.csv'))) - 1
+            records_path = os.path.join(data_dir, 'stage_records.json')
+            command = [sys.executable, '-m', 'benchmarks.bench_scale', '--child', data_dir, records_path]
+            if db:
+                child_db = dict(db)
+                if child_db.get('backend') and not child_db['database']:
+                    child_db['database'] = os.path.join(data_dir, f"db_insert.{db['backend']}")
+                command += ['--child-db', json.dumps(child_db)]
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            with open(records_path) as f:
+                records = json.load(f)
+            for record in records:
+                results.append({
+                    'run_id': run_id, 'git_rev': git_rev, 'scale': scale, 'stores': n_stores, 'skus': n_skus,
+                    'sales_rows': sales_rows, **{k: record.get(k) for k in RESULT_COLUMNS[7:]},
+                    'stage': record['stage']
+                })
+            total = sum(record['wall_s'] for record in records)
+            peak = max((record['peak_rss_mb'] or 0) for record in records)
+            print(f"{scale:g}x  {n_stores} stores x {n_skus} SKUs, {sales_rows:,} sales rows: "
+                  f"{total:.1f}s, peak RSS {peak:.0f}MB")
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+    results = pd.DataFrame(results, columns=RESULT_COLUMNS)
+    results.to_csv(args.output, index=False)
+    print(results.pivot_table(index='stage', columns='scale', values='wall_s', sort=False).to_string())
+    print(f"Results -> {args.output}")
+
+    if args.baseline:
+        table, regressed = compare(results, pd.read_csv(args.baseline), args.tolerance)
+        print(table.to_string(index=False))
+        if regressed.any():
+            print(f"{int(regressed.sum())} stage(s) slower than {args.tolerance}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: batched what-if scenarios vs re-running the policy columns once per scenario.
+
+Run from the repo root:
+    python -m benchmarks.bench_scenarios --rows 1000000 --lead-times 5 --z-scales 5 --cover-weeks 5
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ars_recommendations import HIGH_VALUE_SEGMENTS, LOW_VALUE_SEGMENTS
+from ars_rules import ARS_RULES, compile_service_levels
+from ars_scenarios import evaluate_scenarios, scenario_grid
+
+SEGMENTS = np.array(HIGH_VALUE_SEGMENTS + LOW_VALUE_SEGMENTS, dtype=object)
+
+
+def make_metrics(n_rows, seed=21):
+    """The metric columns the policy rules read"""
+    rng = np.random.default_rng(seed)
+    avg_sales = rng.gamma(1.2, 1.5, n_rows).round(3)
+    stock = rng.integers(0, 25, n_rows).astype(float)
+    velocity = (avg_sales * rng.uniform(0.5, 1.5, n_rows)).round(2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = np.where(avg_sales > 0, stock / avg_sales, 0).round(2)
+        stockout = np.where(velocity > 0, stock / velocity, np.inf).round(1)
+    return pd.DataFrame({
+        'sku_segment': SEGMENTS[rng.integers(0, 4, n_rows)],
+        'sales_std': rng.gamma(1.0, 1.2, n_rows).round(3),
+        'avg_weekly_sales': avg_sales,
+        'avg_weekly_revenue': (avg_sales * 450).round(3),
+        'current_stock': stock,
+        'weeks_coverage': coverage,
+        'weeks_until_stockout': stockout,
+        'mdq': rng.integers(1, 6, n_rows)
+    })
+
+
+def per_scenario_loop(metrics, scenarios, z_tables):
+    """One pandas pass per scenario, the way a full re-run per setting recomputes them"""
+    rows = []
+    for scenario in scenarios.itertuples(index=False):
+        lead_time = scenario.lead_time_weeks
+        z = compile_service_levels(z_tables[scenario.z_table])(metrics['sku_segment'])
+        safety_stock = (z * metrics['sales_std'] * np.sqrt(lead_time)).round(2)
+        refill_level = (metrics['avg_weekly_sales'] * scenario.cover_weeks + safety_stock).round()
+        refill_level = pd.concat([refill_level, metrics['mdq']], axis=1).max(axis=1)
+        alert = (metrics['weeks_until_stockout'] < lead_time) & metrics['sku_segment'].isin(SEGMENTS)
+        order_units = (refill_level - metrics['current_stock']).clip(lower=0).where(alert, 0)
+        revenue_at_risk = np.where(
+            metrics['weeks_coverage'] < lead_time,
+            metrics['avg_weekly_revenue'] * (lead_time - metrics['weeks_coverage']),
+            0
+        ).astype(int)
+        rows.append([order_units.sum(), revenue_at_risk.sum()])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--lead-times', type=int, default=5)
+    parser.add_argument('--z-scales', type=int, default=5)
+    parser.add_argument('--cover-weeks', type=int, default=5)
+    parser.add_argument('--loop-scenarios', type=int, default=5,
+                        help='scenarios to time with the per-scenario loop (time is extrapolated)')
+    args = parser.parse_args()
+
+    metrics = make_metrics(args.rows)
+    z_tables = {
+        f"z x{scale:.2f}": {segment: z * scale for segment, z in ARS_RULES['service_level_z'].items()}
+        for scale in np.linspace(0.8, 1.2, args.z_scales)
+    }
+    scenarios = scenario_grid(
+        list(range(1, args.lead_times + 1)), z_tables, list(range(4, 4 + 2 * args.cover_weeks, 2))
+    )
+    print(f"store-skus={len(metrics):,} scenarios={len(scenarios)}")
+
+    start = time.perf_counter()
+    results = evaluate_scenarios(metrics, scenarios, z_tables)
+    batched_secs = time.perf_counter() - start
+    print(f"batched  time={batched_secs:.2f}s")
+
+    sample = scenarios.iloc[:args.loop_scenarios]
+    start = time.perf_counter()
+    loop_rows = per_scenario_loop(metrics, sample, z_tables)
+    loop_secs = time.perf_counter() - start
+    per_scenario = loop_secs / len(sample)
+    print(f"per-scenario loop {per_scenario:.2f}s each, ~{per_scenario * len(scenarios):.1f}s for the grid")
+
+    expected = np.array(loop_rows)
+    actual = results.iloc[:len(sample)][['total_order_units', 'revenue_at_risk']].to_numpy(dtype=float)
+    assert np.allclose(expected, actual, rtol=1e-9), (expected, actual)
+    print("totals match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: peak memory of the sales summary + metrics build, in memory vs store shards.
+
+Run from the repo root:
+    python -m benchmarks.bench_shards --scale 10 --shards 1,4,16
+
+Each shard count runs in its own process on the same synthetic dataset
+(benchmarks.synthetic_data). Shard 1 is the in-memory path; the sharded
+runs read one shard's stores at a time from the sales file, summarize them
+against the channel-wide week calendar, build metrics per shard and
+concatenate. Every sharded metrics table must equal the in-memory one.
+"""
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataset, scale_shape
+
+CHUNK_ROWS = 200_000
+
+
+def _shard_of(stores, n_shards):
+    """Shard per store id, a stable hash like the server-side CHECKSUM split"""
+    return {store: zlib.crc32(str(store).encode()) % n_shards for store in stores}
+
+
+def read_shard(sales_path, index, n_shards):
+    """Sales lines of one shard's stores, reading the file in chunks"""
+    parts = []
+    for chunk in pd.read_csv(sales_path, parse_dates=['date'], chunksize=CHUNK_ROWS):
+        shard = chunk['store_id'].map(_shard_of(chunk['store_id'].unique(), n_shards))
+        parts.append(chunk[shard.to_numpy() == index])
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_metrics(data_dir, n_shards, output_path):
+    """Child process: sales summary and metrics for one shard count, pickled to output_path"""
+    import retail_ars_fromdb as ars
+    from ars_instrument import peak_rss_mb
+    from ars_keys import KeyEncoder
+    from ars_metrics import build_store_sku_metrics
+    from ars_rules import ARS_RULES
+    from ars_sales import bucket_daily_sales, sales_calendar, summarize_sales
+    from ars_shards import concat_shards, store_buckets
+
+    def path(name):
+        return os.path.join(data_dir, name)
+
+    start = time.perf_counter()
+    stock_df = ars.preprocess_stock(pd.read_csv(path('preprocessed_stock.csv')))
+    plano = pd.read_csv(path('merged_plano.csv'), dtype={'store_id': str, 'sku_id': str, 'format': str})
+    sku_master = pd.read_csv(path('sku_master.csv'), dtype={'sku_id': str})
+
+    if n_shards == 1:
+        sales_df = ars.preprocess_sales(pd.read_csv(path('preprocessed_sales.csv'), parse_dates=['date']))
+        summaries = [summarize_sales(bucket_daily_sales(sales_df))]
+        del sales_df
+    else:
+        # First pass over the dates only, then one shard's lines at a time
+        calendar = sales_calendar(pd.read_csv(path('preprocessed_sales.csv'), usecols=['date'],
+                                              parse_dates=['date'])['date'])
+        summaries = []
+        for index in range(n_shards):
+            sales_df = ars.preprocess_sales(read_shard(path('preprocessed_sales.csv'), index, n_shards))
+            if len(sales_df):
+                summaries.append(summarize_sales(bucket_daily_sales(sales_df), calendar=calendar))
+            del sales_df
+
+    encoder = KeyEncoder.fit(*summaries, stock_df, plano, sku_master)
+    summaries = [encoder.encode(summary) for summary in summaries]
+    stock_df, plano, sku_master = encoder.encode(stock_df), encoder.encode(plano), encoder.encode(sku_master)
+    store_bucket = store_buckets(summaries, ARS_RULES) if len(summaries) > 1 else None
+    metrics = concat_shards([
+        build_store_sku_metrics(summary, stock_df, plano, sku_master, ARS_RULES, store_bucket=store_bucket)
+        for summary in summaries
+    ])
+    elapsed = time.perf_counter() - start
+    with open(output_path, 'wb') as f:
+        pickle.dump({'metrics': metrics, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=10, help='1x = 60 stores x 800 SKUs')
+    parser.add_argument('--shards', default='1,4,16', help='comma separated shard counts, 1 = in memory')
+    parser.add_argument('--lines-per-pair', type=float, default=4.0, help='mean invoice lines per store-SKU')
+    parser.add_argument('--data-dir', help='where the dataset is generated, a temporary directory if not given')
+    parser.add_argument('--reuse-data', action='store_true', help='keep a dataset already in --data-dir')
+    parser.add_argument('--child', nargs=3, metavar=('DATA_DIR', 'SHARDS', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        build_metrics(args.child[0], int(args.child[1]), args.child[2])
+        return
+
+    shard_counts = sorted({int(s) for s in args.shards.split(',') if s.strip()} | {1})
+    scratch = tempfile.TemporaryDirectory()
+    data_dir = args.data_dir or scratch.name
+    try:
+        n_stores, n_skus = scale_shape(args.scale)
+        if not (args.reuse_data and os.path.exists(os.path.join(data_dir, 'preprocessed_sales.csv'))):
+            generate_dataset(data_dir, n_stores, n_skus, lines_per_pair=args.lines_per_pair)
+        print(f"{args.scale:g}x: {n_stores} stores x {n_skus} SKUs")
+
+        expected = None
+        for n_shards in shard_counts:
+            output_path = os.path.join(scratch.name, f'metrics_{n_shards}.pkl')
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_shards', '--child', data_dir, str(n_shards),
+                            output_path], check=True, stdout=subprocess.DEVNULL)
+            with open(output_path, 'rb') as f:
+                result = pickle.load(f)
+            if expected is None:
+                expected = result['metrics']
+            same = result['metrics'].equals(expected)
+            print(f"shards={n_shards:<3} {result['seconds']:7.2f}s  peak RSS {result['peak_rss_mb']:7.0f}MB  "
+                  f"rows={len(result['metrics']):,}  identical={same}")
+            if not same:
+                sys.exit(1)
+    finally:
+        scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: batched inter-store transfer matching vs a per-SKU, per-pool greedy loop.
+
+Run from the repo root:
+    python -m benchmarks.bench_transfers --stores 2000 --skus 5000 --cities 40
+
+The loop drops legs below MIN_TRANSFER_QTY in a single pass; the batched
+plan matches their units again, so it can move more units than the loop.
+The batched plan is also compared with its own largest-first fill
+(solve=False); --locations gives the stores coordinates so the pools are
+solved on distance instead of transfer count.
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ars_transfers import MIN_TRANSFER_QTY, build_transfer_plan
+
+
+def make_recommendations(n_stores, n_skus, n_cities, row_share=0.1, seed=17, locations=False):
+    """Recommendation-shaped rows: CRITICAL alerts with a refill gap, overstock rows with a surplus"""
+    rng = np.random.default_rng(seed)
+    n_rows = int(n_stores * n_skus * row_share)
+    keys = rng.choice(n_stores * n_skus, size=n_rows, replace=False)
+    stores = np.array([f'S{i:04d}' for i in range(n_stores)], dtype=object)
+    skus = np.array([str(30100000 + i) for i in range(n_skus)], dtype=object)
+    overstock = rng.random(n_rows) < 0.5
+    recommendations = pd.DataFrame({
+        'store_id': stores[keys // n_skus],
+        'store_name': 'Store ' + stores[keys // n_skus],
+        'sku_id': skus[keys % n_skus],
+        'brand_line': 'Brand',
+        'sku_name': 'Sku ' + skus[keys % n_skus],
+        'priority': np.where(overstock, 'MEDIUM', 'CRITICAL'),
+        'category': np.where(overstock, 'Inventory Optimization', 'Stock Alert'),
+        'reorder_qty': rng.gamma(1.5, 4.0, n_rows).round(),
+        'potential_revenue_loss': rng.gamma(1.5, 500.0, n_rows).round(2)
+    })
+    store_master = pd.DataFrame({
+        'store_id': stores,
+        'store_name': 'Store ' + stores,
+        'city': [f'City {i % n_cities:02d}' for i in range(n_stores)]
+    })
+    if locations:
+        # Stores scattered up to ~50 km around a centre per city
+        centre = rng.uniform([8, 70], [30, 90], size=(n_cities, 2))
+        spread = rng.normal(0, 0.25, size=(n_stores, 2))
+        coordinates = centre[np.arange(n_stores) % n_cities] + spread
+        store_master['latitude'], store_master['longitude'] = coordinates[:, 0], coordinates[:, 1]
+    return recommendations, store_master
+
+
+def loop_transfers(recommendations, store_master, min_qty=MIN_TRANSFER_QTY):
+    """Greedy largest-first matching, one (city, SKU) pool at a time"""
+    city = recommendations['store_id'].map(store_master.set_index('store_id')['city'])
+    qty = recommendations['reorder_qty'].to_numpy()
+    transfers = []
+    for _, rows in recommendations.groupby([city, recommendations['sku_id']]).indices.items():
+        sources = [[int(np.floor(qty[r])), r] for r in rows
+                   if recommendations['category'].iat[r] == 'Inventory Optimization' and np.floor(qty[r]) >= min_qty]
+        sinks = [[int(np.ceil(qty[r])), r] for r in rows
+                 if recommendations['priority'].iat[r] == 'CRITICAL' and np.ceil(qty[r]) >= min_qty]
+        sources.sort(key=lambda x: -x[0])
+        sinks.sort(key=lambda x: -x[0])
+        i = j = 0
+        while i < len(sources) and j < len(sinks):
+            units = min(sources[i][0], sinks[j][0])
+            if units >= min_qty:
+                transfers.append((sources[i][1], sinks[j][1], units))
+            sources[i][0] -= units
+            sinks[j][0] -= units
+            i += sources[i][0] == 0
+            j += sinks[j][0] == 0
+    return transfers
+
+
+def describe(plan):
+    text = f"transfers={len(plan):,} units={int(plan['transfer_qty'].sum()):,}"
+    if plan['distance_km'].notna().any():
+        text += f" unit_km={(plan['transfer_qty'] * plan['distance_km']).sum():,.0f}"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=2000)
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--cities', type=int, default=40)
+    parser.add_argument('--loop-skus', type=int, default=250, help='SKUs to time with the per-pool loop')
+    parser.add_argument('--locations', action='store_true', help='give stores coordinates, match on distance')
+    args = parser.parse_args()
+
+    recommendations, store_master = make_recommendations(args.stores, args.skus, args.cities, locations=args.locations)
+    print(f"recommendation rows={len(recommendations):,}")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    plan = build_transfer_plan(recommendations, store_master)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"batched  time={secs:.2f}s peak={peak / 1e6:.0f}MB {describe(plan)}")
+    start = time.perf_counter()
+    fill = build_transfer_plan(recommendations, store_master, solve=False)
+    print(f"fill     time={time.perf_counter() - start:.2f}s {describe(fill)}")
+
+    sample_skus = recommendations['sku_id'].drop_duplicates().iloc[:args.loop_skus]
+    sample = recommendations[recommendations['sku_id'].isin(sample_skus)].reset_index(drop=True)
+    start = time.perf_counter()
+    loop = loop_transfers(sample, store_master)
+    loop_secs = time.perf_counter() - start
+    n_skus = recommendations['sku_id'].nunique()
+    print(f"loop     {loop_secs:.2f}s for {len(sample_skus)} SKUs, ~{loop_secs / len(sample_skus) * n_skus:.0f}s for all")
+    batched = build_transfer_plan(sample, store_master)
+    print(f"sample transfers batched={len(batched):,} loop={len(loop):,} "
+          f"units batched={int(batched['transfer_qty'].sum()):,} loop={sum(t[2] for t in loop):,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: peak day via groupby/unstack/idxmax on day names vs the bincount weekday profile.
+
+Run from the repo root:
+    python -m benchmarks.bench_weekday_profile --stores 1000 --skus 5000 --weeks 40
+"""
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from ars_cube import StoreSkuPairs
+from ars_dow import WeekdayProfile
+from benchmarks.bench_demand_cube import make_daily_buckets
+
+KEYS = ['store_id', 'sku_id']
+
+
+def legacy_peak_days(daily):
+    """The day_name groupby summarize_sales used before the weekday profile"""
+    daily = daily.copy()
+    daily['day_of_week'] = daily['date'].dt.day_name()
+    dow = daily.groupby(KEYS + ['day_of_week'], observed=True)[['sales_units', 'n_lines']].sum()
+    dow_patterns = (dow['sales_units'] / dow['n_lines']).unstack()
+    return dow_patterns.idxmax(axis=1).reset_index(name='peak_day')
+
+
+def profile_peak_days(daily):
+    pairs = StoreSkuPairs.from_frame(daily)
+    profile = WeekdayProfile.from_buckets(pairs.codes, len(pairs), daily['date'], daily['sales_units'], daily['n_lines'])
+    return pd.DataFrame({
+        'store_id': pd.Categorical.from_codes(pairs.pair_keys // len(pairs.skus), pairs.stores),
+        'sku_id': pd.Categorical.from_codes(pairs.pair_keys % len(pairs.skus), pairs.skus),
+        'peak_day': profile.peak_day()
+    })
+
+
+def measure(label, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} time={secs:.2f}s peak={peak / 1e6:.1f}MB rows={len(result):,}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=1000)
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--weeks', type=int, default=40)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    daily = make_daily_buckets(args.stores, args.skus, args.weeks, pair_share=0.1, week_share=0.3)
+    print(f"daily buckets={len(daily):,}")
+    profile = measure('bincount', profile_peak_days, daily)
+    if not args.skip_legacy:
+        legacy = measure('groupby', legacy_peak_days, daily)
+        pd.testing.assert_frame_equal(legacy, profile, check_dtype=False, check_categorical=False)
+        print("peak days match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Synthetic ARS input files: sales, stock, planogram, store/SKU masters and warehouse stock.
+
+Run from the repo root:
+    python -m benchmarks.synthetic_data --stores 60 --skus 800 --out-dir synthetic_1x
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CHANNEL = 'Synthetic'
+N_FORMATS = 3
+N_CITIES = 12
+# Mon..Sun demand weights, weekends sell more
+WEEKDAY_WEIGHTS = np.array([1.0, 0.95, 1.0, 1.05, 1.2, 1.5, 1.4])
+PRICE_POINTS = np.array([199, 299, 399, 499, 599, 799, 999, 1299, 1499, 1999, 2499, 2999])
+
+
+def scale_shape(scale, base_stores=60, base_skus=800):
+    """Stores and SKUs for a scale factor; store-SKU pairs grow linearly with the scale"""
+    return max(1, round(base_stores * np.sqrt(scale))), max(1, round(base_skus * np.sqrt(scale)))
+
+
+def generate_dataset(out_dir, n_stores, n_skus, days=270, lines_per_pair=4.0, seed=0, channel=CHANNEL):
+    """
+    Write one channel's worth of ARS inputs to out_dir and return the row counts.
+
+    Demand is intermittent: SKU popularity is long-tailed, stores differ in
+    size and each listed store-SKU gets Poisson-gamma invoice lines over the
+    window, about lines_per_pair on average. Most lines are single units, a
+    few are bulk buys. Files use the schemas the engine reads:
+    preprocessed_sales.csv, preprocessed_stock.csv, panogram_layout.csv,
+    store_shelf_ref.csv, merged_plano.csv, store_master.csv, sku_master.csv
+    and merged_reports.csv (Vinculum warehouse stock).
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    stores = np.array([f'Z{i:05d}' for i in range(n_stores)], dtype=object)
+    skus = np.array([str(40100000 + i) for i in range(n_skus)], dtype=object)
+    mrp = rng.choice(PRICE_POINTS, n_skus)
+
+    # 1. Planogram: each format lists a share of the range, each store has one format
+    store_format = rng.integers(0, N_FORMATS, n_stores)
+    listed = rng.random((N_FORMATS, n_skus)) < rng.uniform(0.6, 0.9, (N_FORMATS, 1))
+    layout_format, layout_sku = np.nonzero(listed)
+    layout = pd.DataFrame({
+        'format': layout_format,
+        'sku_id': skus[layout_sku],
+        'brand_line': [f'Brand {i % 40:02d}' for i in layout_sku],
+        'sku_name': [f'Synthetic SKU {i}' for i in layout_sku],
+        'mdq': rng.integers(1, 4, len(layout_sku))
+    })
+    store_map = pd.DataFrame({
+        'store_id': stores,
+        'store_name': 'Store ' + stores,
+        'format': store_format,
+        'channel': channel
+    })
+    plano = store_map.merge(layout, on='format', how='inner')
+
+    # 2. Invoice lines per listed store-SKU, plus a few off-planogram sellers
+    store_codes = pd.Index(stores).get_indexer(plano['store_id'])
+    sku_codes = pd.Index(skus).get_indexer(plano['sku_id'])
+    extra = int(len(plano) * 0.05)
+    store_codes = np.concatenate([store_codes, rng.integers(0, n_stores, extra)])
+    sku_codes = np.concatenate([sku_codes, rng.integers(0, n_skus, extra)])
+
+    popularity = rng.lognormal(0, 1.2, n_skus)
+    store_size = rng.lognormal(0, 0.5, n_stores)
+    rate = popularity[sku_codes] * store_size[store_codes]
+    rate *= lines_per_pair / rate.mean()
+    n_lines = rng.poisson(rate * rng.gamma(0.5, 2.0, len(rate)))
+
+    line_store = np.repeat(store_codes, n_lines)
+    line_sku = np.repeat(sku_codes, n_lines)
+    n_total = len(line_store)
+    end = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+    start = end - pd.Timedelta(days=days - 1)
+    calendar = pd.date_range(start, end)
+    day_weights = WEEKDAY_WEIGHTS[calendar.dayofweek] * np.linspace(0.9, 1.1, len(calendar))
+    day = rng.choice(len(calendar), n_total, p=day_weights / day_weights.sum())
+    units = rng.geometric(0.7, n_total)
+    bulk = rng.random(n_total) < 0.02
+    units[bulk] *= rng.integers(2, 10, bulk.sum())
+    discount = rng.choice([1.0, 1.0, 0.9, 0.8], n_total)
+    sales = pd.DataFrame({
+        'date': calendar[day].strftime('%Y-%m-%d'),
+        'sku_id': skus[line_sku],
+        'sales_value': (units * mrp[line_sku] * discount).round(),
+        'sales_units': units,
+        'store_id': stores[line_store]
+    })
+
+    # 3. Store stock: most listed SKUs carry a few units, some are overstocked
+    stock_units = rng.poisson(1.5 + rate[:len(plano)] / days * 30)
+    overstock = rng.random(len(plano)) < 0.05
+    stock_units[overstock] += rng.integers(5, 30, overstock.sum())
+    stock = pd.DataFrame({
+        'current_stock': stock_units,
+        'sku_id': plano['sku_id'].to_numpy(),
+        'store_id': plano['store_id'].to_numpy()
+    })
+    stock = stock[stock['current_stock'] > 0]
+
+    # 4. Masters and warehouse stock
+    store_master = pd.DataFrame({
+        'store_id': stores,
+        'store_name': 'Store ' + stores,
+        'is_new': (rng.random(n_stores) < 0.05).astype(int),
+        'city': [f'City {i:02d}' for i in rng.integers(0, N_CITIES, n_stores)]
+    })
+    sku_master = pd.DataFrame({
+        'sku_id': skus,
+        'brand_line': [f'Brand {i % 40:02d}' for i in range(n_skus)],
+        'sku_name': [f'Synthetic SKU {i}' for i in range(n_skus)],
+        'MRP': mrp,
+        'case_pack': rng.choice([1, 1, 1, 3, 6, 12], n_skus)
+    })
+    sku_demand = np.bincount(line_sku, weights=units, minlength=n_skus)
+    warehouse = pd.DataFrame({
+        'SKU': skus,
+        'Site Location ': 'Bhiwandi WH',
+        'Zone': rng.choice(['IGE-1', 'IGE-2'], n_skus),
+        'Inv Bucket': rng.choice(['Good', 'Good', 'Good', 'In Process', 'Damaged'], n_skus),
+        'Available Qty': (sku_demand / days * 21 * rng.uniform(0, 1.5, n_skus)).round().astype(int)
+    })
+
+    files = {
+        'preprocessed_sales.csv': sales,
+        'preprocessed_stock.csv': stock,
+        'panogram_layout.csv': layout,
+        'store_shelf_ref.csv': store_map,
+        'merged_plano.csv': plano,
+        'store_master.csv': store_master,
+        'sku_master.csv': sku_master,
+        'merged_reports.csv': warehouse,
+    }
+    for name, frame in files.items():
+        frame.to_csv(os.path.join(out_dir, name), index=False)
+    return {name: len(frame) for name, frame in files.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=60)
+    parser.add_argument('--skus', type=int, default=800)
+    parser.add_argument('--scale', type=float, help='scale factor instead of --stores/--skus (1x = 60 x 800)')
+    parser.add_argument('--days', type=int, default=270)
+    parser.add_argument('--lines-per-pair', type=float, default=4.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out-dir', default='synthetic_ars')
+    args = parser.parse_args()
+
+    n_stores, n_skus = scale_shape(args.scale) if args.scale else (args.stores, args.skus)
+    counts = generate_dataset(args.out_dir, n_stores, n_skus, args.days, args.lines_per_pair, args.seed)
+    print(f"{n_stores} stores x {n_skus} SKUs -> {args.out_dir}")
+    for name, count in counts.items():
+        print(f"  {name:<24} {count:>12,} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,35 @@
 import pandas as pd
-import pyodbc
 import numpy as np
 import os
 from datetime import datetime, timedelta
 from scipy import stats
 from sklearn.cluster import KMeans
 import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ars_recommendations import build_sku_recommendations
+from ars_rules import ARS_RULES, load_rules
+from ars_metrics import build_store_sku_metrics
+from ars_sales import (BUCKET_COLUMNS, bucket_daily_sales, is_daily_buckets, sales_calendar, summarize_sales,
+                       summarize_rollup, compare_sales_summaries)
+from ars_state import (SalesRollup, load_sales_state, refresh_start, fold_sales, fold_rollup, commit_sales_state,
+                       window_start)
+from ars_keys import KeyEncoder, as_key_categorical
+from ars_refcache import cached_frame, cached_csv
+from ars_output import ArtifactWriter, OUTPUT_FORMATS
+from ars_simulation import SIMULATION_COLUMNS, simulate_service_levels
+from ars_transfers import build_transfer_plan
+from ars_allocation import WAREHOUSE_STOCK_PATH, build_allocation, load_warehouse_stock, remaining_stock
+from ars_instrument import NullReport, RunReport, rows
+from ars_db import DB_BACKENDS, get_pool
+from ars_upsert import WRITE_LOCK, swap_load, upsert_rows
+from ars_schema import RETAIL_ARS_1, compile_schema
+from ars_shards import check_calendar, concat_shards, shard_filter, store_buckets
 
 
-# Database Configuration
+# Database Configuration; backend 'sqlite' / 'duckdb' with database set to a local file runs offline
 DB_CONFIG = {
+    'backend': 'mssql',
     'driver': 'ODBC Driver 17 for SQL Server',
     'server': '10.20.0.5',
     'database': 'Holistique',
@@ -18,51 +38,172 @@ DB_CONFIG = {
     'port': '1433'
 }
 
+# Processed in this order; with one worker, each channel allocates from the warehouse stock
+# the channels before it left
 #CHANNELS = ['Nykaa FSN', 'Enrich', 'Purplle Retail']
 CHANNELS = ['Nykaa FSN']
+STORE_MASTER_PATH = 'E:/Nykaa_Analysis/store_master.csv'
+SKU_MASTER_PATH = 'E:/Nykaa_Analysis/sku_master.csv'
 #OUTPUT_DIR = 'channel_analytics'
 
-def fetch_channel_sales_data(channel):
-    """Fetch sales data for a specific channel"""
+# [Base].[Date] is a dd-mm-yyyy string; style 105 converts it server-side so the
+# sales window is filtered before rows cross the network. TRY_CONVERT on the
+# column still scans every row of the platform. For an index seek, add a
+# persisted computed column once and point SALES_DATE_SQL at it:
+#   ALTER TABLE Base ADD sale_date AS TRY_CONVERT(date, [Date], 105) PERSISTED;
+#   CREATE INDEX ix_base_platform_sale_date ON Base (Platform, sale_date);
+SALES_DATE_SQL = 'TRY_CONVERT(date, [Date], 105)'
+# SQL Server takes at most 2100 parameters per query; longer key lists are filtered in pandas
+MAX_IN_PARAMS = 2000
+# Sales fetch granularity: raw invoice lines, or per store-SKU-day sums grouped on the server.
+# There is no weekly grain: the peak day and the 90/30-day velocity need day-level sums, so an
+# exact weekly row would carry 7 weekday unit and line sums plus the recent sums, and store-SKU
+# sales are sparse enough that weeks hold few days each (about 0.8 weekly rows per daily row on
+# the local test channel), so it would send more than the daily grain does.
+SALES_GRAINS = ('lines', 'daily')
+# How post_metric_to_db writes a channel: delete and re-insert every row, or only the rows
+# that changed (ars_upsert). diff keeps a hash per row in retail_ars_1.row_hash, see
+# ars_schema.RETAIL_ARS_1 for the migration adding it.
+# swap loads the channel's rows into retail_ars_1_shadow and switches its partition in, so
+# readers never see the channel empty; it needs the three tables partitioned on channel, see
+# ars_schema.RETAIL_ARS_1. Every mode holds the same application lock (ars_upsert.WRITE_LOCK)
+# while it changes retail_ars_1, so channel workers' writes never interleave.
+DB_WRITE_MODES = ('replace', 'diff', 'swap')
+# retail_ars_1 columns and their coercion, compiled once for every write
+METRICS_SCHEMA = compile_schema(RETAIL_ARS_1)
+
+def _sales_window(date_str):
+    """dd-mm-yyyy [Date] strings parsed, and which of them fall in the 9-month window"""
+    dates = pd.to_datetime(date_str, format='%d-%m-%Y', errors='coerce', dayfirst=True)
+    return dates, dates.notna() & (dates >= window_start())
+
+def _window_filter(since=None):
+    """WHERE fragment and parameter keeping sales from the window start (or since, if later)"""
+    start = window_start().date()
+    if since is not None:
+        start = max(start, since.date())
+    return f" AND {SALES_DATE_SQL} >= ?", [start]
+
+def _key_filter(column, values):
+    """WHERE fragment and parameters restricting column to values; None when the list is too long for SQL"""
+    if values is None or len(values) > MAX_IN_PARAMS:
+        return None
+    if not len(values):
+        return " AND 1 = 0", []
+    return f" AND {column} IN ({', '.join('?' * len(values))})", [str(value) for value in values]
+
+def _subset_query(query, params, stores=None, skus=None):
+    """query/params with the store and SKU subsets pushed down, plus the keys left for pandas to filter"""
+    post_filter = {}
+    for key, column, values in (('store_id', '[Store code]', stores), ('sku_id', '[Mat code]', skus)):
+        if values is None:
+            continue
+        key_filter = _key_filter(column, values)
+        if key_filter is None:
+            post_filter[key] = {str(value) for value in values}
+        else:
+            query += key_filter[0]
+            params = params + key_filter[1]
+    return query, params, post_filter
+
+def _apply_post_filter(frame, post_filter):
+    for key, values in post_filter.items():
+        frame = frame[frame[key].astype(str).isin(values)]
+    return frame
+
+def db_calls():
+    """Timing records (connect_s, wall_s, rows, ...) of the database calls since the last db_calls()"""
+    return get_pool(DB_CONFIG).take_calls()
+
+def fetch_channel_sales_data(channel, since=None, shard=None, stores=None, skus=None, grain='lines'):
+    """Fetch sales data for a specific channel within the 9-month window, optionally only from date `since`
+    shard: (index, count) to fetch only the stores hashed into that shard
+    stores, skus: store / SKU codes to restrict the fetch to, all if not given
+    grain: 'lines' for invoice lines, or 'daily' for SQL Server to return one row
+    per store-SKU-day (summed Qty / MRP Sales and the line count), the daily
+    buckets of ars_sales.bucket_daily_sales. Lines with a NULL Qty or MRP Sales
+    are left out of the sums, as preprocessing drops them from invoice lines.
+    """
+    if grain not in SALES_GRAINS:
+        raise ValueError(f"Unknown sales grain {grain!r}, expected one of {SALES_GRAINS}")
     try:
-        connection = pyodbc.connect(**DB_CONFIG)
-        query = f"""
-            SELECT 
-                [Date] AS date_str,
-                [Store code] AS store_id,
-                [Mat code] AS sku_id,
-                [MRP Sales] AS sales_value,
-                [Qty] AS sales_units
-            FROM Base
-            WHERE Platform = ?
-        """
-        sales_df = pd.read_sql(query, connection, params=[channel])
-        connection.close()
-        print(f"Fetched {len(sales_df)} sales records for {channel}")
-                # Convert dates in Python with error handling
-        
-        sales_df['date'] = pd.to_datetime(
-            sales_df['date_str'],
-            format='%d-%m-%Y',
-            errors='coerce',
-            dayfirst=True
-        )
-        
-        # Filter valid dates and apply 9-month window
-        nine_months_ago = datetime.now() - timedelta(days=270)
-        sales_df = sales_df[
-            (sales_df['date'].notna()) &
-            (sales_df['date'] >= nine_months_ago)
-        ].copy()
+        if grain == 'daily':
+            query = f"""
+                SELECT
+                    [Date] AS date_str,
+                    [Store code] AS store_id,
+                    [Mat code] AS sku_id,
+                    SUM([MRP Sales]) AS sales_value,
+                    SUM([Qty]) AS sales_units,
+                    COUNT(*) AS n_lines
+                FROM Base
+                WHERE Platform = ? AND [Qty] IS NOT NULL AND [MRP Sales] IS NOT NULL
+            """
+        else:
+            query = f"""
+                SELECT 
+                    [Date] AS date_str,
+                    [Store code] AS store_id,
+                    [Mat code] AS sku_id,
+                    [MRP Sales] AS sales_value,
+                    [Qty] AS sales_units
+                FROM Base
+                WHERE Platform = ?
+            """
+        params = [channel]
+        # Window and subsets are applied in SQL; the dates are still parsed strictly below
+        clause, window_params = _window_filter(since)
+        query += clause
+        params += window_params
+        query, params, post_filter = _subset_query(query, params, stores, skus)
+        if shard is not None:
+            clause, shard_params = shard_filter(shard)
+            query += clause
+            params += shard_params
+        if grain == 'daily':
+            query += " GROUP BY [Date], [Store code], [Mat code]"
+        sales_df = get_pool(DB_CONFIG).read_frame(query, params, label=f'fetch_sales {channel}')
+        print(f"Fetched {len(sales_df)} sales {'records' if grain == 'lines' else 'daily buckets'} for {channel}"
+              + (f" shard {shard[0] + 1}/{shard[1]}" if shard else ""))
+        # Convert dates in Python with error handling, then apply the 9-month window
+        sales_df['date'], in_window = _sales_window(sales_df['date_str'])
+        sales_df = _apply_post_filter(sales_df[in_window].drop(columns='date_str'), post_filter)
+        if grain == 'daily':
+            # Date strings spelled differently ('1-2-2025', '01-02-2025') group apart on the server
+            if sales_df.duplicated(['store_id', 'sku_id', 'date']).any():
+                sales_df = sales_df.groupby(['store_id', 'sku_id', 'date'], sort=False, as_index=False).sum()
+            sales_df = sales_df[BUCKET_COLUMNS]
         return sales_df
     except Exception as e:
         print(f"Error fetching sales data for {channel}: {str(e)}")
         raise
 
-def fetch_channel_inventory_data(channel):
-    """Fetch inventory data for a specific channel"""
+def fetch_channel_sales_calendar(channel, stores=None, skus=None):
+    """
+    Week calendar (Mondays) and last sales date of a channel's 9-month window,
+    from the distinct sales dates only; the cheap first pass of a sharded run
+    """
+    try:
+        query = """
+            SELECT DISTINCT [Date] AS date_str
+            FROM Base
+            WHERE Platform = ? AND [Qty] IS NOT NULL AND [MRP Sales] IS NOT NULL
+        """
+        clause, params = _window_filter()
+        query, params, _ = _subset_query(query + clause, [channel] + params, stores, skus)
+        dates = get_pool(DB_CONFIG).read_frame(query, params, label=f'fetch_sales_calendar {channel}')
+        dates, in_window = _sales_window(dates['date_str'])
+        return sales_calendar(dates[in_window])
+    except Exception as e:
+        print(f"Error fetching sales calendar for {channel}: {str(e)}")
+        raise
+
+def fetch_channel_inventory_data(channel, shard=None, stores=None, skus=None):
+    """Fetch inventory data for a specific channel
+    shard: (index, count) to fetch only the stores hashed into that shard
+    stores, skus: store / SKU codes to restrict the fetch to, all if not given
+    """
     try:
-        connection = pyodbc.connect(**DB_CONFIG)
         query = """
             SELECT 
                 [Store code] AS store_id,
@@ -71,207 +212,122 @@ def fetch_channel_inventory_data(channel):
             FROM [Retail Inventory]
             WHERE Platform = ?
         """
-        inventory_df = pd.read_sql(query, connection, params=[channel])
-        connection.close()
+        query, params, post_filter = _subset_query(query, [channel], stores, skus)
+        if shard is not None:
+            clause, shard_params = shard_filter(shard)
+            query += clause
+            params += shard_params
+        inventory_df = get_pool(DB_CONFIG).read_frame(query, params, label=f'fetch_stock {channel}')
+        inventory_df = _apply_post_filter(inventory_df, post_filter)
         print(f"Fetched {len(inventory_df)} inventory records for {channel}")
         return inventory_df
     except Exception as e:
         print(f"Error fetching inventory data for {channel}: {str(e)}")
         raise
 
-def post_metric_to_db(df: pd.DataFrame, channel: str) -> bool:
-    """Safely inserts data into SQL Server with strict type alignment."""
+def post_metric_to_db(df: pd.DataFrame, channel: str, mode: str = 'replace') -> bool:
+    """Safely inserts data into SQL Server with strict type alignment.
+    mode: 'replace' deletes and re-inserts the channel; 'diff' writes only new
+    and changed rows and deletes vanished keys (full replace on first load);
+    'swap' loads and validates a shadow table, then swaps it in (ars_upsert.swap_load).
+    """
+    if mode not in DB_WRITE_MODES:
+        raise ValueError(f"Unknown write mode {mode!r}, expected one of {DB_WRITE_MODES}")
     try:
         # ======================================================================
-        # STEP 1: Clean and Validate Data
+        # STEP 1: Coerce to the retail_ars_1 schema (ars_schema.RETAIL_ARS_1)
         # ======================================================================
-        # Drop columns not in the database schema
-        #df = df.drop(columns=['peak_day', 'id'], errors='ignore')
-
-        # Define explicit column order (MUST match database schema EXACTLY)
-        column_order = [
-            'store_id', 'sku_id', 'total_sales', 'total_sales_value', 'total_sales_days',
-            'weeks_of_data', 'total_weeks', 'sales_std', 'avg_weekly_sales', 'avg_weekly_revenue',
-            'sale_frequency_in_weeks', 'current_stock', 'weeks_coverage', 'sales_velocity',
-            'avg_sales_90day', 'avg_sales_30day', 'revenue_rank', 'sku_segment',
-            'performance_bucket', 'safety_stock', 'refill_level', 'mdq', 'weeks_until_stockout',
-            'potential_revenue_loss', 'peak_day', 'brand_line', 'sku_name', 'MRP', 'store_name', 'channel'
-        ]
-
-        # Reorder DataFrame columns
-        df = df[column_order]
-        df['weeks_until_stockout'] = pd.to_numeric(df['weeks_until_stockout'], errors='coerce')
-        df['mdq'] = pd.to_numeric(df['mdq'], errors='coerce')
-
-        # Replace inf/-inf with NaN first, then fill with 0.0
-        df['weeks_until_stockout'] = df['weeks_until_stockout'].replace([np.inf, -np.inf], np.nan).fillna(0.0)
-        df['mdq'] = df['mdq'].replace([np.inf, -np.inf], np.nan).fillna(0.0)
-
-        # Convert columns to match the database schema
-        df['store_id'] = df['store_id'].astype(str).str.strip()
-        df['sku_id'] = df['sku_id'].astype(str).str.strip()
-        df['total_sales'] = pd.to_numeric(df['total_sales'], errors='coerce').fillna(0.0).round(2)
-        df['total_sales_value'] = pd.to_numeric(df['total_sales_value'], errors='coerce').fillna(0.0).round(2)
-        df['total_sales_days'] = df['total_sales_days'].astype(float).round(2)
-        df['weeks_of_data'] = df['weeks_of_data'].astype(float).round(2)
-        df['total_weeks'] = df['total_weeks'].astype(float).round(2)
-        df['sales_std'] = pd.to_numeric(df['sales_std'], errors='coerce').fillna(0.0).round(2)
-        df['avg_weekly_sales'] = pd.to_numeric(df['avg_weekly_sales'], errors='coerce').fillna(0.0).round(2)
-        df['avg_weekly_revenue'] = pd.to_numeric(df['avg_weekly_revenue'], errors='coerce').fillna(0.0).round(2)
-        df['sale_frequency_in_weeks'] = pd.to_numeric(df['sale_frequency_in_weeks'], errors='coerce').fillna(0.0).round(2)
-        df['current_stock'] = pd.to_numeric(df['current_stock'], errors='coerce').fillna(0.0).round(2)
-        df['weeks_coverage'] = pd.to_numeric(df['weeks_coverage'], errors='coerce').fillna(0.0).round(2)
-        df['sales_velocity'] = pd.to_numeric(df['sales_velocity'], errors='coerce').fillna(0.0).round(2)
-        df['avg_sales_90day'] = pd.to_numeric(df['avg_sales_90day'], errors='coerce').fillna(0.0).round(2)
-        df['avg_sales_30day'] = pd.to_numeric(df['avg_sales_30day'], errors='coerce').fillna(0.0).round(2)
-        df['revenue_rank'] = pd.to_numeric(df['revenue_rank'], errors='coerce').fillna(0.0).round(2)
-        df['sku_segment'] = df['sku_segment'].astype(str).str.strip()
-        df['performance_bucket'] = df['performance_bucket'].astype(str).str.strip()
-        df['safety_stock'] = pd.to_numeric(df['safety_stock'], errors='coerce').fillna(0.0).round(2)
-        df['refill_level'] = pd.to_numeric(df['refill_level'], errors='coerce').fillna(0.0).round(2)
-        df['mdq'] = df['mdq'].astype(float).round(2)  # Convert to float
-        df['weeks_until_stockout'] = df['weeks_until_stockout'].astype(str).str.strip().str[:55].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-        df['potential_revenue_loss'] = df['potential_revenue_loss'].astype(float).round(2)
-        df['peak_day']=df['peak_day'].astype(str).str.strip().str[:55].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-        df['brand_line'] = df['brand_line'].astype(str).str.strip().str[:55].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-        df['sku_name'] = df['sku_name'].astype(str).str.strip().str[:55].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-        df['MRP'] = df['MRP'].astype(str).str.strip()  # Ensure this matches the database schema
-        df['store_name'] = df['store_name'].astype(str).str.strip().str[:254].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-        df['channel'] = df['channel'].astype(str).str.strip().str[:55].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
-
-        #df = df.drop(columns=['mdq'], errors='ignore')
+        # Column order, types, NaN/inf fills, rounding, truncation and ASCII folding
+        df = METRICS_SCHEMA.coerce(df)
 
         # ======================================================================
-        # STEP 2: Database Connection
+        # STEP 2: Insert on a pooled connection, in one transaction
         # ======================================================================
-        conn_str = (
-            f"DRIVER={DB_CONFIG['driver']};"
-            f"SERVER={DB_CONFIG['server']},{DB_CONFIG['port']};"
-            f"DATABASE={DB_CONFIG['database']};"
-            f"UID={DB_CONFIG['uid']};"
-            f"PWD={DB_CONFIG['pwd']};"
-            "Encrypt=yes;TrustServerCertificate=yes;"
-        )
+        pool = get_pool(DB_CONFIG)
+        insert_query = METRICS_SCHEMA.insert_sql('retail_ars_1')
+        input_sizes = METRICS_SCHEMA.input_sizes
+
+        try:
+            if mode == 'diff':
+                with pool.session(f'post_metric_to_db {channel}', transaction=True) as session:
+                    write_stats = upsert_rows(session, 'retail_ars_1', df, channel, input_sizes=input_sizes)
+                print(f"{write_stats['write_mode'].capitalize()} write for {channel}: "
+                      f"{write_stats['inserted']} inserted, {write_stats['updated']} updated, "
+                      f"{write_stats['deleted']} deleted, {write_stats['unchanged']} unchanged "
+                      f"({write_stats['rows_written']} of {len(df)} rows written)")
+                return True
 
-        with pyodbc.connect(conn_str, autocommit=False) as conn:
-            cursor = conn.cursor()
-            
-            try:
-                # Delete existing data
-                cursor.execute("DELETE FROM retail_ars_1 WHERE channel = ?", (channel,))
-                print('data exists, delete is success!!')
-
-                # Prepare insert query
-                #insert_query = """
-                #INSERT INTO retail_ars_1 (
-                    #store_id, sku_id, total_sales, total_sales_value, total_sales_days,
-                    #weeks_of_data, total_weeks, sales_std, avg_weekly_sales, avg_weekly_revenue,
-                    #sale_frequency_in_weeks, current_stock, weeks_coverage, sales_velocity,
-                    #avg_sales_90day, avg_sales_30day, revenue_rank, sku_segment,
-                    #performance_bucket, safety_stock, refill_level, weeks_until_stockout,
-                    #potential_revenue_loss, brand_line, sku_name, MRP, store_name, channel
-                #) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                #"""
-                df = df[['store_id','sku_id','total_sales','total_sales_value', 'total_sales_days', 'weeks_of_data', 'total_weeks', 'sales_std', 'avg_weekly_sales', 'avg_weekly_revenue',
-                    'sale_frequency_in_weeks', 'current_stock', 'weeks_coverage', 'sales_velocity',
-                    'avg_sales_90day', 'avg_sales_30day', 'revenue_rank', 'sku_segment', 'performance_bucket', 
-                    'safety_stock', 'refill_level', 'mdq', 'weeks_until_stockout', 'potential_revenue_loss', 'peak_day', 'brand_line', 'sku_name', 'MRP','store_name', 'channel']]
-                insert_query = """
-                INSERT INTO retail_ars_1 (
-                    store_id, sku_id, total_sales, total_sales_value, total_sales_days,
-                    weeks_of_data, total_weeks, sales_std, avg_weekly_sales, avg_weekly_revenue,
-                    sale_frequency_in_weeks, current_stock, weeks_coverage, sales_velocity, 
-                    avg_sales_90day, avg_sales_30day, revenue_rank, sku_segment, performance_bucket, 
-                    safety_stock, refill_level, mdq, weeks_until_stockout, potential_revenue_loss, peak_day, brand_line, sku_name, MRP, store_name, Channel
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-
-
-                # Convert DataFrame to list of tuples
-                data = [tuple(row) for row in df.itertuples(index=False, name=None)]
-
-                # Set explicit parameter types based on the database schema
-                cursor.setinputsizes([
-                    (pyodbc.SQL_VARCHAR, 255),   # store_id
-                    (pyodbc.SQL_VARCHAR, 255),   # sku_id
-                    (pyodbc.SQL_FLOAT,),        # total_sales
-                    (pyodbc.SQL_FLOAT,),        # total_sales_value
-                    (pyodbc.SQL_FLOAT,),      # total_sales_days
-                    (pyodbc.SQL_FLOAT,),      # weeks_of_data
-                    (pyodbc.SQL_FLOAT,),      # total_weeks
-                    (pyodbc.SQL_FLOAT,),        # sales_std
-                    (pyodbc.SQL_FLOAT,),        # avg_weekly_sales
-                    (pyodbc.SQL_FLOAT,),        # avg_weekly_revenue
-                    (pyodbc.SQL_FLOAT,),        # sale_frequency_in_weeks
-                    (pyodbc.SQL_FLOAT,),        # current_stock
-                    (pyodbc.SQL_FLOAT,),        # weeks_coverage
-                    (pyodbc.SQL_FLOAT,),        # sales_velocity
-                    (pyodbc.SQL_FLOAT,),        # avg_sales_90day
-                    (pyodbc.SQL_FLOAT,),        # avg_sales_30day
-                    (pyodbc.SQL_FLOAT,),        # revenue_rank
-                    (pyodbc.SQL_VARCHAR, 255),   # sku_segment
-                    (pyodbc.SQL_VARCHAR, 255),   # performance_bucket
-                    (pyodbc.SQL_FLOAT,),        # safety_stock
-                    (pyodbc.SQL_FLOAT,),        # refill_level
-                    (pyodbc.SQL_FLOAT,),        # mdq
-                    (pyodbc.SQL_WVARCHAR, 255),        # weeks_until_stockout
-                    (pyodbc.SQL_FLOAT,),      # potential_revenue_loss
-                    (pyodbc.SQL_WVARCHAR, 255),        # peak_day
-                    (pyodbc.SQL_WVARCHAR, 255),  # brand_line
-                    (pyodbc.SQL_WVARCHAR, 255),  # sku_name
-                    (pyodbc.SQL_VARCHAR, 255),      # MRP
-                    (pyodbc.SQL_WVARCHAR, 255),  # store_name
-                    (pyodbc.SQL_WVARCHAR, 255)    # channel
-                ])
-
-                # Batch insert
-                cursor.fast_executemany = True
-                cursor.executemany(insert_query, data)
-                conn.commit()
-                
-                print(f"Successfully inserted {len(data)} rows for {channel}")
+            if mode == 'swap':
+                with pool.session(f'post_metric_to_db {channel}', transaction=True) as session:
+                    write_stats = swap_load(session, 'retail_ars_1', df, channel, input_sizes=input_sizes)
+                print(f"Swap write for {channel}: {write_stats['inserted']} rows loaded "
+                      f"({write_stats['deleted']} replaced) in {write_stats['load_s']:.2f}s, "
+                      f"swapped in {write_stats['swap_s'] * 1000:.0f}ms")
                 return True
 
-            except pyodbc.Error as e:
-                conn.rollback()
-                print(f"Database Error: {str(e)}")
-                if data:
-                    print("Sample Row Data Types:", [type(x).__name__ for x in data[0]])
-                    print("Sample Row Data:", data[0])  # Print the first row of data for debugging
-                return False
+            with pool.session(f'post_metric_to_db {channel}', transaction=True) as session:
+                # Same write lock as the diff and swap writes, which would otherwise interleave with this one
+                with session.exclusive(WRITE_LOCK.format(table='retail_ars_1')):
+                    # Delete existing data
+                    session.execute("DELETE FROM retail_ars_1 WHERE channel = ?", (channel,))
+                    print('data exists, delete is success!!')
+                    # Batch insert; rolled back with the delete if it fails
+                    data = METRICS_SCHEMA.rows(df)
+                    session.executemany(insert_query, data, input_sizes=input_sizes)
+            print(f"Successfully inserted {len(data)} rows for {channel}")
+            return True
+
+        except pool.Error as e:
+            print(f"Database Error: {str(e)}")
+            if len(df):
+                sample = METRICS_SCHEMA.rows(df.head(1))[0]
+                print("Sample Row Data Types:", [type(x).__name__ for x in sample])
+                print("Sample Row Data:", sample)  # Print the first row of data for debugging
+            return False
 
     except Exception as e:
         print(f"Critical Error: {str(e)}")
         return False
 
 
+def aggregate_stock(stock_data):
+    """Inventory rows summed per store-SKU, sorted on the raw store/SKU codes"""
+    stock_data = stock_data.groupby(['store_id','sku_id']).agg({
+        'current_stock' : ['sum']
+        }).round(2)
+    stock_data.columns=['current_stock']
+    return stock_data.reset_index()
+
+def preprocess_sales(sales_data):
+    """Sales lines with categorical keys, numeric quantities and parsed dates"""
+    # Make a copy to avoid modifying original data
+    sales_df = sales_data.copy()
+    # Convert store_id and sku_id to string-labelled categoricals
+    sales_df['store_id'] = as_key_categorical(sales_df['store_id'])
+    sales_df['sku_id'] = as_key_categorical(sales_df['sku_id'])
+    # Ensure numeric types for quantitative columns
+    sales_df['sales_units'] = pd.to_numeric(sales_df['sales_units'], errors='coerce')
+    sales_df['sales_value'] = pd.to_numeric(sales_df['sales_value'], errors='coerce')
+    # Convert date column with explicit format (DD-MM-YYYY)
+    sales_df['date'] = pd.to_datetime(sales_df['date'], format='%d-%m-%Y', dayfirst=True)
+    # Remove any rows with NaN values after conversion
+    return sales_df.dropna(subset=['sales_units', 'sales_value'])
+
+def preprocess_stock(stock_data):
+    """Stock rows with categorical keys and numeric current_stock"""
+    stock_df = stock_data.copy()
+    stock_df['store_id'] = as_key_categorical(stock_df['store_id'])
+    stock_df['sku_id'] = as_key_categorical(stock_df['sku_id'])
+    stock_df['current_stock'] = pd.to_numeric(stock_df['current_stock'], errors='coerce')
+    return stock_df.dropna(subset=['current_stock'])
+
 def preprocess_data(sales_data, stock_data):
     """
     Ensure consistent data types between sales and stock data
     """
-    # Make copies to avoid modifying original data
-    sales_df = sales_data.copy()
-    stock_df = stock_data.copy()
-    
     try:
-        # Convert store_id and sku_id to string type in both DataFrames
-        sales_df['store_id'] = sales_df['store_id'].astype(str)
-        sales_df['sku_id'] = sales_df['sku_id'].astype(str)
-        stock_df['store_id'] = stock_df['store_id'].astype(str)
-        stock_df['sku_id'] = stock_df['sku_id'].astype(str)
-        
-        # Ensure numeric types for quantitative columns
-        sales_df['sales_units'] = pd.to_numeric(sales_df['sales_units'], errors='coerce')
-        sales_df['sales_value'] = pd.to_numeric(sales_df['sales_value'], errors='coerce')
-        stock_df['current_stock'] = pd.to_numeric(stock_df['current_stock'], errors='coerce')
-        
-        # Convert date column with explicit format (DD-MM-YYYY)
-        sales_df['date'] = pd.to_datetime(sales_df['date'], format='%d-%m-%Y', dayfirst=True)
-        
-        # Remove any rows with NaN values after conversion
-        sales_df = sales_df.dropna(subset=['sales_units', 'sales_value'])
-        stock_df = stock_df.dropna(subset=['current_stock'])
-        
+        sales_df = preprocess_sales(sales_data)
+        stock_df = preprocess_stock(stock_data)
         print("Data preprocessing completed successfully")
         return sales_df, stock_df
         
@@ -279,6 +335,74 @@ def preprocess_data(sales_data, stock_data):
         print(f"Error in data preprocessing: {str(e)}")
         raise
 
+def summarize_channel_shards(channel, n_shards, forecast=False, report=None, stores=None, skus=None, grain='lines'):
+    """
+    Out-of-core sales pass for a large channel: the stores are hashed into
+    n_shards and each shard is fetched, preprocessed, bucketed and summarized
+    on its own, so only one shard's invoice lines are in memory at a time.
+    Weekly statistics use the channel-wide week calendar from a first pass
+    over the distinct sales dates. Returns the per-shard sales summaries
+    and the channel's stock aggregated per store-SKU.
+    stores, skus: store / SKU codes to restrict the run to, all if not given
+    grain: sales fetch grain, see fetch_channel_sales_data
+    """
+    report = report or NullReport()
+    with report.stage('sales_calendar') as stage:
+        calendar = fetch_channel_sales_calendar(channel, stores=stores, skus=skus)
+        stage['rows_out'] = len(calendar[0])
+        stage['db_calls'] = db_calls()
+    for attempt in range(2):
+        summaries, observed = [], []
+        for index in range(n_shards):
+            shard = (index, n_shards)
+            with report.stage('fetch_sales') as stage:
+                stage['shard'] = index
+                sales_data = fetch_channel_sales_data(channel, shard=shard, stores=stores, skus=skus, grain=grain)
+                stage['rows_out'] = rows(sales_data)
+                stage['db_calls'] = db_calls()
+            with report.stage('preprocess', rows_in=rows(sales_data)) as stage:
+                stage['shard'] = index
+                sales_df = preprocess_sales(sales_data)
+                del sales_data
+                stage['rows_out'] = rows(sales_df)
+            with report.stage('bucket_daily_sales', rows_in=rows(sales_df)) as stage:
+                stage['shard'] = index
+                daily_sales = sales_df if is_daily_buckets(sales_df) else bucket_daily_sales(sales_df)
+                del sales_df
+                stage['rows_out'] = rows(daily_sales)
+            if not len(daily_sales):
+                continue
+            shard_calendar = sales_calendar(daily_sales['date'])
+            observed.append(shard_calendar)
+            # Dates outside the calendar mean it changed since the first pass
+            if not np.isin(shard_calendar[0], calendar[0]).all() or shard_calendar[1] > calendar[1]:
+                continue
+            with report.stage('summarize_sales', rows_in=rows(daily_sales)) as stage:
+                stage['shard'] = index
+                summaries.append(summarize_sales(daily_sales, forecast=forecast, calendar=calendar))
+                stage['rows_out'] = rows(summaries[-1])
+            del daily_sales
+        if not observed:
+            raise ValueError(f"No sales in the window for {channel}")
+        problems = check_calendar(calendar, observed)
+        if not problems:
+            break
+        if attempt:
+            raise ValueError(f"Sales calendar for {channel} keeps changing: {'; '.join(problems)}")
+        print(f"Sales calendar for {channel} changed during the sharded run ({'; '.join(problems)}), re-running the shards")
+        calendar = (np.unique(np.concatenate([weeks for weeks, _ in observed])), max(last for _, last in observed))
+
+    with report.stage('fetch_stock') as stage:
+        stock_shards = [
+            aggregate_stock(fetch_channel_inventory_data(channel, shard=(index, n_shards), stores=stores, skus=skus))
+            for index in range(n_shards)
+        ]
+        stock_data = pd.concat(stock_shards, ignore_index=True)
+        stock_data = stock_data.sort_values(['store_id', 'sku_id'], kind='stable', ignore_index=True)
+        stage['rows_out'] = rows(stock_data)
+        stage['db_calls'] = db_calls()
+    return summaries, stock_data
+
 def planogram_mapper(planogram_layout,store_map):
     planogram_layout = pd.read_csv(planogram_layout)
     store_map=pd.read_csv(store_map)
@@ -302,261 +426,125 @@ def planogram_mapper(planogram_layout,store_map):
     merged_data.to_csv('E:/Nykaa_Analysis/merged_plano.csv',index=False)
     return merged_data
 
-def analyze_store_sku_performance(sales_data, stock_data, plano_data):
+def load_planogram(planogram_layout, store_map):
+    """planogram_mapper output from the reference cache, rebuilt only when either CSV changes"""
+    return cached_frame(
+        'planogram', [planogram_layout, store_map],
+        lambda: planogram_mapper(planogram_layout, store_map)
+    )
+
+def load_warehouse(path=WAREHOUSE_STOCK_PATH):
+    """Warehouse stock per SKU from the reference cache, rebuilt only when the Vinculum export changes"""
+    return cached_frame('warehouse_stock', [path], lambda: load_warehouse_stock(path))
+
+def analyze_store_sku_performance(sales_data, stock_data, plano_data, rules=None, store_master=None, sku_master=None, writer=None,
+                                  simulation=None, forecast=False, report=None, post_to_db=True, sales_shards=None,
+                                  db_write_mode='replace'):
     """
     Analyze sales and stock data at store-SKU level
+    rules: segment/bucket/service-level config, defaults to ars_rules.ARS_RULES
+    store_master, sku_master: preloaded master data, read from disk if not given
+    writer: ArtifactWriter shared with the rest of the channel run; without
+    one, output files are written before returning
+    simulation: keyword arguments for ars_simulation.simulate_service_levels
+    (n_paths, workers, ...); adds simulated fill rate and stockout
+    probability after potential_revenue_loss
+    forecast: fit the intermittent-demand forecast per store-SKU and size
+    refill_level / weeks_until_stockout on it
+    report: ars_instrument.RunReport to record the analysis stages in
+    post_to_db: insert the metrics into retail_ars_1 (off for offline runs and benchmarks)
+    sales_shards: per-shard sales summaries of a sharded run (summarize_channel_shards),
+    encoded like the other frames; sales_data is not used then. Metrics are built
+    per shard against channel-wide store buckets and concatenated.
+    db_write_mode: 'replace', 'diff' (change-only upsert) or 'swap' (shadow table), see post_metric_to_db
     """
-    sales_data['week'] = sales_data['date'].dt.isocalendar().week
-    unique_weeks = sales_data['week'].nunique()
-    sales_data['total_weeks'] = unique_weeks
-    all_weeks = pd.DataFrame({
-    'week': sales_data['week'].unique()
-    })
-    # Fill missing weeks with zero sales
-    #sales_data = sales_data.set_index(['store_id', 'sku_id', 'week']).unstack(fill_value=0).stack().reset_index()
-    #print(unique_weeks)
+    rules = rules or ARS_RULES
+    report = report or NullReport()
+    own_writer = writer is None
+    writer = writer or ArtifactWriter()
     try:
         insights = {}
 
-        # 1. Basic Store-SKU Performance Metrics
-        weekly_stats = sales_data.groupby(['store_id', 'sku_id']).agg(
-            total_sales = ('sales_units','sum'),
-            total_sales_value = ('sales_value','sum'),
-            total_sales_days = ('date','nunique'),
-            weeks_of_data =('week','nunique'),
-            total_weeks = ('total_weeks','first'),
-            #non_zero_sales_weeks=('sales_units', lambda x: (x > 0).sum()),
-            sales_std=('sales_units', 'std')           # Standard deviation of weekly sales
-        ).reset_index()
-        
-        #total_weeks = sales_data['week'].nunique()
-        #print(weekly_stats['sales_std'])
-        weekly_stats['avg_weekly_sales']=weekly_stats['total_sales']/weekly_stats['total_weeks']   # Average weekly sales across all weeks
-        weekly_stats['avg_weekly_revenue']=weekly_stats['total_sales_value']/weekly_stats['total_weeks']     # Average weekly revenue across all weeks
-        
-        #print(weekly_std_stats)
-        weekly_stats=weekly_stats.round(3)
-        
-        weekly_stats['sales_std'] = weekly_stats['sales_std'].fillna(0)
-        weekly_stats['sale_frequency_in_weeks']= (weekly_stats['weeks_of_data'] / weekly_stats['total_weeks']).round(2)
-        #weekly_stats.to_csv('E:/Nykaa_Analysis/filled_sales.csv')
-        
-        # Merge with current stock
-        store_sku_metrics = pd.merge(
-            weekly_stats,
-            stock_data,
-            on=['store_id', 'sku_id'],
-            how='left',
-            validate='1:1'
-        )
+        if sales_shards is None:
+            # Sales arrive either as invoice lines or as persisted daily buckets
+            with report.stage('bucket_daily_sales', rows_in=rows(sales_data)) as stage:
+                daily_sales = sales_data if is_daily_buckets(sales_data) else bucket_daily_sales(sales_data)
+                stage['rows_out'] = rows(daily_sales)
 
-        no_sale_inv =  pd.merge(
-            stock_data,
-            weekly_stats,
-            on=['store_id', 'sku_id'],
-            how='left',
-            #validate='1:1'
-        )
-        store_master = pd.read_csv('E:/Nykaa_Analysis/store_master.csv')
-        
-        no_sale_inv=pd.merge(
-            no_sale_inv,
-            store_master,
-            on=['store_id'],
-            how = 'left'
-        )
-        
-        no_sale_inv=no_sale_inv[no_sale_inv['total_sales'].isnull()].drop(columns=['total_sales'])
-        #no_sale_inv = no_sale_inv[ (no_sale_inv['total_sales'] == 0)]
-        no_sale_inv=no_sale_inv.dropna(subset=['store_name'])
-        #print(no_sale_inv)
-        plano_data_sku = plano_data.drop_duplicates(subset=['store_id','sku_id'])
-        no_sale_inv=pd.merge(
-            no_sale_inv,
-            plano_data[['store_id','sku_id','mdq']],
-            on=['store_id','sku_id'],
-            how = 'left'
-        )
-        no_sale_inv=no_sale_inv[['store_id','sku_id','current_stock','store_name','is_new','mdq']]
-        #print(no_sale_inv)
-        store_sku_metrics['current_stock'] = store_sku_metrics['current_stock'].replace([np.inf, -np.inf, 0,''], np.nan)
-        store_sku_metrics['current_stock'] = store_sku_metrics['current_stock'].fillna(0)
-        # 2. Calculate Stock Coverage
-        store_sku_metrics['weeks_coverage'] = (
-            store_sku_metrics['current_stock'] / 
-            store_sku_metrics['avg_weekly_sales']
-        ).replace([np.inf, -np.inf,''], np.nan).round(2)
-        store_sku_metrics['weeks_coverage'] = store_sku_metrics['weeks_coverage'].fillna(0)
-        # 3. Sales Velocity Calculation
-        #recent_sales = sales_data.sort_values('date').groupby(['store_id', 'sku_id']).tail(30)
-        last_date = sales_data['date'].max()
-        #print(last_date - timedelta(days=90))
-        # Filter for sales data in the last 30 days
-        recent_sales = sales_data[sales_data['date'] > last_date - timedelta(days=90)]
-        recent_sales_30 = sales_data[sales_data['date'] > last_date - timedelta(days=30)]
-        print(recent_sales)
-        sales_velocity = recent_sales.groupby(['store_id', 'sku_id']).agg(
-            total_last_90_days_sales=('sales_units', 'sum'),
-            total_last_90_days_sales_value=('sales_value','sum')
-            ).reset_index()
-        recent_sales_30 = recent_sales_30.groupby(['store_id', 'sku_id']).agg(
-            #total_last_90_days_sales=('sales_units', 'sum'),
-            total_last_30_days_sales_value=('sales_value','sum')
-            ).reset_index()
-        # Add sales velocity column weekly
-        sales_velocity['sales_velocity'] = (sales_velocity['total_last_90_days_sales'] / 12.85).round(2)
-        sales_velocity['recent_avg_sales'] = (sales_velocity['total_last_90_days_sales_value'] / 12.85).round(2)
-        sales_velocity['sales_velocity'] = sales_velocity['sales_velocity'].replace([np.inf, -np.inf, 0,''], np.nan)
-        sales_velocity['sales_velocity'] = sales_velocity['sales_velocity'].fillna(0)
-        sales_velocity['avg_sales_90day'] = sales_velocity['recent_avg_sales'].replace([np.inf, -np.inf, 0,''], np.nan)
-        sales_velocity['avg_sales_90day'] = sales_velocity['avg_sales_90day'].fillna(0)
-        recent_sales_30['avg_sales_30day']=(recent_sales_30['total_last_30_days_sales_value']/4.2).round(2)
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            sales_velocity[['store_id', 'sku_id', 'sales_velocity','avg_sales_90day']],
-            on=['store_id', 'sku_id'],
-            how='left'
-        )
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            recent_sales_30[['store_id', 'sku_id', 'avg_sales_30day']],
-            on=['store_id', 'sku_id'],
-            how='left'
-        )
-        store_sku_metrics['sales_velocity'] = store_sku_metrics['sales_velocity'].replace([np.inf, -np.inf, 0,'',' '], np.nan)
-        store_sku_metrics['sales_velocity'] = store_sku_metrics['sales_velocity'].fillna(0)
-        store_sku_metrics['avg_sales_90day'] = store_sku_metrics['avg_sales_90day'].replace([np.inf, -np.inf, 0,'',' '], np.nan)
-        store_sku_metrics['avg_sales_90day'] = store_sku_metrics['avg_sales_90day'].fillna(0)
-        store_sku_metrics['avg_sales_30day'] = store_sku_metrics['avg_sales_30day'].replace([np.inf, -np.inf, 0,'',' '], np.nan)
-        store_sku_metrics['avg_sales_30day'] = store_sku_metrics['avg_sales_30day'].fillna(0)
-        # 4. SKU Segmentation
-        store_sku_metrics['revenue_rank'] = store_sku_metrics.groupby('store_id')['avg_weekly_revenue'].rank(ascending=False).round()
-        def assign_sku_segment(row):
-            if row['revenue_rank'] < 10:
-                return 'A - High Value'
-            elif row['sale_frequency_in_weeks'] > 0.99:
-                return 'B - Regular'
-            elif row['sale_frequency_in_weeks'] > 0.7:
-                return 'C - Moderate'
-            else:
-                return 'D - Slow Moving'
-        
-        store_sku_metrics['sku_segment'] = store_sku_metrics.apply(assign_sku_segment, axis=1)
-        
-        # Calculate total revenue per store
-        store_revenue = store_sku_metrics.groupby('store_id')['avg_weekly_revenue'].sum().reset_index()
-        store_revenue.columns = ['store_id', 'total_revenue']
-
-        # Calculate quantiles for bucket thresholds
-        top_20_threshold = store_revenue['total_revenue'].quantile(0.8)
-        average_threshold = store_revenue['total_revenue'].quantile(0.5)
-
-        # Assign performance buckets
-        def assign_bucket(revenue):
-            if revenue >= top_20_threshold:
-                return 'Star_Store'
-            elif revenue >= average_threshold:
-                return 'Average_Store'
-            else:
-                return 'Laggard_Store'
-
-        store_revenue['performance_bucket'] = store_revenue['total_revenue'].apply(assign_bucket)
-
-        # Merge the performance bucket back to store_sku_metrics
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            store_revenue[['store_id', 'performance_bucket']],
-            on='store_id',
-            how='left'
+            # 1. Sales statistics, velocity and peak day per store-SKU
+            with report.stage('summarize_sales', rows_in=rows(daily_sales)) as stage:
+                sales_summary = summarize_sales(daily_sales, forecast=forecast)
+                stage['rows_out'] = rows(sales_summary)
+            sales_shards = [sales_summary]
+
+        if store_master is None:
+            store_master = cached_csv(STORE_MASTER_PATH)
+        if sku_master is None:
+            sku_master = cached_csv(SKU_MASTER_PATH)
+
+        # Inventory without any sales in the window
+        with report.stage('no_sale_inventory', rows_in=rows(stock_data)) as stage:
+            stock_keys = pd.MultiIndex.from_frame(stock_data[['store_id', 'sku_id']])
+            sales_keys = pd.MultiIndex.from_frame(pd.concat([summary[['store_id', 'sku_id']] for summary in sales_shards]))
+            no_sale_inv = stock_data[~stock_keys.isin(sales_keys)]
+            no_sale_inv=pd.merge(
+                no_sale_inv,
+                store_master,
+                on=['store_id'],
+                how = 'left'
+            )
+            no_sale_inv=no_sale_inv.dropna(subset=['store_name'])
+            no_sale_inv=pd.merge(
+                no_sale_inv,
+                plano_data[['store_id','sku_id','mdq']],
+                on=['store_id','sku_id'],
+                how = 'left'
+            )
+            no_sale_inv=no_sale_inv[['store_id','sku_id','current_stock','store_name','is_new','mdq']]
+            no_sale_inv = pd.merge(
+                no_sale_inv,
+                sku_master[['sku_id','brand_line','sku_name','MRP']],
+                on=['sku_id'],
+                how='left'
             )
+            stage['rows_out'] = rows(no_sale_inv)
 
-        #store_sku_metrics.to_csv('E:/test123.csv',index=False)
-        
-        # 5. Safety Stock and Reorder Points
+        # 2-8. Keyed metrics table: stock cover, velocity, segments, safety stock, risk, dimensions
         lead_time_weeks = 3
-        service_level_z = {
-            'A - High Value': 2.326,
-            'B - Regular': 1.96,
-            'C - Moderate': 1.645,
-            'D - Slow Moving': 1.28
-        }
-        
-        store_sku_metrics['safety_stock'] = store_sku_metrics.apply(
-            lambda row: service_level_z[row['sku_segment']] * row['sales_std'] * np.sqrt(lead_time_weeks), 
-            axis=1
-        ).round(2)
+        with report.stage('build_metrics', rows_in=sum(len(summary) for summary in sales_shards)) as stage:
+            # Store performance buckets need every store's revenue, the rest is per store
+            store_bucket = store_buckets(sales_shards, rules) if len(sales_shards) > 1 else None
+            store_sku_metrics = concat_shards([
+                build_store_sku_metrics(
+                    sales_summary, stock_data, plano_data, sku_master, rules, lead_time_weeks=lead_time_weeks,
+                    use_forecast=forecast, store_bucket=store_bucket
+                )
+                for sales_summary in sales_shards
+            ])
+            stage['rows_out'] = rows(store_sku_metrics)
         print(store_sku_metrics['safety_stock'])
-        
-        store_sku_metrics['refill_level'] = (
-            store_sku_metrics['avg_weekly_sales'] * 8 + 
-            store_sku_metrics['safety_stock']
-        ).round()
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            plano_data[['store_id','sku_id','mdq']],
-            on=['store_id','sku_id'],
-            how='left'
-        )
-        # Adjust refill_level to be at least equal to mdq
-        store_sku_metrics['refill_level'] = store_sku_metrics[['refill_level', 'mdq']].max(axis=1)
-        # 6. Lost Sales Risk Analysis
-        store_sku_metrics['weeks_until_stockout'] = np.where(
-            store_sku_metrics['sales_velocity'] > 0,
-            store_sku_metrics['current_stock'] / (store_sku_metrics['sales_velocity'] ),
-            float('inf')
-        ).round(1)
-        
-        store_sku_metrics['potential_revenue_loss'] = np.where(
-            store_sku_metrics['weeks_coverage'] < lead_time_weeks,
-            store_sku_metrics['avg_weekly_revenue'] * (lead_time_weeks - store_sku_metrics['weeks_coverage']),
-            0
-        ).astype(int)
-        
-        # 7. Day of Week Patterns
-        sales_data['day_of_week'] = pd.to_datetime(sales_data['date']).dt.day_name()
-        dow_patterns = sales_data.groupby(['store_id', 'sku_id', 'day_of_week'])['sales_units'].mean().unstack()
-        peak_days = dow_patterns.idxmax(axis=1).reset_index(name='peak_day')
-        
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            peak_days,
-            on=['store_id', 'sku_id'],
-            how='left'
-        )
-        plano_data_sku = plano_data.drop_duplicates(subset=['sku_id'])
-        sku_master=pd.read_csv('E:/Nykaa_Analysis/sku_master.csv')
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            sku_master[['sku_id','brand_line','sku_name','MRP']],
-            on=['sku_id'],
-            how='left'
-        )
-        plano_data_store = plano_data.drop_duplicates(subset=['store_id'])
-        store_sku_metrics = pd.merge(
-            store_sku_metrics,
-            plano_data_store[['store_id','store_name','channel']],
-            on=['store_id'],
-            how='left'
-        )
 
-        no_sale_inv = pd.merge(
-            no_sale_inv,
-            sku_master[['sku_id','brand_line','sku_name','MRP']],
-            on=['sku_id'],
-            how='left'
-        )
-        no_sale_inv.to_csv('E:/Nykaa_Analysis/no_sale_inv.csv',index=False)
+        # Monte Carlo check of safety stock / refill level per store-SKU
+        if simulation:
+            with report.stage('simulation', rows_in=rows(store_sku_metrics)) as stage:
+                simulated = simulate_service_levels(store_sku_metrics, lead_time_weeks=lead_time_weeks, **simulation)
+                position = store_sku_metrics.columns.get_loc('potential_revenue_loss') + 1
+                for offset, column in enumerate(SIMULATION_COLUMNS):
+                    store_sku_metrics.insert(position + offset, column, simulated[column])
+                stage['rows_out'] = rows(simulated)
+
         #print(store_sku_metrics)
-        store_metrics_df = pd.DataFrame(store_sku_metrics)
-        store_metrics_df.to_csv('E:/Nykaa_Analysis/store_metric.csv',index=False)
+        # Files are written in the background while the metrics go to the database
+        writer.table(no_sale_inv, 'no_sale_inv')
+        writer.table(store_sku_metrics, 'store_metric')
+        # Streaming Excel workbook, sheets past the row limit continue on store_analysis_2 ...
+        writer.excel('retail_ars.xlsx', {'store_analysis': store_sku_metrics, 'no_sales': no_sale_inv})
         channel_name = store_sku_metrics['channel'].iloc[0]
         #channel_name = "Nykaa1"
-        post_metric_to_db(store_sku_metrics,channel_name)
-        excel_output = 'E:/Nykaa_Analysis/retail_ars.xlsx'
-        # Write dataframes to Excel file with separate sheets
-        with pd.ExcelWriter(excel_output, engine='openpyxl') as writer:
-            store_metrics_df.to_excel(writer, sheet_name='store_analysis', index=False)
-            no_sale_inv.to_excel(writer, sheet_name='no_sales', index=False)
+        if post_to_db:
+            with report.stage('db_insert', rows_in=rows(store_sku_metrics)) as stage:
+                post_metric_to_db(store_sku_metrics,channel_name, mode=db_write_mode)
+                stage['db_calls'] = db_calls()
         # Store results
         insights['store_sku_metrics'] = store_sku_metrics
         #insights['dow_patterns'] = dow_patterns
@@ -568,7 +556,7 @@ def analyze_store_sku_performance(sales_data, stock_data, plano_data):
             (store_sku_metrics['sales_velocity'] > 0)
         ].sort_values(['sku_segment', 'potential_revenue_loss'], ascending=[True, False])
         #insights=pd.DataFrame(insights)
-        insights['critical_skus'].to_csv('E:/Nykaa_Analysis/insights2.csv',index=False)
+        writer.table(insights['critical_skus'], 'insights2')
         
         #print(insights)
         return insights
@@ -576,144 +564,84 @@ def analyze_store_sku_performance(sales_data, stock_data, plano_data):
     except Exception as e:
         print(f"Error in analysis: {str(e)}")
         raise
+    finally:
+        if own_writer:
+            writer.wait()
 
-def generate_sku_recommendations(insights):
+def generate_sku_recommendations(insights, writer=None):
     """
     Generate detailed recommendations at store-SKU level
+    writer: ArtifactWriter to hand the output file to, written before returning if not given
     """
     lead_time = 3 #weeks
     try:
-        recommendations = []
         store_sku_metrics = insights['store_sku_metrics']
         
-        # 1. Immediate Replenishment Needs
-        critical_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_until_stockout'] < lead_time) & 
-            (store_sku_metrics['sku_segment'].isin(['A - High Value', 'B - Regular']))
-        ]
-        
-        for _, item in critical_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'CRITICAL',
-                'category': 'Stock Alert',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['refill_level']-item['current_stock'],
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"SKU {item['sku_id']} ({item['sku_segment']}) will stockout in {item['weeks_until_stockout']:.1f} weeks. "
-                         f"Order {max(item['refill_level'] - item['current_stock'], 0):.0f} units. "
-                         f"Potential weekly revenue loss: INR {item['potential_revenue_loss']:.2f}"
-            })
-        # 1b. Non-Critical Replenishment Needs
-        critical_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_until_stockout'] < lead_time) & 
-            (store_sku_metrics['sku_segment'].isin(['C - Moderate', 'D - Slow Moving']))
-        ]
-        
-        for _, item in critical_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'Medium',
-                'category': 'Stock Alert',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['refill_level']-item['current_stock'],
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"SKU {item['sku_id']} ({item['sku_segment']}) will stockout in {item['weeks_until_stockout']:.1f} weeks. "
-                         f"Order {max(item['refill_level'] - item['current_stock'], 0):.0f} units. "
-                         f"Potential weekly revenue loss: INR {item['potential_revenue_loss']:.2f}"
-            })
-        
-        # 2. Overstock Situations
-        overstock_threshold = lead_time+1
-        overstock_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_coverage'] > overstock_threshold) & 
-            (store_sku_metrics['sku_segment'].isin(['A - High Value', 'B - Regular']))
-        ]
-        
-        for _, item in overstock_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'MEDIUM',
-                'category': 'Inventory Optimization',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['current_stock'] - (item['refill_level']),
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"Excess inventory of SKU {item['sku_id']}. Consider redistributing "
-                         f"{(item['current_stock'] - (item['refill_level'])):.0f} units. "
-                         f"Current coverage: {item['weeks_coverage']:.1f} weeks"
-            })
-
-        # 2b. Overstock Situations
-        overstock_threshold = lead_time+1
-        overstock_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_coverage'] > overstock_threshold) & 
-            (store_sku_metrics['sku_segment'].isin(['C - Moderate', 'D - Slow Moving']))
-        ]
-        
-        for _, item in overstock_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'Low',
-                'category': 'Inventory Optimization',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['current_stock'] - (item['refill_level']),
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"Excess inventory of SKU {item['sku_id']}. Consider redistributing "
-                         f"{(item['current_stock'] - (item['refill_level'])):.0f} units. "
-                         f"Current coverage: {item['weeks_coverage']:.1f} weeks"
-            })
-
-        pd.DataFrame(recommendations).to_csv('E:/Nykaa_Analysis/sku_recommenations.csv',index=False)
-        return pd.DataFrame(recommendations)
+        # Critical/medium stock alerts and A/B, C/D overstock rows, built column-wise
+        recommendations = build_sku_recommendations(store_sku_metrics, lead_time)
+
+        if writer is None:
+            own_writer = ArtifactWriter()
+            own_writer.table(recommendations, 'sku_recommenations')
+            own_writer.wait()
+        else:
+            writer.table(recommendations, 'sku_recommenations')
+        return recommendations
         
     except Exception as e:
         print(f"Error generating recommendations: {str(e)}")
         raise
 
+def generate_transfer_plan(recommendations, store_master=None, writer=None):
+    """
+    Pair overstock store-SKUs with CRITICAL stock alerts of the same SKU in
+    the same region/city, as a transfer plan next to the recommendations
+    writer: ArtifactWriter to hand the output file to, written before returning if not given
+    """
+    try:
+        transfers = build_transfer_plan(recommendations, store_master)
+        print(f"Transfer plan: {len(transfers)} transfers, {int(transfers['transfer_qty'].sum())} units")
+
+        if writer is None:
+            own_writer = ArtifactWriter()
+            own_writer.table(transfers, 'transfer_plan')
+            own_writer.wait()
+        else:
+            writer.table(transfers, 'transfer_plan')
+        return transfers
+
+    except Exception as e:
+        print(f"Error generating transfer plan: {str(e)}")
+        raise
+
+def generate_warehouse_allocation(recommendations, insights, warehouse_stock, transfers=None, sku_master=None,
+                                  writer=None, rules=None):
+    """
+    Share warehouse stock of each SKU across the stores' stock alert orders
+    by segment, store bucket and revenue at risk, in whole case packs
+    writer: ArtifactWriter to hand the output file to, written before returning if not given
+    rules: the rules the metrics were built with, for the segment/bucket priority order
+    """
+    try:
+        allocation = build_allocation(
+            recommendations, insights['store_sku_metrics'], warehouse_stock,
+            transfers=transfers, sku_master=sku_master, rules=rules or ARS_RULES
+        )
+        print(f"Warehouse allocation: {int(allocation['allocated_qty'].sum())} of "
+              f"{int(allocation['requested_qty'].sum())} requested units allocated")
+
+        if writer is None:
+            own_writer = ArtifactWriter()
+            own_writer.table(allocation, 'warehouse_allocation')
+            own_writer.wait()
+        else:
+            writer.table(allocation, 'warehouse_allocation')
+        return allocation
+
+    except Exception as e:
+        print(f"Error generating warehouse allocation: {str(e)}")
+        raise
+
 def generate_summary_report(insights):
     """
     Generate a comprehensive summary report
@@ -744,28 +672,193 @@ def generate_summary_report(insights):
 
 
 
-def process_channel(channel, planogram_layout, store_map):
-    """Process data for a single channel"""
+def load_reference_data(plano_config, channels, warehouse_path=WAREHOUSE_STOCK_PATH):
+    """
+    Load the planogram of each channel plus the store and SKU masters and
+    the warehouse stock once, so every channel (and every worker process)
+    reuses them read-only.
+    """
+    reference = {'plano_data': {}, 'store_master': None, 'sku_master': None, 'warehouse_stock': None}
+    for channel in channels:
+        try:
+            reference['plano_data'][channel] = load_planogram(
+                plano_config[channel]['planogram'], plano_config[channel]['store_map']
+            )
+        except Exception as e:
+            print(f"Could not load planogram for {channel}: {str(e)}")
+    try:
+        reference['store_master'] = cached_csv(STORE_MASTER_PATH)
+        reference['sku_master'] = cached_csv(SKU_MASTER_PATH)
+    except Exception as e:
+        print(f"Could not load master data: {str(e)}")
+    try:
+        reference['warehouse_stock'] = load_warehouse(warehouse_path)
+    except Exception as e:
+        print(f"Could not load warehouse stock, allocation is skipped: {str(e)}")
+    return reference
+
+def process_channel(channel, planogram_layout, store_map, incremental=False, verify=False, reference=None,
+                    output_formats=('csv',), simulation=None, forecast=False, run_report=None, shards=1,
+                    stores=None, skus=None, sales_grain='lines', db_write_mode='replace', rules=None):
+    """Process data for a single channel
+    incremental: fetch only the newest sales days, fold them into the persisted
+    daily buckets and their weekly / store-SKU rollups (ars_state) and read the
+    sales statistics from the rollups
+    verify: with incremental, also run the full fetch and compare the sales metrics
+    reference: output of load_reference_data, planogram and masters are read from disk if not given.
+    Its warehouse_stock is replaced by the stock left after this channel's allocation, so
+    channels processed in turn with the same reference never promise the same units twice
+    output_formats: table formats written next to the Excel workbook, csv and/or parquet
+    simulation: Monte Carlo service level check options, skipped if not given
+    forecast: use the per-series demand forecast for refill levels and stockout weeks
+    run_report: ars_instrument.RunReport options (profile_stage, trace_memory, ...) to
+    write a per-stage timing/memory report, off if not given
+    shards: hash the stores into this many shards and fetch and summarize the sales
+    one shard at a time (summarize_channel_shards); same output as one in-memory pass
+    stores, skus: store / SKU codes to restrict sales and stock to (filtered in SQL),
+    for a partial run; all if not given
+    sales_grain: 'daily' to have SQL Server pre-aggregate sales into store-SKU-day
+    buckets instead of transferring every invoice line (same metrics)
+    db_write_mode: 'diff' to write only the changed metric rows to retail_ars_1,
+    'swap' to load a shadow table and swap it in
+    rules: segment/bucket/service-level config (ars_rules.load_rules), defaults to ars_rules.ARS_RULES
+    """
     print(f"\n{'='*40}\nProcessing {channel}\n{'='*40}")
+    report = RunReport(channel, **run_report) if run_report is not None else NullReport()
     
     try:
-        
+        if shards > 1 and incremental:
+            raise ValueError("Sharded runs always fetch the full window, incremental mode is not supported")
+        if incremental and (stores is not None or skus is not None):
+            raise ValueError("The incremental sales state covers the whole channel, it cannot be run on a store/SKU subset")
+        since = None
+        if incremental:
+            sales_state, sales_rollup, state_meta = load_sales_state(channel)
+            since = refresh_start(state_meta)
+            print(f"Incremental run for {channel}, fetching sales from {since or 'the full window'}")
+
         # Fetch data
-        sales_data = fetch_channel_sales_data(channel)
-        stock_data = fetch_channel_inventory_data(channel)
-        stock_data = stock_data.groupby(['store_id','sku_id']).agg({
-            'current_stock' : ['sum']
-            }).round(2)        
-        stock_data.columns=['current_stock']
-        stock_data=stock_data.reset_index()
+        sales_shards = None
+        if shards > 1:
+            sales_shards, stock_data = summarize_channel_shards(
+                channel, shards, forecast=forecast, report=report, stores=stores, skus=skus, grain=sales_grain
+            )
+        else:
+            with report.stage('fetch_sales') as stage:
+                sales_data = fetch_channel_sales_data(channel, since=since, stores=stores, skus=skus, grain=sales_grain)
+                stage['rows_out'] = rows(sales_data)
+                stage['db_calls'] = db_calls()
+            with report.stage('fetch_stock') as stage:
+                stock_data = fetch_channel_inventory_data(channel, stores=stores, skus=skus)
+                stage['rows_in'] = rows(stock_data)
+                stock_data = aggregate_stock(stock_data)
+                stage['rows_out'] = rows(stock_data)
+                stage['db_calls'] = db_calls()
         # Load planogram data
-        plano_data = planogram_mapper(planogram_layout, store_map)
+        with report.stage('reference_data'):
+            if reference is None:
+                reference = {'plano_data': {}, 'store_master': None, 'sku_master': None}
+                try:
+                    reference['warehouse_stock'] = load_warehouse()
+                except Exception as e:
+                    print(f"Could not load warehouse stock, allocation is skipped: {str(e)}")
+            plano_data = reference['plano_data'].get(channel)
+            if plano_data is None:
+                plano_data = load_planogram(planogram_layout, store_map)
         
         # Preprocess and analyze
-        sales_df, stock_df = preprocess_data(sales_data, stock_data)
-        insights = analyze_store_sku_performance(sales_df,stock_df,plano_data)
-        recommendations = generate_sku_recommendations(insights)
-        summary = generate_summary_report(insights)     
+        if sales_shards is not None:
+            # Sharded sales are already preprocessed and summarized
+            sales_df = None
+            with report.stage('preprocess', rows_in=rows(stock_data)):
+                stock_df = preprocess_stock(stock_data)
+        else:
+            with report.stage('preprocess', rows_in=rows(sales_data)) as stage:
+                sales_df, stock_df = preprocess_data(sales_data, stock_data)
+                stage['rows_out'] = rows(sales_df)
+        if incremental:
+            with report.stage('incremental_fold', rows_in=rows(sales_df)) as stage:
+                folded = fold_sales(sales_state, sales_df, since)
+                sales_rollup = fold_rollup(sales_rollup, sales_state, folded, since)
+                stage['rows_out'] = rows(sales_rollup.moments)
+            # Sales statistics come from the rollup; saved only after verification, so a mismatching fold is not kept
+            sales_state, sales_df = folded, None
+            with report.stage('summarize_rollup', rows_in=rows(sales_rollup.moments)) as stage:
+                sales_shards = [summarize_rollup(sales_rollup, sales_state, forecast=forecast)]
+                stage['rows_out'] = rows(sales_shards[0])
+            if verify:
+                with report.stage('incremental_verify') as stage:
+                    full_sales_df, _ = preprocess_data(fetch_channel_sales_data(channel, grain=sales_grain), stock_data)
+                    stage['db_calls'] = db_calls()
+                    full_daily = full_sales_df if is_daily_buckets(full_sales_df) else bucket_daily_sales(full_sales_df)
+                    problems = compare_sales_summaries(
+                        summarize_sales(full_daily),
+                        sales_shards[0]
+                    )
+                if problems:
+                    print(f"Incremental state for {channel} does not match the full recompute:")
+                    for problem in problems:
+                        print(f"  - {problem}")
+                    print("Continuing with the full recompute, which replaces the saved state")
+                    sales_df, sales_shards = full_sales_df, None
+                    sales_state = fold_sales(None, full_daily, None)
+                    sales_rollup = SalesRollup.from_daily(sales_state)
+                else:
+                    print(f"Incremental state for {channel} matches the full recompute")
+            commit_sales_state(channel, sales_state, sales_rollup)
+
+        # One shared store/SKU vocabulary, so every merge and groupby runs on integer codes
+        with report.stage('encode_keys', rows_in=rows(sales_df)):
+            store_master = reference['store_master']
+            if store_master is None:
+                store_master = cached_csv(STORE_MASTER_PATH)
+            sku_master = reference['sku_master']
+            if sku_master is None:
+                sku_master = cached_csv(SKU_MASTER_PATH)
+            encoder = KeyEncoder.fit(sales_df, *(sales_shards or []), stock_df, plano_data, store_master, sku_master)
+            print(f"Key vocabulary for {channel}: {encoder.size('store_id')} stores, {encoder.size('sku_id')} SKUs")
+            store_master = encoder.encode(store_master)
+            sku_master = encoder.encode(sku_master)
+            sales_df, stock_df, plano_data = encoder.encode(sales_df), encoder.encode(stock_df), encoder.encode(plano_data)
+            if sales_shards is not None:
+                sales_shards = [encoder.encode(summary) for summary in sales_shards]
+        warehouse_stock = reference.get('warehouse_stock')
+        writer = ArtifactWriter(formats=output_formats)
+        try:
+            insights = analyze_store_sku_performance(
+                sales_df, stock_df, plano_data,
+                store_master=store_master,
+                sku_master=sku_master,
+                writer=writer,
+                simulation=simulation,
+                forecast=forecast,
+                report=report,
+                sales_shards=sales_shards,
+                db_write_mode=db_write_mode,
+                rules=rules
+            )
+            metrics = insights['store_sku_metrics']
+            with report.stage('recommendations', rows_in=rows(metrics)) as stage:
+                recommendations = generate_sku_recommendations(insights, writer=writer)
+                stage['rows_out'] = rows(recommendations)
+            with report.stage('transfer_plan', rows_in=rows(recommendations)) as stage:
+                transfers = generate_transfer_plan(recommendations, store_master, writer=writer)
+                stage['rows_out'] = rows(transfers)
+            if warehouse_stock is not None:
+                with report.stage('warehouse_allocation', rows_in=rows(recommendations)) as stage:
+                    allocation = generate_warehouse_allocation(
+                        recommendations, insights, warehouse_stock, transfers, sku_master, writer=writer, rules=rules
+                    )
+                    stage['rows_out'] = rows(allocation)
+                # The next channel allocates from what is left
+                reference['warehouse_stock'] = remaining_stock(warehouse_stock, allocation)
+            with report.stage('summary_report', rows_in=rows(metrics)):
+                summary = generate_summary_report(insights)
+        finally:
+            # Output files finish writing before the channel counts as done
+            with report.stage('write_outputs') as stage:
+                writer.wait()
+                stage['files'] = writer.timings
         # Save channel-specific results 
         print(f"Completed processing for {channel}")
         return True
@@ -773,9 +866,92 @@ def process_channel(channel, planogram_layout, store_map):
     except Exception as e:
         print(f"Failed processing {channel}: {str(e)}")
         return False
+    finally:
+        try:
+            report.write()
+        except Exception as e:
+            print(f"Could not write run report for {channel}: {str(e)}")
+
+# Reference data handed to each worker process once, at pool start-up
+_WORKER_REFERENCE = None
 
-def main():
+def _init_channel_worker(reference, db_config):
+    global _WORKER_REFERENCE
+    _WORKER_REFERENCE = reference
+    # Spawned workers re-import the module, so a backend chosen on the command line is passed on
+    DB_CONFIG.update(db_config)
+
+def _process_channel_worker(channel, planogram_layout, store_map, options):
+    return process_channel(channel, planogram_layout, store_map, reference=_WORKER_REFERENCE, **options)
+
+def main(argv=None):
     """Main function to process all channels"""
+    parser = argparse.ArgumentParser(description='Retail ARS metrics and recommendations per channel')
+    parser.add_argument('--incremental', action='store_true',
+                        help='fetch only the newest sales days and fold them into the persisted daily buckets '
+                             'and weekly / store-SKU rollups the sales statistics are read from')
+    parser.add_argument('--verify', action='store_true',
+                        help='with --incremental, compare against a full recompute')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='process channels in parallel with this many worker processes')
+    parser.add_argument('--output-formats', default='csv',
+                        help=f"comma separated table formats to write: {', '.join(OUTPUT_FORMATS)}")
+    parser.add_argument('--simulate-paths', type=int, default=0,
+                        help='Monte Carlo demand paths per store-SKU to check fill rate and stockout risk (0 = off)')
+    parser.add_argument('--simulate-workers', type=int, default=1,
+                        help='worker processes for the Monte Carlo check')
+    parser.add_argument('--forecast', action='store_true',
+                        help='size refill levels and stockout weeks on a Croston/SBA/TSB/SES forecast per store-SKU')
+    parser.add_argument('--warehouse-stock', default=WAREHOUSE_STOCK_PATH,
+                        help='merged Vinculum stock report to allocate store orders from')
+    parser.add_argument('--run-report', action='store_true',
+                        help='write per-stage wall/CPU time, peak memory and row counts as JSON lines per channel')
+    parser.add_argument('--profile-stage',
+                        help='also run this stage (e.g. build_metrics, db_insert) under cProfile, implies --run-report')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='add tracemalloc peak/delta per stage to the run report (slow)')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='fetch and summarize sales this many store shards at a time to bound memory (1 = in memory)')
+    parser.add_argument('--sales-grain', choices=SALES_GRAINS, default='lines',
+                        help='daily: let SQL Server sum sales per store-SKU-day instead of sending every invoice line')
+    parser.add_argument('--db-backend', choices=DB_BACKENDS, default=DB_CONFIG['backend'],
+                        help='sqlite/duckdb: read Base and [Retail Inventory] from (and post to) the local --db-file')
+    parser.add_argument('--db-file', help='database file for the sqlite/duckdb backends')
+    parser.add_argument('--db-write-mode', choices=DB_WRITE_MODES, default='replace',
+                        help='diff: upsert only new/changed metric rows and delete vanished ones (needs retail_ars_1.row_hash); '
+                             'swap: load retail_ars_1_shadow, validate it and switch it in')
+    parser.add_argument('--rules',
+                        help='JSON file overriding sections of the segment/bucket/service-level rules (ars_rules.ARS_RULES)')
+    parser.add_argument('--stores', help='comma separated store codes to restrict the run to')
+    parser.add_argument('--skus', help='comma separated SKU (Mat) codes to restrict the run to')
+    args = parser.parse_args(argv)
+    stores = [s.strip() for s in args.stores.split(',') if s.strip()] if args.stores else None
+    skus = [s.strip() for s in args.skus.split(',') if s.strip()] if args.skus else None
+    if (stores or skus) and (args.incremental or args.verify):
+        parser.error("--stores/--skus cannot be combined with --incremental/--verify")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.db_backend != 'mssql':
+        if not args.db_file:
+            parser.error(f"--db-backend {args.db_backend} needs --db-file")
+        DB_CONFIG.update({'backend': args.db_backend, 'database': args.db_file})
+    if args.shards > 1 and (args.incremental or args.verify):
+        parser.error("--shards cannot be combined with --incremental/--verify")
+    simulation = None
+    if args.simulate_paths > 0:
+        simulation = {'n_paths': args.simulate_paths, 'workers': args.simulate_workers}
+    output_formats = tuple(f.strip() for f in args.output_formats.split(',') if f.strip())
+    unknown = set(output_formats) - set(OUTPUT_FORMATS)
+    if unknown or not output_formats:
+        parser.error(f"--output-formats must list {' and/or '.join(OUTPUT_FORMATS)}, got {args.output_formats!r}")
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(f"--rules: {e}")
+    run_report = None
+    if args.run_report or args.profile_stage or args.trace_memory:
+        run_report = {'profile_stage': args.profile_stage, 'trace_memory': args.trace_memory}
+
     # Configuration for local files (example paths)
     PLANO_CONFIG = {
         'Nykaa FSN': {
@@ -795,15 +971,66 @@ def main():
     # Create output directory
     #os.makedirs(OUTPUT_DIR, exist_ok=True)
     
+    # Planogram and master data are loaded once and shared read-only
+    reference = load_reference_data(PLANO_CONFIG, CHANNELS, warehouse_path=args.warehouse_stock)
+    # Per-channel run options, the same for sequential and worker runs
+    options = {
+        'incremental': args.incremental or args.verify,
+        'verify': args.verify,
+        'output_formats': output_formats,
+        'simulation': simulation,
+        'forecast': args.forecast,
+        'run_report': run_report,
+        'shards': args.shards,
+        'stores': stores,
+        'skus': skus,
+        'sales_grain': args.sales_grain,
+        'db_write_mode': args.db_write_mode,
+        'rules': rules
+    }
+
     # Process each channel
     results = {}
-    for channel in CHANNELS:
-        success = process_channel(
-            channel=channel,
-            planogram_layout=PLANO_CONFIG[channel]['planogram'],
-            store_map=PLANO_CONFIG[channel]['store_map']
-        )
-        results[channel] = 'Success' if success else 'Failed'
+    if args.workers > 1 and len(CHANNELS) > 1:
+        # Channels in parallel cannot hand the remaining warehouse stock on, each would allocate all of it
+        if reference['warehouse_stock'] is not None:
+            print("Warehouse allocation is skipped with --workers > 1 and several channels, "
+                  "run with --workers 1 to allocate the channels in turn from one stock")
+            reference['warehouse_stock'] = None
+        with ProcessPoolExecutor(
+            max_workers=min(args.workers, len(CHANNELS)),
+            initializer=_init_channel_worker,
+            initargs=(reference, DB_CONFIG)
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _process_channel_worker,
+                    channel,
+                    PLANO_CONFIG[channel]['planogram'],
+                    PLANO_CONFIG[channel]['store_map'],
+                    options
+                ): channel
+                for channel in CHANNELS
+            }
+            for future in as_completed(futures):
+                channel = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"Worker for {channel} failed: {str(e)}")
+                    success = False
+                results[channel] = 'Success' if success else 'Failed'
+        results = {channel: results[channel] for channel in CHANNELS}
+    else:
+        for channel in CHANNELS:
+            success = process_channel(
+                channel=channel,
+                planogram_layout=PLANO_CONFIG[channel]['planogram'],
+                store_map=PLANO_CONFIG[channel]['store_map'],
+                reference=reference,
+                **options
+            )
+            results[channel] = 'Success' if success else 'Failed'
     
     # Generate final report
     
@@ -5,6 +5,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from scipy import stats
 from sklearn.cluster import KMeans
+from ars_recommendations import build_sku_recommendations
+from ars_rules import ARS_RULES, compile_segment_rules, compile_quantile_buckets, compile_service_levels
 
 def preprocess_data(sales_data, stock_data):
     """
@@ -62,10 +64,12 @@ def planogram_mapper(planogram_layout,store_map):
     merged_data.to_csv('E:/Nykaa_Analysis/merged_plano.csv',index=False)
     return merged_data
 
-def analyze_store_sku_performance(sales_data, stock_data, plano_data):
+def analyze_store_sku_performance(sales_data, stock_data, plano_data, rules=None):
     """
     Analyze sales and stock data at store-SKU level
+    rules: segment/bucket/service-level config, defaults to ars_rules.ARS_RULES
     """
+    rules = rules or ARS_RULES
     sales_data['week'] = sales_data['date'].dt.isocalendar().week
     unique_weeks = sales_data['week'].nunique()
     sales_data['total_weeks'] = unique_weeks
@@ -191,36 +195,16 @@ def analyze_store_sku_performance(sales_data, stock_data, plano_data):
         store_sku_metrics['avg_sales_30day'] = store_sku_metrics['avg_sales_30day'].fillna(0)
         # 4. SKU Segmentation
         store_sku_metrics['revenue_rank'] = store_sku_metrics.groupby('store_id')['avg_weekly_revenue'].rank(ascending=False).round()
-        def assign_sku_segment(row):
-            if row['revenue_rank'] < 10:
-                return 'A - High Value'
-            elif row['sale_frequency_in_weeks'] > 0.99:
-                return 'B - Regular'
-            elif row['sale_frequency_in_weeks'] > 0.7:
-                return 'C - Moderate'
-            else:
-                return 'D - Slow Moving'
-        
-        store_sku_metrics['sku_segment'] = store_sku_metrics.apply(assign_sku_segment, axis=1)
+        assign_sku_segment = compile_segment_rules(rules['sku_segment'])
+        store_sku_metrics['sku_segment'] = assign_sku_segment(store_sku_metrics)
         
         # Calculate total revenue per store
         store_revenue = store_sku_metrics.groupby('store_id')['avg_weekly_revenue'].sum().reset_index()
         store_revenue.columns = ['store_id', 'total_revenue']
 
-        # Calculate quantiles for bucket thresholds
-        top_20_threshold = store_revenue['total_revenue'].quantile(0.8)
-        average_threshold = store_revenue['total_revenue'].quantile(0.5)
-
-        # Assign performance buckets
-        def assign_bucket(revenue):
-            if revenue >= top_20_threshold:
-                return 'Star_Store'
-            elif revenue >= average_threshold:
-                return 'Average_Store'
-            else:
-                return 'Laggard_Store'
-
-        store_revenue['performance_bucket'] = store_revenue['total_revenue'].apply(assign_bucket)
+        # Assign performance buckets from revenue quantile thresholds
+        assign_bucket = compile_quantile_buckets(rules['performance_bucket'])
+        store_revenue['performance_bucket'] = assign_bucket(store_revenue['total_revenue'])
 
         # Merge the performance bucket back to store_sku_metrics
         store_sku_metrics = pd.merge(
@@ -234,16 +218,10 @@ def analyze_store_sku_performance(sales_data, stock_data, plano_data):
         
         # 5. Safety Stock and Reorder Points
         lead_time_weeks = 3
-        service_level_z = {
-            'A - High Value': 2.326,
-            'B - Regular': 1.96,
-            'C - Moderate': 1.645,
-            'D - Slow Moving': 1.28
-        }
+        service_level_z = compile_service_levels(rules['service_level_z'])
         
-        store_sku_metrics['safety_stock'] = store_sku_metrics.apply(
-            lambda row: service_level_z[row['sku_segment']] * row['sales_std'] * np.sqrt(lead_time_weeks), 
-            axis=1
+        store_sku_metrics['safety_stock'] = (
+            service_level_z(store_sku_metrics['sku_segment']) * store_sku_metrics['sales_std'] * np.sqrt(lead_time_weeks)
         ).round(2)
         print(store_sku_metrics['safety_stock'])
         
@@ -340,132 +318,13 @@ def generate_sku_recommendations(insights):
     """
     lead_time = 3 #weeks
     try:
-        recommendations = []
         store_sku_metrics = insights['store_sku_metrics']
         
-        # 1. Immediate Replenishment Needs
-        critical_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_until_stockout'] < lead_time) & 
-            (store_sku_metrics['sku_segment'].isin(['A - High Value', 'B - Regular']))
-        ]
-        
-        for _, item in critical_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'CRITICAL',
-                'category': 'Stock Alert',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['refill_level']-item['current_stock'],
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"SKU {item['sku_id']} ({item['sku_segment']}) will stockout in {item['weeks_until_stockout']:.1f} weeks. "
-                         f"Order {max(item['refill_level'] - item['current_stock'], 0):.0f} units. "
-                         f"Potential weekly revenue loss: INR {item['potential_revenue_loss']:.2f}"
-            })
-        # 1b. Non-Critical Replenishment Needs
-        critical_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_until_stockout'] < lead_time) & 
-            (store_sku_metrics['sku_segment'].isin(['C - Moderate', 'D - Slow Moving']))
-        ]
-        
-        for _, item in critical_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'Medium',
-                'category': 'Stock Alert',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['refill_level']-item['current_stock'],
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"SKU {item['sku_id']} ({item['sku_segment']}) will stockout in {item['weeks_until_stockout']:.1f} weeks. "
-                         f"Order {max(item['refill_level'] - item['current_stock'], 0):.0f} units. "
-                         f"Potential weekly revenue loss: INR {item['potential_revenue_loss']:.2f}"
-            })
-        
-        # 2. Overstock Situations
-        overstock_threshold = lead_time+1
-        overstock_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_coverage'] > overstock_threshold) & 
-            (store_sku_metrics['sku_segment'].isin(['A - High Value', 'B - Regular']))
-        ]
-        
-        for _, item in overstock_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'MEDIUM',
-                'category': 'Inventory Optimization',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['current_stock'] - (item['refill_level']),
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"Excess inventory of SKU {item['sku_id']}. Consider redistributing "
-                         f"{(item['current_stock'] - (item['refill_level'])):.0f} units. "
-                         f"Current coverage: {item['weeks_coverage']:.1f} weeks"
-            })
-
-        # 2b. Overstock Situations
-        overstock_threshold = lead_time+1
-        overstock_skus = store_sku_metrics[
-            (store_sku_metrics['weeks_coverage'] > overstock_threshold) & 
-            (store_sku_metrics['sku_segment'].isin(['C - Moderate', 'D - Slow Moving']))
-        ]
-        
-        for _, item in overstock_skus.iterrows():
-            recommendations.append({
-                'store_id': item['store_id'],
-                'store_name':item['store_name'],
-                'sku_id': item['sku_id'],
-                'brand_line':item['brand_line'],
-                'sku_name':item['sku_name'],
-                'mdq':item['mdq'],
-                'avg_sale_unit_weekly':item['avg_weekly_sales'],
-                'avg_mrp_sales_weekly':item['avg_weekly_revenue'],
-                'current_stock':item['current_stock'],
-                #'safety_stock':item['safety_stock'],
-                'store_type':item['performance_bucket'],
-                'priority': 'Low',
-                'category': 'Inventory Optimization',
-                'inventory_weeks':item['weeks_until_stockout'],
-                'refill_level':item['refill_level'],
-                'reorder_qty':item['current_stock'] - (item['refill_level']),
-                'potential_revenue_loss':item['potential_revenue_loss'],
-                'action': f"Excess inventory of SKU {item['sku_id']}. Consider redistributing "
-                         f"{(item['current_stock'] - (item['refill_level'])):.0f} units. "
-                         f"Current coverage: {item['weeks_coverage']:.1f} weeks"
-            })
+        # Critical/medium stock alerts and A/B, C/D overstock rows, built column-wise
+        recommendations = build_sku_recommendations(store_sku_metrics, lead_time)
 
-        pd.DataFrame(recommendations).to_csv('E:/Nykaa_Analysis/sku_recommenations.csv',index=False)
-        return pd.DataFrame(recommendations)
+        recommendations.to_csv('E:/Nykaa_Analysis/sku_recommenations.csv',index=False)
+        return recommendations
         
     except Exception as e:
         print(f"Error generating recommendations: {str(e)}")
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from ars_allocation import build_allocation, remaining_stock
+from ars_rules import ARS_RULES
+
+
+def make_channel(seed, n_stores=30, n_skus=12):
+    rng = np.random.default_rng(seed)
+    n = n_stores * n_skus
+    recommendations = pd.DataFrame({
+        'store_id': np.repeat([f'S{i:02d}' for i in range(n_stores)], n_skus),
+        'store_name': 'Store',
+        'sku_id': np.tile([f'K{i:02d}' for i in range(n_skus)], n_stores),
+        'brand_line': 'Brand',
+        'sku_name': 'Sku',
+        'store_type': rng.choice(['Star_Store', 'Average_Store', 'Laggard_Store'], n),
+        'priority': rng.choice(['CRITICAL', 'MEDIUM'], n),
+        'category': rng.choice(['Stock Alert', 'Inventory Optimization'], n, p=[0.7, 0.3]),
+        'reorder_qty': rng.integers(0, 15, n).astype(float),
+        'potential_revenue_loss': rng.random(n) * 1000,
+    })
+    metrics = recommendations[['store_id', 'sku_id']].assign(
+        sku_segment=rng.choice(list(ARS_RULES['service_level_z']), n)
+    )
+    return recommendations, metrics
+
+
+WAREHOUSE = pd.DataFrame({'sku_id': [f'K{i:02d}' for i in range(12)], 'warehouse_stock': np.arange(12) * 17.0})
+SKU_MASTER = pd.DataFrame({'sku_id': [f'K{i:02d}' for i in range(12)], 'case_pack': [1, 2, 3, 6] * 3})
+
+
+def assert_within_stock(allocation, stock):
+    allocated = allocation.groupby('sku_id')['allocated_qty'].sum()
+    available = stock.set_index('sku_id')['warehouse_stock'].reindex(allocated.index).fillna(0)
+    assert (allocated <= available).all()
+    assert (allocation['allocated_qty'] >= 0).all()
+    assert (allocation['allocated_qty'] <= allocation['requested_qty']).all()
+    assert (allocation['allocated_qty'] % allocation['case_pack'] == 0).all()
+
+
+def test_allocation_respects_stock_and_requests():
+    recommendations, metrics = make_channel(0)
+    transfers = pd.DataFrame({'to_store_id': ['S00', 'S01'], 'sku_id': ['K03', 'K04'], 'transfer_qty': [4, 100]})
+    allocation = build_allocation(recommendations, metrics, WAREHOUSE, transfers=transfers, sku_master=SKU_MASTER)
+    assert_within_stock(allocation, WAREHOUSE)
+    alerts = recommendations[recommendations['category'] == 'Stock Alert']
+    assert len(allocation) == len(alerts)
+    # Units already coming in on a transfer are not asked for again
+    covered = allocation[(allocation['store_id'] == 'S01') & (allocation['sku_id'] == 'K04')]
+    assert (covered['requested_qty'] == 0).all()
+
+
+def test_channels_in_turn_never_promise_the_same_units():
+    stock = WAREHOUSE
+    total = pd.Series(0.0, index=WAREHOUSE['sku_id'])
+    for seed in range(3):
+        recommendations, metrics = make_channel(seed)
+        allocation = build_allocation(recommendations, metrics, stock, sku_master=SKU_MASTER)
+        assert_within_stock(allocation, stock)
+        total = total.add(allocation.groupby('sku_id')['allocated_qty'].sum(), fill_value=0)
+        left = remaining_stock(stock, allocation)
+        assert (left['warehouse_stock'] > 0).all()
+        stock = left
+    assert (total <= WAREHOUSE.set_index('sku_id')['warehouse_stock']).all()
+    left = WAREHOUSE.set_index('sku_id')['warehouse_stock'] - total
+    pd.testing.assert_series_equal(
+        stock.set_index('sku_id')['warehouse_stock'], left[left > 0], check_names=False
+    )
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from ars_cube import DemandCube, StoreSkuPairs, week_starts
+from ars_sales import bucket_daily_sales
+from ars_state import weekly_buckets
+
+
+def make_daily(seed=0, n=2000):
+    rng = np.random.default_rng(seed)
+    lines = pd.DataFrame({
+        'store_id': rng.choice([f'S{i}' for i in range(7)], n),
+        'sku_id': rng.choice([f'K{i}' for i in range(11)], n),
+        'date': pd.Timestamp('2026-03-02') + pd.to_timedelta(rng.integers(0, 120, n), unit='D'),
+        'sales_units': rng.integers(-1, 6, n),
+        'sales_value': rng.random(n) * 500,
+    })
+    return bucket_daily_sales(lines)
+
+
+def groupby_weekly_stats(daily):
+    """The pandas groupby the cube replaced: zero-filled weekly units per store-SKU"""
+    frame = daily.assign(week=pd.to_datetime(week_starts(daily['date']).astype('datetime64[D]')))
+    weeks = np.sort(frame['week'].unique())
+    weekly = frame.groupby(['store_id', 'sku_id', 'week'])['sales_units'].sum().unstack('week')
+    present = weekly.notna().sum(axis=1)
+    weekly = weekly.reindex(columns=weeks).fillna(0)
+    return pd.DataFrame({
+        'total_units': weekly.sum(axis=1),
+        'total_value': frame.groupby(['store_id', 'sku_id'])['sales_value'].sum(),
+        'weekly_mean': weekly.mean(axis=1),
+        'weekly_std': weekly.std(axis=1, ddof=1),
+        'weeks_present': present,
+        'days_present': frame.groupby(['store_id', 'sku_id'])['date'].nunique(),
+        'sale_frequency': present / len(weeks),
+    }), len(weeks)
+
+
+def cube_weekly_stats(cube):
+    stats = cube.keys().astype(str)
+    stats['total_units'] = cube.total_units()
+    stats['total_value'] = cube.total_value()
+    stats['weekly_mean'] = cube.weekly_mean()
+    stats['weekly_std'] = cube.weekly_std()
+    stats['weeks_present'] = cube.weeks_present
+    stats['days_present'] = cube.days_present
+    stats['sale_frequency'] = cube.sale_frequency()
+    return stats.set_index(['store_id', 'sku_id'])
+
+
+def test_cube_weekly_stats_match_groupby():
+    daily = make_daily()
+    expected, n_weeks = groupby_weekly_stats(daily)
+    cube = DemandCube.from_daily(daily)
+    assert cube.n_weeks == n_weeks
+    actual = cube_weekly_stats(cube)
+    pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_dtype=False)
+
+
+def test_cube_rows_follow_pair_order():
+    daily = make_daily(seed=1)
+    pairs = StoreSkuPairs.from_frame(daily)
+    keys = DemandCube.from_daily(daily, pairs).keys().astype(str)
+    assert list(zip(keys['store_id'], keys['sku_id'])) == sorted(set(zip(daily['store_id'], daily['sku_id'])))
+
+
+def test_cube_on_a_wider_week_calendar():
+    """A shard's cube on the channel's weeks counts the weeks it has no sales in as zero"""
+    daily = make_daily(seed=2)
+    shard = daily[daily['store_id'] == 'S3']
+    weeks = np.unique(week_starts(daily['date'])).astype('datetime64[D]')
+    cube = DemandCube.from_daily(shard, weeks=weeks)
+    assert cube.n_weeks == len(weeks)
+    expected, _ = groupby_weekly_stats(daily)
+    expected = expected.loc['S3']
+    actual = cube_weekly_stats(cube).loc['S3']
+    pd.testing.assert_frame_equal(actual.sort_index(), expected.sort_index(), check_dtype=False)
+
+
+def test_cube_from_weekly_buckets_matches_from_daily():
+    daily = make_daily(seed=3)
+    from_daily = DemandCube.from_daily(daily)
+    from_weekly = DemandCube.from_weekly(weekly_buckets(daily))
+    pd.testing.assert_frame_equal(cube_weekly_stats(from_weekly), cube_weekly_stats(from_daily))
+    np.testing.assert_allclose(from_weekly.dense_units(), from_daily.dense_units())
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from ars_cube import StoreSkuPairs
+from ars_dow import SHARE_COLUMNS, WeekdayProfile
+from ars_sales import bucket_daily_sales
+
+
+def test_peak_day_and_shares_match_groupby():
+    rng = np.random.default_rng(0)
+    n = 3000
+    daily = bucket_daily_sales(pd.DataFrame({
+        'store_id': rng.choice(['S1', 'S2', 'S3'], n),
+        'sku_id': rng.choice(['K1', 'K2', 'K3', 'K4'], n),
+        'date': pd.Timestamp('2026-05-04') + pd.to_timedelta(rng.integers(0, 60, n), unit='D'),
+        'sales_units': rng.integers(1, 9, n),
+        'sales_value': rng.random(n),
+    }))
+    pairs = StoreSkuPairs.from_frame(daily)
+    profile = WeekdayProfile.from_buckets(pairs.codes, len(pairs), daily['date'], daily['sales_units'], daily['n_lines'])
+
+    frame = daily.assign(day_of_week=daily['date'].dt.day_name())
+    dow = frame.groupby(['store_id', 'sku_id', 'day_of_week'])[['sales_units', 'n_lines']].sum()
+    expected_peak = (dow['sales_units'] / dow['n_lines']).unstack().idxmax(axis=1)
+    units = dow['sales_units'].unstack().fillna(0)
+    expected_shares = units.div(units.sum(axis=1), axis=0).round(3)
+    expected_shares = expected_shares[[column.replace('share_', '') for column in SHARE_COLUMNS]]
+
+    assert profile.peak_day().tolist() == expected_peak.tolist()
+    np.testing.assert_allclose(profile.shares_frame().to_numpy(), expected_shares.to_numpy())
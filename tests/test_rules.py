@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ars_rules import (ARS_RULES, compile_quantile_buckets, compile_segment_rules, compile_service_levels,
+                       load_rules)
+
+
+def test_segment_rules_first_match_wins():
+    frame = pd.DataFrame({
+        'revenue_rank': [1, 50, 50, 50, 5],
+        'sale_frequency_in_weeks': [0.2, 1.0, 0.8, 0.1, 1.0],
+    })
+    labels = compile_segment_rules(ARS_RULES['sku_segment'])(frame)
+    assert labels.tolist() == ['A - High Value', 'B - Regular', 'C - Moderate', 'D - Slow Moving', 'A - High Value']
+
+
+def test_segment_rules_match_row_by_row_evaluation():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'revenue_rank': rng.integers(1, 40, 500),
+        'sale_frequency_in_weeks': rng.random(500),
+    })
+    expected = [
+        'A - High Value' if rank < 10 else
+        'B - Regular' if freq > 0.99 else
+        'C - Moderate' if freq > 0.7 else
+        'D - Slow Moving'
+        for rank, freq in zip(frame['revenue_rank'], frame['sale_frequency_in_weeks'])
+    ]
+    assert compile_segment_rules(ARS_RULES['sku_segment'])(frame).tolist() == expected
+
+
+def test_segment_rules_reject_unknown_operator():
+    with pytest.raises(ValueError):
+        compile_segment_rules({'rules': [['X', [['revenue_rank', '~', 1]]]], 'default': 'Y'})
+
+
+def test_quantile_buckets_thresholds_from_values():
+    values = pd.Series(np.arange(1, 11, dtype=float))
+    labels = compile_quantile_buckets(ARS_RULES['performance_bucket'])(values)
+    expected = np.where(values >= values.quantile(0.8), 'Star_Store',
+                        np.where(values >= values.quantile(0.5), 'Average_Store', 'Laggard_Store'))
+    assert labels.tolist() == expected.tolist()
+
+
+def test_service_levels_lookup_and_missing_segment():
+    lookup = compile_service_levels(ARS_RULES['service_level_z'])
+    z = lookup(pd.Series(['B - Regular', 'A - High Value']))
+    assert z.tolist() == [1.96, 2.326]
+    with pytest.raises(KeyError):
+        lookup(pd.Series(['E - Unknown']))
+
+
+def test_load_rules_overrides_sections(tmp_path):
+    assert load_rules() == ARS_RULES
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'service_level_z': {'A - High Value': 3.0, 'B - Regular': 2.0,
+                                                    'C - Moderate': 1.5, 'D - Slow Moving': 1.0}}))
+    rules = load_rules(path)
+    assert rules['service_level_z']['A - High Value'] == 3.0
+    assert rules['sku_segment'] == ARS_RULES['sku_segment']
+    assert ARS_RULES['service_level_z']['A - High Value'] == 2.326
+
+
+def test_load_rules_rejects_bad_files(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'segments': {}}))
+    with pytest.raises(ValueError):
+        load_rules(path)
+    path.write_text(json.dumps({'sku_segment': {'rules': [['X', [['revenue_rank', '~', 1]]]], 'default': 'Y'}}))
+    with pytest.raises(ValueError):
+        load_rules(path)
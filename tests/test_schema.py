@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ars_schema import RETAIL_ARS, RETAIL_ARS_1, compile_column, compile_schema
+
+FLOAT_COLUMNS = [name for name, _, options in RETAIL_ARS_1 if options['kind'] == 'float']
+TEXT_COLUMNS = [name for name, _, options in RETAIL_ARS_1 if options['kind'] != 'float']
+# Baseline post_metric_to_db converted these with astype(float), which raises on text
+STRICT_FLOAT_COLUMNS = ['total_sales_days', 'weeks_of_data', 'total_weeks', 'potential_revenue_loss']
+
+
+def _ascii_text(values, max_len):
+    return values.astype(str).str.strip().str[:max_len].str.encode('ascii', 'ignore').str.decode('ascii').fillna('')
+
+
+def baseline_coerce(df):
+    """The per-column conversions post_metric_to_db applied before the schema was compiled"""
+    df = df[[name for name, _, _ in RETAIL_ARS_1]].copy()
+    for name in ('weeks_until_stockout', 'mdq'):
+        df[name] = pd.to_numeric(df[name], errors='coerce').replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    for name in FLOAT_COLUMNS:
+        if name in STRICT_FLOAT_COLUMNS or name == 'mdq':
+            df[name] = df[name].astype(float).round(2)
+        else:
+            df[name] = pd.to_numeric(df[name], errors='coerce').fillna(0.0).round(2)
+    for name in ('store_id', 'sku_id', 'sku_segment', 'performance_bucket', 'MRP'):
+        df[name] = df[name].astype(str).str.strip()
+    for name in ('weeks_until_stockout', 'peak_day', 'brand_line', 'sku_name', 'channel'):
+        df[name] = _ascii_text(df[name], 55)
+    df['store_name'] = _ascii_text(df['store_name'], 254)
+    return df
+
+
+def make_metrics(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({name: rng.normal(50, 30, n) * 1.23456 for name in FLOAT_COLUMNS})
+    for name in FLOAT_COLUMNS:
+        frame.loc[rng.random(n) < 0.15, name] = np.nan
+    for name in set(FLOAT_COLUMNS) - set(STRICT_FLOAT_COLUMNS):
+        # Numbers read back as text, and values that do not parse
+        frame[name] = frame[name].astype(object)
+        frame.loc[rng.random(n) < 0.1, name] = '12.345'
+        frame.loc[rng.random(n) < 0.1, name] = 'n/a'
+    words = np.array(['  Lakmé Absolute ', 'Nykaa FSN', 'x' * 300, 'Crème Rouge', '', 'A'])
+    for name in TEXT_COLUMNS:
+        frame[name] = rng.choice(words, n).astype(object)
+    frame['weeks_until_stockout'] = np.where(rng.random(n) < 0.3, 'Not Applicable', rng.random(n) * 20).astype(object)
+    frame['MRP'] = rng.choice([199.0, 499.5, np.nan], n)
+    frame['store_id'] = rng.integers(0, 9, n)
+    return frame.sample(frac=1.0, axis=1, random_state=seed)
+
+
+def test_coerce_matches_the_baseline_conversions():
+    frame = make_metrics()
+    coerced = compile_schema(RETAIL_ARS_1).coerce(frame)
+    assert list(coerced.columns) == [name for name, _, _ in RETAIL_ARS_1]
+    pd.testing.assert_frame_equal(coerced, baseline_coerce(frame), check_dtype=False)
+
+
+def test_coerce_fills_infinities_the_baseline_passed_through():
+    frame = make_metrics(n=4)
+    frame[FLOAT_COLUMNS] = np.inf
+    coerced = compile_schema(RETAIL_ARS_1).coerce(frame)
+    baseline = baseline_coerce(frame)
+    # SQL Server float has no infinity, so the baseline's rows failed the whole insert
+    assert np.isinf(baseline[[name for name in FLOAT_COLUMNS if name != 'mdq']]).all().all()
+    fills = {name: options.get('fill', np.nan) for name, _, options in RETAIL_ARS_1 if options['kind'] == 'float'}
+    expected = baseline.assign(**{name: baseline[name].replace(np.inf, fill) for name, fill in fills.items()})
+    pd.testing.assert_frame_equal(coerced, expected, check_dtype=False)
+
+
+def test_rows_follow_the_table_column_order():
+    schema = compile_schema(RETAIL_ARS)
+    frame = make_metrics(n=3).rename(columns={'peak_day': 'unused'})
+    frame['mdq'] = 1.5
+    rows = schema.rows(schema.coerce(frame))
+    assert [len(row) for row in rows] == [len(RETAIL_ARS)] * 3
+    assert schema.insert_sql('retail_ars').count('?') == len(RETAIL_ARS)
+    assert rows[0][schema.columns.index('mdq')] == '1.5'
+
+
+def test_missing_columns_and_unknown_kinds_are_rejected():
+    with pytest.raises(KeyError, match='store_name'):
+        compile_schema(RETAIL_ARS_1).coerce(make_metrics(n=2).drop(columns='store_name'))
+    with pytest.raises(ValueError, match='coercion kind'):
+        compile_column({'kind': 'date'})
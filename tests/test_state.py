@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ars_sales import bucket_daily_sales, compare_sales_summaries, summarize_rollup, summarize_sales
+from ars_state import (MOMENT_COLUMNS, WINDOW_DAYS, SalesRollup, fold_rollup, fold_sales, load_sales_state,
+                       save_sales_state)
+
+START = datetime(2026, 1, 5)
+
+
+def make_lines(first_day, last_day, seed=0):
+    """Invoice lines of 4 stores x 6 SKUs on days first_day..last_day after START"""
+    rng = np.random.default_rng(seed)
+    days = np.arange(first_day, last_day + 1)
+    n = len(days) * 12
+    return pd.DataFrame({
+        'store_id': rng.choice(['S1', 'S2', 'S3', 'S4'], n),
+        'sku_id': rng.choice(['K1', 'K2', 'K3', 'K4', 'K5', 'K6'], n),
+        'date': [START + timedelta(days=int(day)) for day in rng.choice(days, n)],
+        'sales_units': rng.integers(1, 5, n),
+        'sales_value': rng.integers(100, 900, n) / 4,
+    })
+
+
+def test_fold_sales_replaces_refreshed_days_and_expires_old_ones():
+    now = START + timedelta(days=WINDOW_DAYS + 10)
+    state = bucket_daily_sales(make_lines(0, 40))
+    since = START + timedelta(days=35)
+    new_lines = make_lines(35, 45, seed=1)
+    folded = fold_sales(state, new_lines, since, now=now)
+
+    cutoff = now - timedelta(days=WINDOW_DAYS)
+    assert folded['date'].min() >= cutoff
+    kept = state[(state['date'] < since) & (state['date'] >= cutoff)]
+    expected = pd.concat([kept, bucket_daily_sales(new_lines)])
+    expected = expected.sort_values(['date', 'store_id', 'sku_id']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(folded, expected[folded.columns])
+
+
+def test_fold_sales_full_load_without_since():
+    lines = make_lines(0, 20)
+    folded = fold_sales(None, lines, None, now=START + timedelta(days=30))
+    assert int(folded['sales_units'].sum()) == int(lines['sales_units'].sum())
+    assert not folded.duplicated(['store_id', 'sku_id', 'date']).any()
+
+
+def assert_same_rollup(actual, expected):
+    keys = ['store_id', 'sku_id', 'week']
+    pd.testing.assert_frame_equal(
+        actual.weekly.sort_values(keys, ignore_index=True), expected.weekly.sort_values(keys, ignore_index=True),
+        check_dtype=False
+    )
+    pd.testing.assert_frame_equal(
+        actual.moments.sort_values(keys[:2], ignore_index=True)[MOMENT_COLUMNS],
+        expected.moments.sort_values(keys[:2], ignore_index=True)[MOMENT_COLUMNS],
+        check_dtype=False
+    )
+
+
+def test_fold_rollup_matches_rebuild_over_daily_runs():
+    """Refresh and expire day by day; the running rollup stays equal to one built from scratch"""
+    last_day = 60
+    now = START + timedelta(days=last_day)
+    daily = fold_sales(None, make_lines(0, last_day), None, now=now)
+    rollup = SalesRollup.from_daily(daily)
+    for step in range(1, 8):
+        # Jump far enough ahead that the window start moves through the data
+        last_day += 1 if step < 4 else 70
+        now = START + timedelta(days=last_day + (WINDOW_DAYS - 80 if step >= 4 else 0))
+        since = START + timedelta(days=last_day - 3)
+        folded = fold_sales(daily, make_lines(last_day - 3, last_day, seed=step), since, now=now)
+        rollup = fold_rollup(rollup, daily, folded, since, now=now)
+        daily = folded
+        assert_same_rollup(rollup, SalesRollup.from_daily(daily))
+    assert daily['date'].min() > START
+
+
+@pytest.mark.parametrize('forecast', [False, True])
+def test_summarize_rollup_matches_summarize_sales(forecast):
+    daily = bucket_daily_sales(make_lines(0, 120))
+    expected = summarize_sales(daily, forecast=forecast)
+    actual = summarize_rollup(SalesRollup.from_daily(daily), daily, forecast=forecast)
+    assert compare_sales_summaries(expected, actual) == []
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_state_round_trip(tmp_path):
+    daily = bucket_daily_sales(make_lines(0, 30))
+    rollup = SalesRollup.from_daily(daily)
+    meta = save_sales_state('Test Channel', daily, rollup, state_dir=tmp_path)
+    loaded_daily, loaded_rollup, loaded_meta = load_sales_state('Test Channel', state_dir=tmp_path)
+    assert loaded_meta == meta
+    assert meta['store_skus'] == len(rollup.moments)
+    pd.testing.assert_frame_equal(loaded_daily, daily, check_dtype=False)
+    assert_same_rollup(loaded_rollup, rollup)
+    assert load_sales_state('Other Channel', state_dir=tmp_path) == (None, None, {})
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import linprog
+
+from ars_transfers import MIN_TRANSFER_QTY, build_transfer_plan, match_exact, match_fewest, match_transfers
+from benchmarks.bench_transfers import make_recommendations
+
+
+def offers_and_asks(recommendations, min_qty=MIN_TRANSFER_QTY):
+    """Surplus offered and deficit asked per store-SKU, as build_transfer_plan sizes them"""
+    qty = recommendations['reorder_qty'].to_numpy(dtype=float)
+    surplus = np.where(recommendations['category'] == 'Inventory Optimization', np.floor(qty), 0)
+    deficit = np.where(recommendations['priority'] == 'CRITICAL', np.ceil(qty), 0)
+    keys = pd.MultiIndex.from_frame(recommendations[['store_id', 'sku_id']])
+    return (pd.Series(np.where(surplus >= min_qty, surplus, 0), index=keys),
+            pd.Series(np.where(deficit >= min_qty, deficit, 0), index=keys))
+
+
+def assert_feasible(plan, recommendations, store_master, min_qty=MIN_TRANSFER_QTY):
+    surplus, deficit = offers_and_asks(recommendations, min_qty)
+    shipped = plan.groupby(['from_store_id', 'sku_id'])['transfer_qty'].sum()
+    received = plan.groupby(['to_store_id', 'sku_id'])['transfer_qty'].sum()
+    assert (plan['transfer_qty'] >= min_qty).all()
+    # Nobody ships more than their surplus (no negative stock) or receives more than their gap
+    assert (shipped <= surplus.reindex(shipped.index)).all()
+    assert (received <= deficit.reindex(received.index)).all()
+    assert not plan.duplicated(['from_store_id', 'to_store_id', 'sku_id']).any()
+    assert (plan['from_store_id'] != plan['to_store_id']).all()
+    city = store_master.set_index('store_id')['city']
+    assert (city.reindex(plan['from_store_id']).to_numpy() == city.reindex(plan['to_store_id']).to_numpy()).all()
+
+
+@pytest.fixture(scope='module')
+def channel():
+    return make_recommendations(120, 150, 6, row_share=0.2, seed=3)
+
+
+def test_plan_respects_supply_and_demand(channel):
+    recommendations, store_master = channel
+    assert_feasible(build_transfer_plan(recommendations, store_master), recommendations, store_master)
+
+
+def test_plan_has_no_more_transfers_than_the_fill(channel):
+    recommendations, store_master = channel
+    plan = build_transfer_plan(recommendations, store_master)
+    fill = build_transfer_plan(recommendations, store_master, solve=False)
+    assert_feasible(fill, recommendations, store_master)
+    per_pool = ['transfer_group', 'sku_id']
+    solved = plan.groupby(per_pool)['transfer_qty'].agg(['sum', 'size'])
+    filled = fill.groupby(per_pool)['transfer_qty'].agg(['sum', 'size'])
+    pools = solved.index.union(filled.index)
+    solved, filled = solved.reindex(pools, fill_value=0), filled.reindex(pools, fill_value=0)
+    assert (solved['sum'] >= filled['sum']).all()
+    same_units = solved['sum'] == filled['sum']
+    assert (solved.loc[same_units, 'size'] <= filled.loc[same_units, 'size']).all()
+    assert len(plan) < len(fill)
+
+
+def test_plan_on_distance_has_no_more_unit_km_than_the_fill():
+    recommendations, store_master = make_recommendations(120, 150, 6, row_share=0.2, seed=4, locations=True)
+    plan = build_transfer_plan(recommendations, store_master)
+    fill = build_transfer_plan(recommendations, store_master, solve=False)
+    assert_feasible(plan, recommendations, store_master)
+    assert plan['distance_km'].notna().all()
+    assert plan['transfer_qty'].sum() >= fill['transfer_qty'].sum()
+    unit_km = (plan['transfer_qty'] * plan['distance_km']).sum()
+    assert unit_km < (fill['transfer_qty'] * fill['distance_km']).sum()
+
+
+def test_distance_solve_is_optimal_per_pool():
+    """With min_qty 1 nothing is dropped, so each pool's unit-km equal its transportation LP optimum"""
+    recommendations, store_master = make_recommendations(40, 20, 2, row_share=0.5, seed=5, locations=True)
+    plan = build_transfer_plan(recommendations, store_master, min_qty=1)
+    surplus, deficit = offers_and_asks(recommendations, min_qty=1)
+    location = np.radians(store_master.set_index('store_id')[['latitude', 'longitude']])
+    city = store_master.set_index('store_id')['city']
+    checked = 0
+    for (group, sku), legs in plan.groupby(['transfer_group', 'sku_id']):
+        sources = surplus[surplus > 0].xs(sku, level='sku_id')
+        sinks = deficit[deficit > 0].xs(sku, level='sku_id')
+        sources = sources[city.reindex(sources.index).to_numpy() == group]
+        sinks = sinks[city.reindex(sinks.index).to_numpy() == group]
+        a, b = location.loc[sources.index].to_numpy(), location.loc[sinks.index].to_numpy()
+        cost = 2 * 6371.0 * np.arcsin(np.sqrt(
+            np.sin((b[None, :, 0] - a[:, None, 0]) / 2) ** 2
+            + np.cos(a[:, None, 0]) * np.cos(b[None, :, 0]) * np.sin((b[None, :, 1] - a[:, None, 1]) / 2) ** 2
+        ))
+        m, n = cost.shape
+        a_eq = np.kron(np.eye(m), np.ones(n)) if sources.sum() <= sinks.sum() else np.kron(np.ones(m), np.eye(n))
+        b_eq = sources.to_numpy() if sources.sum() <= sinks.sum() else sinks.to_numpy()
+        a_ub = np.kron(np.ones(m), np.eye(n)) if sources.sum() <= sinks.sum() else np.kron(np.eye(m), np.ones(n))
+        b_ub = sinks.to_numpy() if sources.sum() <= sinks.sum() else sources.to_numpy()
+        best = linprog(cost.ravel(), A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=(0, None), method='highs')
+        assert legs['transfer_qty'].sum() == min(sources.sum(), sinks.sum())
+        # distance_km is rounded to 0.1 km in the plan
+        rounding = 0.05 * legs['transfer_qty'].sum()
+        assert (legs['transfer_qty'] * legs['distance_km']).sum() == pytest.approx(best.fun, abs=rounding)
+        checked += 1
+    assert checked > 5
+
+
+def test_match_exact_pairs_equal_sizes_within_a_pool():
+    pool = np.array([0, 0, 0, 1, 1, 1])
+    surplus = np.array([4, 3, 0, 5, 0, 0])
+    deficit = np.array([0, 0, 4, 0, 5, 3])
+    from_rows, to_rows, units = match_exact(pool, surplus, deficit)
+    assert sorted(zip(from_rows, to_rows, units)) == [(0, 2, 4), (3, 4, 5)]
+
+
+def test_match_fewest_beats_the_fill_on_exact_sizes():
+    # Largest-first: 4->6, 3->6, 3->4, 3->4 is four legs; 4->4 then 3+3->6 is three
+    pool = np.zeros(5, dtype=np.int64)
+    surplus = np.array([4, 3, 3, 0, 0])
+    deficit = np.array([0, 0, 0, 6, 4])
+    assert len(match_transfers(pool, surplus, deficit)[2]) == 4
+    from_rows, to_rows, units = match_fewest(pool, surplus, deficit)
+    assert len(units) == 3 and units.sum() == 10
+    np.testing.assert_array_equal(np.bincount(from_rows, weights=units, minlength=5), surplus)
+    np.testing.assert_array_equal(np.bincount(to_rows, weights=units, minlength=5), deficit)
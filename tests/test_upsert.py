@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ars_db import ConnectionPool, duckdb
+from ars_upsert import HASH_COLUMN, KEYS, diff_rows, row_hashes, swap_load, upsert_rows
+
+BACKENDS = ['sqlite', pytest.param('duckdb', marks=pytest.mark.skipif(duckdb is None, reason='duckdb not installed'))]
+COLUMNS = KEYS + ['total_sales', 'sku_segment']
+
+
+def make_metrics(channel, n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'store_id': [f'S{i % 8}' for i in range(n)],
+        'sku_id': [f'K{i // 8:02d}' for i in range(n)],
+        'channel': channel,
+        'total_sales': rng.integers(0, 50, n).astype(float),
+        'sku_segment': rng.choice(['A', 'B', 'C'], n),
+    })
+
+
+def stored_of(frame):
+    return frame[KEYS].assign(**{HASH_COLUMN: row_hashes(frame)})
+
+
+def test_diff_rows_finds_new_changed_and_gone_keys():
+    before = make_metrics('C1')
+    after = before.drop(index=[3, 7]).reset_index(drop=True)
+    after.loc[[0, 5], 'total_sales'] += 1
+    added = make_metrics('C1', n=2, seed=1).assign(sku_id=['K99', 'K98'])
+    after = pd.concat([after, added], ignore_index=True)
+
+    new, changed, gone = diff_rows(after, row_hashes(after), stored_of(before))
+    assert list(after.loc[new, 'sku_id']) == ['K99', 'K98']
+    assert list(changed) == [0, 5]
+    assert sorted(map(tuple, gone.to_numpy())) == sorted(map(tuple, before.loc[[3, 7], KEYS].to_numpy()))
+
+
+def test_diff_rows_of_an_unchanged_frame_is_empty():
+    frame = make_metrics('C1')
+    # Key columns stored as another type still match once compared as text
+    stored = stored_of(frame).astype({'store_id': 'category'})
+    new, changed, gone = diff_rows(frame, row_hashes(frame), stored)
+    assert not len(new) and not len(changed) and gone.empty
+
+
+def _pool(backend, tmp_path):
+    pool = ConnectionPool({'backend': backend, 'database': str(tmp_path / f'metrics.{backend}')})
+    with pool.session('create', transaction=True) as session:
+        session.execute("CREATE TABLE retail_ars_1 (store_id VARCHAR, sku_id VARCHAR, channel VARCHAR, "
+                        "total_sales DOUBLE, sku_segment VARCHAR, row_hash BIGINT)")
+        session.execute("CREATE INDEX ix_retail_ars_1_channel_keys ON retail_ars_1 (channel, store_id, sku_id)")
+    return pool
+
+
+def _table(pool, channel=None):
+    where, params = ("WHERE channel = ?", [channel]) if channel else ("", None)
+    frame = pool.read_frame(f"SELECT {', '.join(COLUMNS)} FROM retail_ars_1 {where}", params)
+    return frame.sort_values(KEYS, ignore_index=True)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_upsert_round_trip_matches_a_full_replace(backend, tmp_path):
+    pool = _pool(backend, tmp_path)
+    other = make_metrics('C2', seed=2)
+    first = make_metrics('C1')
+    try:
+        for frame in (other, first):
+            with pool.session('write', transaction=True) as session:
+                assert upsert_rows(session, 'retail_ars_1', frame, frame['channel'].iloc[0])['write_mode'] == 'replace'
+
+        second = first.drop(index=[1, 2]).reset_index(drop=True)
+        second.loc[[0, 4], 'total_sales'] += 3
+        second = pd.concat([second, make_metrics('C1', n=1, seed=3).assign(sku_id='K77')], ignore_index=True)
+        with pool.session('write', transaction=True) as session:
+            stats = upsert_rows(session, 'retail_ars_1', second, 'C1')
+        assert (stats['write_mode'], stats['inserted'], stats['updated'], stats['deleted']) == ('diff', 1, 2, 2)
+        assert stats['unchanged'] == len(second) - 3
+        assert stats['rows_written'] == 5
+
+        pd.testing.assert_frame_equal(_table(pool, 'C1'), second.sort_values(KEYS, ignore_index=True))
+        pd.testing.assert_frame_equal(_table(pool, 'C2'), other.sort_values(KEYS, ignore_index=True))
+        # Stored hashes are those of the rows now written, so an identical rerun writes nothing
+        with pool.session('write', transaction=True) as session:
+            stats = upsert_rows(session, 'retail_ars_1', second, 'C1')
+        assert stats['rows_written'] == 0 and stats['unchanged'] == len(second)
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_swap_replaces_only_its_channel(backend, tmp_path):
+    pool = _pool(backend, tmp_path)
+    other, first = make_metrics('C2', seed=2), make_metrics('C1')
+    try:
+        for frame in (other, first):
+            with pool.session('write', transaction=True) as session:
+                upsert_rows(session, 'retail_ars_1', frame, frame['channel'].iloc[0])
+
+        snapshots = [first.assign(total_sales=first['total_sales'] + 1).iloc[:-5], make_metrics('C1', seed=4)]
+        for previous, snapshot in zip([first] + snapshots, snapshots):
+            with pool.session('write', transaction=True) as session:
+                stats = swap_load(session, 'retail_ars_1', snapshot, 'C1')
+            assert (stats['inserted'], stats['deleted']) == (len(snapshot), len(previous))
+            pd.testing.assert_frame_equal(_table(pool, 'C1'), snapshot.sort_values(KEYS, ignore_index=True))
+            pd.testing.assert_frame_equal(_table(pool, 'C2'), other.sort_values(KEYS, ignore_index=True))
+            replaced = pool.read_frame(f"SELECT {', '.join(COLUMNS)} FROM retail_ars_1_old").sort_values(KEYS)
+            pd.testing.assert_frame_equal(replaced.reset_index(drop=True), previous.sort_values(KEYS, ignore_index=True))
+            assert pool.read_frame("SELECT COUNT(*) FROM retail_ars_1_shadow").iloc[0, 0] == 0
+
+        # Swapped rows carry their hashes, so a diff write of the same snapshot writes nothing
+        with pool.session('write', transaction=True) as session:
+            stats = upsert_rows(session, 'retail_ars_1', snapshots[-1], 'C1')
+        assert (stats['write_mode'], stats['rows_written']) == ('diff', 0)
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_swap_validation_leaves_the_table_untouched(backend, tmp_path):
+    pool = _pool(backend, tmp_path)
+    first = make_metrics('C1')
+    try:
+        with pool.session('write', transaction=True) as session:
+            upsert_rows(session, 'retail_ars_1', first, 'C1')
+        for snapshot, message in [(first.iloc[:5], 'below the 50% floor'),
+                                  (pd.concat([first, make_metrics('C2')]), 'rows of other channels')]:
+            with pytest.raises(ValueError, match=message):
+                with pool.session('write', transaction=True) as session:
+                    swap_load(session, 'retail_ars_1', snapshot, 'C1')
+            pd.testing.assert_frame_equal(_table(pool), first.sort_values(KEYS, ignore_index=True))
+    finally:
+        pool.close()